@@ -0,0 +1,225 @@
+"""
+    File: arm_view.py
+    Description: 3D preview of the Thor arm for the Asgard GUI.
+    The arm is drawn from the decimated STL parts with a small software
+    renderer (QPainter, flat shading, painter's algorithm), so it needs
+    no OpenGL and runs on Pi-class hardware. The live pose comes from
+    the status reports, a ghost arm shows the commanded target.
+
+    Put the Thor STL parts in the "stl" folder using the names in
+    LINK_PARTS, each part exported in the frame of its own articulation.
+    Missing parts are drawn as simple boxes.
+"""
+import os
+from math import cos, sin, radians
+
+from PySide6.QtCore import Qt, QTimer, QPointF
+from PySide6.QtGui import QColor, QPainter, QPolygonF, QGuiApplication
+from PySide6.QtWidgets import QWidget
+
+import mesh_cache
+import thor_kinematics as tk
+
+# Folder with the Thor STL parts
+STL_DIR = "stl"
+
+# STL parts of every link: the fixed base first, then Art1..Art6
+LINK_PARTS = [
+    ["base.stl"],
+    ["art1.stl"],
+    ["art2.stl"],
+    ["art3.stl"],
+    ["art4.stl"],
+    ["art5.stl"],
+    ["art6.stl"],
+]
+
+# Boxes used for the links without STL parts (x0, y0, z0, x1, y1, z1)
+FALLBACK_BOXES = [
+    (-60, -60, 0, 60, 60, 40),
+    (-45, -45, 40, 45, 45, tk.BASE_HEIGHT),
+    (-30, -30, 0, 30, 30, tk.UPPER_ARM),
+    (-28, -28, -20, 28, 28, 40),
+    (-22, -22, 40, 22, 22, tk.FOREARM),
+    (-18, -18, -15, 18, 18, 30),
+    (-12, -12, 0, 12, 12, tk.WRIST),
+]
+
+# Colours
+BACKGROUND = QColor(40, 44, 52)
+ARM_COLOUR = (230, 120, 40)
+GHOST_COLOUR = QColor(120, 200, 255, 70)
+
+# Refresh rate to use if the screen doesn't report one
+DEFAULT_REFRESH = 60
+
+
+class ArmViewWidget(QWidget):
+    def __init__(self, parent=None):
+        super(ArmViewWidget, self).__init__(parent)
+        self.setMinimumSize(300, 300)
+
+        # One vertex buffer per link
+        self.meshes = self.loadMeshes()
+
+        # Live pose from the status reports and the commanded target
+        self.pose = [0.0] * tk.NUM_LINKS
+        self.target = None
+
+        # Camera, dragged with the mouse
+        self.yaw = 35.0
+        self.pitch = 20.0
+        self.lastMouse = None
+
+        # Projected polygons, recalculated only when something moved
+        self.armPolygons = []
+        self.ghostPolygons = []
+        self.dirty = True
+
+        # Repaint at most once per screen refresh, and only when needed
+        screen = QGuiApplication.primaryScreen()
+        refresh = screen.refreshRate() if screen else DEFAULT_REFRESH
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(1000 / (refresh or DEFAULT_REFRESH)))
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+
+# ---------------------------- MESHES -------------------------------------- #
+    def loadMeshes(self):
+        meshes = []
+        for parts, fallback in zip(LINK_PARTS, FALLBACK_BOXES):
+            buffer = None
+            for part in parts:
+                path = os.path.join(STL_DIR, part)
+                if not os.path.exists(path):
+                    continue
+                try:
+                    mesh = mesh_cache.load_mesh(path)
+                except Exception as e:
+                    print(f"Could not load {path}: {e}")
+                    continue
+                if buffer is None:
+                    buffer = mesh
+                else:
+                    buffer.extend(mesh)
+            meshes.append(buffer if buffer is not None
+                          else mesh_cache.box(*fallback))
+        return meshes
+
+# ---------------------------- POSE ---------------------------------------- #
+    def setPose(self, angles):
+        """Update the live arm, angles of Art1..Art6 in degrees."""
+        if angles != self.pose:
+            self.pose = list(angles)
+            self.dirty = True
+
+    def setTarget(self, angles):
+        """Update the ghost arm that shows the commanded position."""
+        if angles != self.target:
+            self.target = list(angles)
+            self.dirty = True
+
+    def refresh(self):
+        if self.dirty:
+            self.update()
+
+# ---------------------------- CAMERA -------------------------------------- #
+    def mousePressEvent(self, event):
+        self.lastMouse = event.position()
+
+    def mouseMoveEvent(self, event):
+        if self.lastMouse is None:
+            return
+        delta = event.position() - self.lastMouse
+        self.lastMouse = event.position()
+        self.yaw += delta.x() * 0.5
+        self.pitch = max(-89.0, min(89.0, self.pitch + delta.y() * 0.5))
+        self.dirty = True
+
+    def mouseReleaseEvent(self, event):
+        self.lastMouse = None
+
+    def viewMatrix(self):
+        """Rotation from world to camera, z up becomes screen up."""
+        cy, sy = cos(radians(self.yaw)), sin(radians(self.yaw))
+        cp, sp = cos(radians(self.pitch)), sin(radians(self.pitch))
+        # Rows: screen right, screen up, towards the viewer
+        return (
+            (cy, sy, 0.0),
+            (-sy * sp, cy * sp, cp),
+            (sy * cp, -cy * cp, sp),
+        )
+
+# ---------------------------- RENDER -------------------------------------- #
+    def project(self, angles, shaded):
+        """Return (depth, polygon, colour) for every visible triangle."""
+        view = self.viewMatrix()
+        scale = min(self.width(), self.height()) / 800.0
+        cx = self.width() / 2.0
+        cy = self.height() * 0.85
+        polygons = []
+
+        for matrix, mesh in zip(tk.forward_kinematics(angles), self.meshes):
+            # Combine the link pose and the camera into one 3x4 transform
+            m = [
+                [sum(view[r][k] * matrix[k][c] for k in range(3))
+                 for c in range(3)]
+                + [sum(view[r][k] * matrix[k][3] for k in range(3))]
+                for r in range(3)
+            ]
+            (a0, a1, a2, a3), (b0, b1, b2, b3), (c0, c1, c2, c3) = m
+
+            for i in range(0, len(mesh), mesh_cache.FLOATS_PER_TRIANGLE):
+                nx, ny, nz = mesh[i], mesh[i + 1], mesh[i + 2]
+                # Normal towards the viewer, skip triangles facing away
+                facing = c0 * nx + c1 * ny + c2 * nz
+                if facing <= 0:
+                    continue
+
+                points = []
+                depth = 0.0
+                for j in range(i + 3, i + 12, 3):
+                    x, y, z = mesh[j], mesh[j + 1], mesh[j + 2]
+                    sx = a0 * x + a1 * y + a2 * z + a3
+                    sy = b0 * x + b1 * y + b2 * z + b3
+                    depth += c0 * x + c1 * y + c2 * z + c3
+                    points.append(QPointF(cx + sx * scale, cy - sy * scale))
+
+                colour = None
+                if shaded:
+                    light = 0.35 + 0.65 * facing
+                    colour = QColor(int(ARM_COLOUR[0] * light),
+                                    int(ARM_COLOUR[1] * light),
+                                    int(ARM_COLOUR[2] * light))
+                polygons.append((depth, QPolygonF(points), colour))
+
+        # Painter's algorithm: far triangles first
+        polygons.sort(key=lambda p: p[0])
+        return polygons
+
+    def paintEvent(self, event):
+        if self.dirty:
+            self.armPolygons = self.project(self.pose, True)
+            if self.target is not None and self.target != self.pose:
+                self.ghostPolygons = self.project(self.target, False)
+            else:
+                self.ghostPolygons = []
+            self.dirty = False
+
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), BACKGROUND)
+
+        painter.setPen(Qt.PenStyle.NoPen)
+        for depth, polygon, colour in self.armPolygons:
+            painter.setBrush(colour)
+            painter.drawPolygon(polygon)
+
+        # The ghost arm is see-through, drawn on top of the live arm
+        painter.setBrush(GHOST_COLOUR)
+        for depth, polygon, colour in self.ghostPolygons:
+            painter.drawPolygon(polygon)
+        painter.end()
+
+    def resizeEvent(self, event):
+        self.dirty = True
+        super(ArmViewWidget, self).resizeEvent(event)
@@ -22,13 +22,8 @@ from preferences_dialog import PreferencesDialog
 from img.thor_icon import icon_32, icon_16
 
 import serial_port_finder as spf
-from serial_read_thread_class import SerialThreadClass
-
-# pip install pyserial
-import serial
-
-# Create a serial object
-s0 = serial.Serial()
+from robot_session import RobotSession
+from arm_view import ArmViewWidget
 
 
 class AsgardGUI(QMainWindow, Ui_MainWindow):
@@ -48,7 +43,14 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
         # Get the available serial ports
         self.getSerialPorts()
 
-        self.SerialThreadClass = SerialThreadClass(s0)
+        # 3D preview of the selected arm
+        self.setupArmView()
+
+        # Every connected Thor arm has its own session and tab
+        self.sessions = []
+        self.session = None
+        self.setupArmTabs()
+        self.addArm()
 
         # Connect methods to the GUI elements
         self.connect_methods()
@@ -56,8 +58,6 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
  # -------------------------- CONNECT METHODS ------------------------------ #
     def connect_methods(self):
         """Connect methods to GUI elements."""
-        self.SerialThreadClass.serialSignal.connect(self.updateConsole)
-
         # Menu bar actions
         self.actionAbout.triggered.connect(self.launchAboutWindow)
         self.actionPreferences.triggered.connect(self.launchPreferencesWindow)
@@ -147,6 +147,8 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
         self.ConsoleInput.returnPressed.connect(self.sendSerialCommand)
 
     def close_application(self):
+        for session in self.sessions:
+            session.close()
         sys.exit()
 
     def launchAboutWindow(self):
@@ -155,25 +157,19 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
         self.dialogAbout.exec()
 
     def sendHomingCycleCommand(self):
-        if s0.is_open:
+        if self.isConnected():
             messageToSend = "$H"
-            messageToConsole = ">>> " + messageToSend
-            s0.write(messageToSend.encode("UTF-8"))
-            self.ConsoleOutput.appendPlainText(messageToConsole)
+            self.sendCommand(messageToSend)
 
     def sendZeroPositionCommand(self):
-        if s0.is_open:
+        if self.isConnected():
             messageToSend = "G0 A0 B0 C0 D0 X0 Y0 Z0"
-            messageToConsole = ">>> " + messageToSend
-            s0.write(messageToSend.encode("UTF-8"))
-            self.ConsoleOutput.appendPlainText(messageToConsole)
+            self.sendCommand(messageToSend)
 
     def sendKillAlarmCommand(self):
-        if s0.is_open:
+        if self.isConnected():
             messageToSend = "$X"
-            messageToConsole = ">>> " + messageToSend
-            s0.write(messageToSend.encode("UTF-8"))
-            self.ConsoleOutput.appendPlainText(messageToConsole)
+            self.sendCommand(messageToSend)
 
     def FeedRateBoxHide(self):
         if self.G1MoveRadioButton.isChecked():
@@ -185,7 +181,7 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
 
     # FK Art1 Functions
     def FKMoveArt1(self):
-        if s0.is_open:
+        if self.isConnected():
             if self.G1MoveRadioButton.isChecked():
                 typeOfMovement = "G1 "
                 feedRate = " F" + str(self.FeedRateInput.value())
@@ -194,10 +190,7 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
                 feedRate = ""
             message = typeOfMovement + "A" + \
                 str(self.SpinBoxArt1.value()) + feedRate
-            messageToSend = message + "\n"
-            messageToConsole = ">>> " + message
-            s0.write(messageToSend.encode("UTF-8"))
-            self.ConsoleOutput.appendPlainText(messageToConsole)
+            self.sendCommand(message)
         else:
             self.noSerialConnection()
 
@@ -235,7 +228,7 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
 
     # FK Art2 Functions
     def FKMoveArt2(self):
-        if s0.is_open:
+        if self.isConnected():
             if self.G1MoveRadioButton.isChecked():
                 typeOfMovement = "G1 "
                 feedRate = " F" + str(self.FeedRateInput.value())
@@ -250,10 +243,7 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
                 + str(self.SpinBoxArt2.value())
                 + feedRate
             )
-            messageToSend = message + "\n"
-            messageToConsole = ">>> " + message
-            s0.write(messageToSend.encode("UTF-8"))
-            self.ConsoleOutput.appendPlainText(messageToConsole)
+            self.sendCommand(message)
         else:
             self.noSerialConnection()
 
@@ -291,7 +281,7 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
 
     # FK Art3 Functions
     def FKMoveArt3(self):
-        if s0.is_open:
+        if self.isConnected():
             if self.G1MoveRadioButton.isChecked():
                 typeOfMovement = "G1 "
                 feedRate = " F" + str(self.FeedRateInput.value())
@@ -300,10 +290,7 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
                 feedRate = ""
             message = typeOfMovement + "D" + \
                 str(self.SpinBoxArt3.value()) + feedRate
-            messageToSend = message + "\n"
-            messageToConsole = ">>> " + message
-            s0.write(messageToSend.encode("UTF-8"))
-            self.ConsoleOutput.appendPlainText(messageToConsole)
+            self.sendCommand(message)
         else:
             self.noSerialConnection()
 
@@ -341,7 +328,7 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
 
     # FK Art4 Functions
     def FKMoveArt4(self):
-        if s0.is_open:
+        if self.isConnected():
             if self.G1MoveRadioButton.isChecked():
                 typeOfMovement = "G1 "
                 feedRate = " F" + str(self.FeedRateInput.value())
@@ -350,10 +337,7 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
                 feedRate = ""
             message = typeOfMovement + "X" + \
                 str(self.SpinBoxArt4.value()) + feedRate
-            messageToSend = message + "\n"
-            messageToConsole = ">>> " + message
-            s0.write(messageToSend.encode("UTF-8"))
-            self.ConsoleOutput.appendPlainText(messageToConsole)
+            self.sendCommand(message)
         else:
             self.noSerialConnection()
 
@@ -392,7 +376,7 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
     # FK Art5 Functions
     # En realidad esto no va así, hay que calcular el movimiento acoplado. Proximamente.
     def FKMoveArt5(self):
-        if s0.is_open:
+        if self.isConnected():
             if self.G1MoveRadioButton.isChecked():
                 typeOfMovement = "G1 "
                 feedRate = " F" + str(self.FeedRateInput.value())
@@ -401,10 +385,7 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
                 feedRate = ""
             message = typeOfMovement + "Y" + \
                 str(self.SpinBoxArt5.value()) + feedRate
-            messageToSend = message + "\n"
-            messageToConsole = ">>> " + message
-            s0.write(messageToSend.encode("UTF-8"))
-            self.ConsoleOutput.appendPlainText(messageToConsole)
+            self.sendCommand(message)
         else:
             self.noSerialConnection()
 
@@ -443,7 +424,7 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
     # FK Art6 Functions
     # En realidad esto no va así, hay que calcular el movimiento acoplado. Proximamente.
     def FKMoveArt6(self):
-        if s0.is_open:
+        if self.isConnected():
             if self.G1MoveRadioButton.isChecked():
                 typeOfMovement = "G1 "
                 feedRate = " F" + str(self.FeedRateInput.value())
@@ -452,10 +433,7 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
                 feedRate = ""
             message = typeOfMovement + "Z" + \
                 str(self.SpinBoxArt6.value()) + feedRate
-            messageToSend = message + "\n"
-            messageToConsole = ">>> " + message
-            s0.write(messageToSend.encode("UTF-8"))
-            self.ConsoleOutput.appendPlainText(messageToConsole)
+            self.sendCommand(message)
         else:
             self.noSerialConnection()
 
@@ -494,7 +472,7 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
     # FK Every Articulation Functions
     # En realidad esto no va así, hay que calcular el movimiento acoplado. Proximamente.
     def FKMoveAll(self):
-        if s0.is_open:
+        if self.isConnected():
             if self.G1MoveRadioButton.isChecked():
                 typeOfMovement = "G1 "
                 feedRate = " F" + str(self.FeedRateInput.value())
@@ -519,24 +497,18 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
                 + str(self.SpinBoxArt6.value())
                 + feedRate
             )
-            messageToSend = message + "\n"
-            messageToConsole = ">>> " + message
-            s0.write(messageToSend.encode("UTF-8"))
-            self.ConsoleOutput.appendPlainText(messageToConsole)
+            self.sendCommand(message)
         else:
             self.noSerialConnection()
 
     # Gripper Functions
     # En realidad esto no va así, hay que calcular el movimiento acoplado. Proximamente.
     def MoveGripper(self):
-        if s0.is_open:
+        if self.isConnected():
             message = "M3 S" + str(
                 (self.gripperUpperRange / 100) * self.SpinBoxGripper.value()
             )
-            messageToSend = message + "\n"
-            messageToConsole = ">>> " + message
-            s0.write(messageToSend.encode("UTF-8"))
-            self.ConsoleOutput.appendPlainText(messageToConsole)
+            self.sendCommand(message)
         else:
             self.noSerialConnection()
 
@@ -574,13 +546,11 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
         baudrate = self.BaudRateComboBox.currentText()
         if serialPort != "":
             if baudrate != "":
-                s0.port = serialPort
-                s0.baudrate = int(baudrate)
-                s0.timeout = 1
                 try:
-                    s0.close()
-                    s0.open()
-                    self.SerialThreadClass.start()
+                    self.session.connect(serialPort, int(baudrate))
+                    self.ArmTabBar.setTabText(
+                        self.sessions.index(self.session),
+                        self.session.name + " (" + serialPort + ")")
                 except Exception as e:
                     print("error opening serial port: " + str(e))
             else:
@@ -593,47 +563,135 @@ class AsgardGUI(QMainWindow, Ui_MainWindow):
             "background-color: rgb(255, 0, 0)")
         self.RobotStateDisplay.setText("Disconnected")
 
-    def updateConsole(self, dataRead):
+    def sessionDisconnected(self, session):
+        print(session.name + ": Serial Connection Lost")
+        if session is self.session:
+            self.serialDisconnected()
+
+    def updateConsole(self, session, dataRead):
         verboseShow = self.ConsoleShowVerbosecheckBox.isChecked()
         okShow = self.ConsoleShowOkRespcheckBox.isChecked()
         isDataReadVerbose = "MPos" in dataRead
         isDataOkResponse = "ok" in dataRead
 
-        if dataRead == "SERIAL-DISCONNECTED":
-            s0.close()
-            self.serialDisconnected()
-            print("Serial Connection Lost")
+        if not isDataReadVerbose and not isDataOkResponse:
+            self.appendConsole(session, dataRead)
+        elif isDataOkResponse and okShow:
+            self.appendConsole(session, dataRead)
+        elif isDataReadVerbose and verboseShow:
+            self.appendConsole(session, dataRead)
 
-        else:
-            if not isDataReadVerbose and not isDataOkResponse:
-                self.ConsoleOutput.appendPlainText(dataRead)
-            elif isDataOkResponse and okShow:
-                self.ConsoleOutput.appendPlainText(dataRead)
-            elif isDataReadVerbose:
-                self.updateFKPosDisplay(dataRead)
-                if verboseShow:
-                    self.ConsoleOutput.appendPlainText(dataRead)
+    def appendConsole(self, session, text):
+        """Keep the line in the robot's history, show it if its tab is active."""
+        session.consoleLines.append(text)
+        if session is self.session:
+            self.ConsoleOutput.appendPlainText(text)
 
     def sendSerialCommand(self):
-        messageToSent = self.ConsoleInput.text() + "\n"
-        messageToConsole = ">>> " + self.ConsoleInput.text()
-        if s0.is_open:
-            if messageToSent != "":
-                s0.write(messageToSent.encode("UTF-8"))
-                self.ConsoleOutput.appendPlainText(messageToConsole)
+        message = self.ConsoleInput.text()
+        if self.isConnected():
+            if message != "":
+                self.sendCommand(message)
                 self.ConsoleInput.clear()
         else:
             self.noSerialConnection()
 
-    def updateFKPosDisplay(self, dataRead):
-        data = dataRead[1:][:-1].split(",")
-        self.updateCurrentState(data[0])
-        self.FKCurrentPosValueArt1.setText(data[1][5:][:-2] + "º")
-        self.FKCurrentPosValueArt2.setText(data[2][:-2] + "º")
-        self.FKCurrentPosValueArt3.setText(data[4][:-2] + "º")
-        self.FKCurrentPosValueArt4.setText(data[5][:-2] + "º")
-        self.FKCurrentPosValueArt5.setText(data[6][:-2] + "º")
-        self.FKCurrentPosValueArt6.setText(data[7][:-2] + "º")
+    def isConnected(self):
+        """True if there is a connected robot to send commands to."""
+        return len(self.targetSessions()) > 0
+
+    def targetSessions(self):
+        """The robots a command goes to: all of them in broadcast mode."""
+        if self.BroadcastCheckBox.isChecked():
+            return [session for session in self.sessions if session.isOpen()]
+        if self.session is not None and self.session.isOpen():
+            return [self.session]
+        return []
+
+    def sendCommand(self, message):
+        """Send a command to the active robot, or to every robot at once."""
+        for session in self.targetSessions():
+            # Only queued here, each session's worker thread writes it
+            session.write(message)
+            self.appendConsole(session, ">>> " + message)
+            if session is self.session:
+                self.ArmView.setTarget(session.target)
+
+    def updateFKPosDisplay(self, session):
+        if session is not self.session:
+            return
+        self.ArmView.setPose(session.angles())
+        self.ArmView.setTarget(session.target)
+        self.updateCurrentState(session.state)
+        self.FKCurrentPosValueArt1.setText(session.positions[0] + "º")
+        self.FKCurrentPosValueArt2.setText(session.positions[1] + "º")
+        self.FKCurrentPosValueArt3.setText(session.positions[2] + "º")
+        self.FKCurrentPosValueArt4.setText(session.positions[3] + "º")
+        self.FKCurrentPosValueArt5.setText(session.positions[4] + "º")
+        self.FKCurrentPosValueArt6.setText(session.positions[5] + "º")
+
+# ---------------------------- ARM VIEW ------------------------------------ #
+    def setupArmView(self):
+        """Dock with the 3D preview, to the right of the controls."""
+        # The generated GUI has a fixed width, let the dock widen it
+        self.setMaximumSize(QSize(16777215, 16777215))
+        self.ArmView = ArmViewWidget(self)
+        self.ArmViewDock = QtWidgets.QDockWidget("3D View", self)
+        self.ArmViewDock.setWidget(self.ArmView)
+        self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea,
+                           self.ArmViewDock)
+
+# ---------------------------- ARM TABS ------------------------------------ #
+    def setupArmTabs(self):
+        """Toolbar with one tab per robot arm and the broadcast switch."""
+        self.ArmToolBar = QtWidgets.QToolBar("Arms", self)
+        self.ArmToolBar.setMovable(False)
+        self.addToolBar(self.ArmToolBar)
+
+        self.ArmTabBar = QtWidgets.QTabBar(self)
+        self.ArmTabBar.setTabsClosable(True)
+        self.ArmTabBar.setExpanding(False)
+        self.ArmTabBar.currentChanged.connect(self.selectArm)
+        self.ArmTabBar.tabCloseRequested.connect(self.removeArm)
+        self.ArmToolBar.addWidget(self.ArmTabBar)
+
+        self.actionAddArm = QAction("Add Arm", self)
+        self.actionAddArm.triggered.connect(self.addArm)
+        self.ArmToolBar.addAction(self.actionAddArm)
+
+        self.ArmToolBar.addSeparator()
+        self.BroadcastCheckBox = QtWidgets.QCheckBox(
+            "Broadcast to all arms", self)
+        self.ArmToolBar.addWidget(self.BroadcastCheckBox)
+
+    def addArm(self):
+        session = RobotSession("Thor " + str(len(self.sessions) + 1), self)
+        session.lineReceived.connect(self.updateConsole)
+        session.statusChanged.connect(self.updateFKPosDisplay)
+        session.disconnected.connect(self.sessionDisconnected)
+        self.sessions.append(session)
+        index = self.ArmTabBar.addTab(session.name)
+        self.ArmTabBar.setCurrentIndex(index)
+
+    def removeArm(self, index):
+        # Always keep at least one arm
+        if len(self.sessions) == 1:
+            return
+        session = self.sessions.pop(index)
+        session.close()
+        self.ArmTabBar.removeTab(index)
+
+    def selectArm(self, index):
+        """Show the console, state and position of the selected arm."""
+        if index < 0 or index >= len(self.sessions):
+            return
+        self.session = self.sessions[index]
+        self.ConsoleOutput.setPlainText("\n".join(self.session.consoleLines))
+        self.ArmView.setTarget(self.session.target)
+        if self.session.isOpen():
+            self.updateFKPosDisplay(self.session)
+        else:
+            self.serialDisconnected()
 
     def updateCurrentState(self, state):
         self.RobotStateDisplay.setText(state)
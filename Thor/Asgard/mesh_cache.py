@@ -0,0 +1,204 @@
+"""
+    File: mesh_cache.py
+    Description: Load the Thor STL parts for the 3D arm preview.
+    Every STL is decimated once by vertex clustering and the result is
+    cached as a compact binary vertex buffer, so later starts only read
+    a small file instead of parsing and simplifying the full mesh.
+
+    Vertex buffer layout (little endian):
+    - 4 bytes magic "TVB1"
+    - uint32 number of triangles
+    - float32 x 12 per triangle: normal, then the three vertices
+"""
+import os
+import struct
+from array import array
+
+MAGIC = b"TVB1"
+
+# Floats stored for every triangle: normal (3) + 3 vertices (9)
+FLOATS_PER_TRIANGLE = 12
+
+# Where the decimated vertex buffers are stored
+CACHE_DIR = "cache"
+
+# Triangle budget per part, small enough for software rendering
+MAX_TRIANGLES = 400
+
+# First clustering cell size in mm, doubled until under the budget
+START_CELL = 2.0
+
+
+# ---------------------------- READ STL ------------------------------------ #
+def read_stl(path):
+    """Return the list of triangles ((x, y, z), (x, y, z), (x, y, z))."""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    # A binary STL is exactly 84 bytes + 50 bytes for each triangle
+    if len(data) >= 84:
+        count = struct.unpack_from("<I", data, 80)[0]
+        if 84 + count * 50 == len(data):
+            return read_binary_stl(data, count)
+    return read_ascii_stl(data.decode("ascii", errors="ignore"))
+
+
+def read_binary_stl(data, count):
+    triangles = []
+    for i in range(count):
+        # Skip the stored normal (12 bytes), it is calculated again later
+        v = struct.unpack_from("<9f", data, 84 + i * 50 + 12)
+        triangles.append(((v[0], v[1], v[2]), (v[3], v[4], v[5]),
+                          (v[6], v[7], v[8])))
+    return triangles
+
+
+def read_ascii_stl(text):
+    triangles = []
+    vertices = []
+    for line in text.splitlines():
+        words = line.split()
+        if words and words[0] == "vertex":
+            vertices.append(tuple(float(w) for w in words[1:4]))
+            if len(vertices) == 3:
+                triangles.append(tuple(vertices))
+                vertices = []
+    return triangles
+
+
+# ---------------------------- DECIMATE ------------------------------------ #
+def normal(triangle):
+    (ax, ay, az), (bx, by, bz), (cx, cy, cz) = triangle
+    ux, uy, uz = bx - ax, by - ay, bz - az
+    vx, vy, vz = cx - ax, cy - ay, cz - az
+    nx, ny, nz = uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+    length = (nx * nx + ny * ny + nz * nz) ** 0.5
+    if length == 0:
+        return None
+    return nx / length, ny / length, nz / length
+
+
+def cluster(triangles, cell):
+    """
+    Simplify a mesh by snapping its vertices to a grid of cell size cell.
+    Vertices in the same cell are merged into their average, triangles
+    that collapse or repeat are dropped.
+    """
+    sums = {}
+    for triangle in triangles:
+        for x, y, z in triangle:
+            key = (int(x // cell), int(y // cell), int(z // cell))
+            total = sums.setdefault(key, [0.0, 0.0, 0.0, 0])
+            total[0] += x
+            total[1] += y
+            total[2] += z
+            total[3] += 1
+
+    centers = {
+        key: (t[0] / t[3], t[1] / t[3], t[2] / t[3]) for key, t in sums.items()
+    }
+
+    result = []
+    seen = set()
+    for triangle in triangles:
+        keys = tuple(
+            (int(x // cell), int(y // cell), int(z // cell))
+            for x, y, z in triangle
+        )
+        if len(set(keys)) < 3:
+            continue
+        unique = tuple(sorted(keys))
+        if unique in seen:
+            continue
+        seen.add(unique)
+        result.append(tuple(centers[key] for key in keys))
+    return result
+
+
+def decimate(triangles, max_triangles=MAX_TRIANGLES):
+    cell = START_CELL
+    result = triangles
+    while len(result) > max_triangles:
+        result = cluster(triangles, cell)
+        cell *= 2
+    return result
+
+
+def to_buffer(triangles):
+    """Pack triangles and their normals into a flat float32 array."""
+    buffer = array("f")
+    for triangle in triangles:
+        n = normal(triangle)
+        if n is None:
+            continue
+        buffer.extend(n)
+        for vertex in triangle:
+            buffer.extend(vertex)
+    return buffer
+
+
+# ---------------------------- CACHE --------------------------------------- #
+def cache_path(stl_path, max_triangles):
+    name = os.path.splitext(os.path.basename(stl_path))[0]
+    return os.path.join(CACHE_DIR, f"{name}_{max_triangles}.tvb")
+
+
+def save_buffer(path, buffer):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    count = len(buffer) // FLOATS_PER_TRIANGLE
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", count))
+        # array stores machine order, vertex buffers are little endian
+        if struct.pack("=I", 1) != struct.pack("<I", 1):
+            buffer = array("f", buffer)
+            buffer.byteswap()
+        buffer.tofile(f)
+
+
+def load_buffer(path):
+    with open(path, "rb") as f:
+        if f.read(4) != MAGIC:
+            return None
+        count = struct.unpack("<I", f.read(4))[0]
+        buffer = array("f")
+        buffer.fromfile(f, count * FLOATS_PER_TRIANGLE)
+    if struct.pack("=I", 1) != struct.pack("<I", 1):
+        buffer.byteswap()
+    return buffer
+
+
+def load_mesh(stl_path, max_triangles=MAX_TRIANGLES):
+    """
+    Return the decimated vertex buffer of an STL part.
+    The cached buffer is used while it is newer than the STL file.
+    """
+    path = cache_path(stl_path, max_triangles)
+    try:
+        if os.path.getmtime(path) >= os.path.getmtime(stl_path):
+            buffer = load_buffer(path)
+            if buffer is not None:
+                return buffer
+    except (OSError, EOFError):
+        pass
+
+    buffer = to_buffer(decimate(read_stl(stl_path), max_triangles))
+    try:
+        save_buffer(path, buffer)
+    except OSError as e:
+        print(f"Could not cache {stl_path}: {e}")
+    return buffer
+
+
+def box(x0, y0, z0, x1, y1, z1):
+    """Vertex buffer of a box, used when a part has no STL file."""
+    p = [(x, y, z) for x in (x0, x1) for y in (y0, y1) for z in (z0, z1)]
+    faces = [
+        (0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1),
+        (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3),
+    ]
+    triangles = []
+    for a, b, c, d in faces:
+        triangles.append((p[a], p[b], p[c]))
+        triangles.append((p[a], p[c], p[d]))
+    return to_buffer(triangles)
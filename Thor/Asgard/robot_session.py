@@ -0,0 +1,132 @@
+"""
+    File: robot_session.py
+    Description: One Thor arm connected to Asgard.
+    A RobotSession owns the serial port, the serial worker thread,
+    the console history and the last status report of one robot,
+    so a single Asgard window can drive several arms on different ports.
+"""
+from collections import deque
+
+from PySide6.QtCore import QObject, Signal
+
+# pip install pyserial
+import serial
+
+from serial_read_thread_class import SerialThreadClass
+
+# Read timeout of the serial port, short so queued writes go out quickly
+SERIAL_TIMEOUT = 0.1
+
+# How many console lines to keep for each robot
+CONSOLE_HISTORY = 500
+
+# G-code axis letter of every articulation (C mirrors B on Art2)
+AXIS_LETTERS = "ABDXYZ"
+
+
+class RobotSession(QObject):
+    # Emits (session, line) for every line read from the robot
+    lineReceived = Signal(object, str)
+
+    # Emits the session when a new status report was parsed
+    statusChanged = Signal(object)
+
+    # Emits the session when the serial connection is lost
+    disconnected = Signal(object)
+
+# ---------------------------- INIT -------------------------------------- #
+    def __init__(self, name, parent=None):
+        super(RobotSession, self).__init__(parent)
+        self.name = name
+
+        # Every robot has its own serial object and worker thread
+        self.s0 = serial.Serial()
+        self.serialThread = SerialThreadClass(self.s0)
+        self.serialThread.serialSignal.connect(self.serialReceived)
+
+        # Status model, updated from the "<State,MPos:...>" reports
+        self.state = "Disconnected"
+        self.positions = [""] * 6
+
+        # Last commanded articulation angles, for the 3D preview ghost
+        self.target = [0.0] * 6
+
+        # Console history, shown again when the robot's tab is selected
+        self.consoleLines = deque(maxlen=CONSOLE_HISTORY)
+
+# ---------------------------- CONNECTION -------------------------------- #
+    def isOpen(self):
+        return self.s0.is_open
+
+    def connect(self, port, baudrate):
+        """Open the serial port and start the worker thread."""
+        self.s0.port = port
+        self.s0.baudrate = baudrate
+        self.s0.timeout = SERIAL_TIMEOUT
+        self.s0.close()
+        self.s0.open()
+        if not self.serialThread.isRunning():
+            self.serialThread.running = True
+            self.serialThread.start()
+
+    def close(self):
+        """Stop the worker thread and close the serial port."""
+        self.serialThread.stop()
+        self.s0.close()
+        self.state = "Disconnected"
+
+    def write(self, message):
+        """Queue a command for this robot, the worker thread sends it."""
+        self.serialThread.write(message + "\n")
+        self.updateTarget(message)
+
+    def updateTarget(self, message):
+        """Remember the angles of a G0/G1 move as the commanded target."""
+        words = message.upper().split()
+        if not words or words[0] not in ("G0", "G1"):
+            return
+        for word in words[1:]:
+            index = AXIS_LETTERS.find(word[0])
+            if index < 0:
+                continue
+            try:
+                self.target[index] = float(word[1:])
+            except ValueError:
+                pass
+
+    def angles(self):
+        """The reported articulation angles as numbers."""
+        angles = []
+        for position in self.positions:
+            try:
+                angles.append(float(position))
+            except ValueError:
+                angles.append(0.0)
+        return angles
+
+# ---------------------------- STATUS ------------------------------------ #
+    def serialReceived(self, dataRead):
+        if dataRead == "SERIAL-DISCONNECTED":
+            self.s0.close()
+            self.state = "Disconnected"
+            self.disconnected.emit(self)
+            return
+
+        if "MPos" in dataRead:
+            self.parseStatus(dataRead)
+            self.statusChanged.emit(self)
+
+        self.lineReceived.emit(self, dataRead)
+
+    def parseStatus(self, dataRead):
+        """Store the state and articulation positions of a status report."""
+        data = dataRead[1:][:-1].split(",")
+        self.state = data[0]
+        self.positions = [
+            data[1][5:][:-2],
+            data[2][:-2],
+            data[4][:-2],
+            data[5][:-2],
+            data[6][:-2],
+            data[7][:-2],
+        ]
@@ -2,16 +2,23 @@
    File: serial_read_thread_class.py
    Description: This file contains the class for the serial read thread.
    The serial read thread is used to read data from the serial port.
+   It also owns the writes for its port, so every robot connection
+   does all of its serial I/O in its own worker thread and the GUI
+   thread only has to put commands on a queue.
 """
 import time
+import queue
 from PySide6 import QtCore
 from PySide6.QtCore import Signal as Signal
 
+# How often to ask the controller for a status report, in seconds
+STATUS_INTERVAL = 0.1
+
+# How long to wait while the port is closed before checking again
+IDLE_SLEEP = 0.05
 
-class SerialThreadClass(QtCore.QThread):
-    # Initialize a class variable to store the elapsed time
-    elapsedTime = time.time()
 
+class SerialThreadClass(QtCore.QThread):
     # Define a signal that will emit a string
     serialSignal = Signal(str)
 
@@ -23,41 +30,77 @@ class SerialThreadClass(QtCore.QThread):
         # Store the incoming serial port object as an object variable
         self.s0 = s0
 
+        # Store the elapsed time per thread, not per class,
+        # so every robot gets its own status poll
+        self.elapsedTime = time.time()
+
+        # Commands waiting to be written to the serial port
+        self.writeQueue = queue.Queue()
+
+        # Set to False to let the thread finish
+        self.running = True
+
+# ---------------------------- WRITE ------------------------------------- #
+    def write(self, message):
+        """Queue a message to be written by the worker thread."""
+        self.writeQueue.put(message.encode("UTF-8"))
+
+    def stop(self):
+        """Ask the worker thread to finish and wait for it."""
+        self.running = False
+        self.wait()
+
+    def flushWrites(self):
+        """Write every queued command to the serial port."""
+        while True:
+            try:
+                data = self.writeQueue.get_nowait()
+            except queue.Empty:
+                return
+            self.s0.write(data)
+
 # ---------------------------- RUN --------------------------------------- #
     def run(self):
         # This method will run in a separate thread
-        while True:
+        while self.running:
             # Check if the serial port is open
-            if self.s0.isOpen():
-                try:
-                    # Check if there is data waiting in the serial buffer
-                    self.s0.inWaiting()
-                except:
-                    # If an error occurs, emit a signal indicating
-                    # the serial connection is lost
-                    self.serialSignal.emit("SERIAL-DISCONNECTED")
-                    print("Lost Serial connection!")
-
-                try:
-                    # Check if more than 0.1 seconds have passed
-                    # since the last time check
-                    if time.time() - self.elapsedTime > 0.1:
-                        # Update the elapsed time
-                        self.elapsedTime = time.time()
-
-                        # Write a command to the serial port
-                        self.s0.write("?\n".encode('UTF-8'))
-
-                    # Read a line of data from the serial port
-                    dataRead = str(self.s0.readline())
-
-                    # Crop the data to remove unwanted characters
-                    dataCropped = dataRead[2:][:-5]
-
-                    # If the cropped data is not empty, emit it as a signal
-                    if dataCropped != "":
-                        self.serialSignal.emit(dataCropped)
-
-                except Exception as e:
-                    # If an error occurs, print the error message
-                    print(f"Something failed: {e}")
+            if not self.s0.isOpen():
+                # Nothing to do, don't spin the CPU while disconnected
+                time.sleep(IDLE_SLEEP)
+                continue
+
+            try:
+                # Check if there is data waiting in the serial buffer
+                self.s0.inWaiting()
+            except:
+                # If an error occurs, emit a signal indicating
+                # the serial connection is lost
+                self.serialSignal.emit("SERIAL-DISCONNECTED")
+                print("Lost Serial connection!")
+
+            try:
+                # Send the commands queued by the GUI first
+                self.flushWrites()
+
+                # Check if more than 0.1 seconds have passed
+                # since the last time check
+                if time.time() - self.elapsedTime > STATUS_INTERVAL:
+                    # Update the elapsed time
+                    self.elapsedTime = time.time()
+
+                    # Write a command to the serial port
+                    self.s0.write("?\n".encode('UTF-8'))
+
+                # Read a line of data from the serial port
+                dataRead = str(self.s0.readline())
+
+                # Crop the data to remove unwanted characters
+                dataCropped = dataRead[2:][:-5]
+
+                # If the cropped data is not empty, emit it as a signal
+                if dataCropped != "":
+                    self.serialSignal.emit(dataCropped)
+
+            except Exception as e:
+                # If an error occurs, print the error message
+                print(f"Something failed: {e}")
@@ -0,0 +1,104 @@
+"""
+    File: thor_kinematics.py
+    Description: Forward kinematics of the Thor robot arm.
+    Turns the six articulation angles (degrees) into the pose of
+    every link, used by the 3D arm preview.
+"""
+from math import cos, sin, radians
+
+# Thor link lengths in mm
+BASE_HEIGHT = 202.0     # floor to shoulder axis (Art2)
+UPPER_ARM = 160.0       # shoulder (Art2) to elbow (Art3)
+FOREARM = 195.0         # elbow (Art3) to wrist (Art5)
+WRIST = 67.15           # wrist (Art5) to the tool flange
+
+# Number of moving links, one per articulation
+NUM_LINKS = 6
+
+
+def identity():
+    return [
+        [1.0, 0.0, 0.0, 0.0],
+        [0.0, 1.0, 0.0, 0.0],
+        [0.0, 0.0, 1.0, 0.0],
+        [0.0, 0.0, 0.0, 1.0],
+    ]
+
+
+def multiply(a, b):
+    """Multiply two 4x4 matrices."""
+    return [
+        [
+            a[i][0] * b[0][j] + a[i][1] * b[1][j]
+            + a[i][2] * b[2][j] + a[i][3] * b[3][j]
+            for j in range(4)
+        ]
+        for i in range(4)
+    ]
+
+
+def rot_z(angle):
+    c, s = cos(radians(angle)), sin(radians(angle))
+    return [
+        [c, -s, 0.0, 0.0],
+        [s, c, 0.0, 0.0],
+        [0.0, 0.0, 1.0, 0.0],
+        [0.0, 0.0, 0.0, 1.0],
+    ]
+
+
+def rot_y(angle):
+    c, s = cos(radians(angle)), sin(radians(angle))
+    return [
+        [c, 0.0, s, 0.0],
+        [0.0, 1.0, 0.0, 0.0],
+        [-s, 0.0, c, 0.0],
+        [0.0, 0.0, 0.0, 1.0],
+    ]
+
+
+def translate_z(distance):
+    matrix = identity()
+    matrix[2][3] = distance
+    return matrix
+
+
+def forward_kinematics(angles):
+    """
+    Calculate the pose of every link.
+
+    Parameters:
+    - angles: the six articulation angles in degrees (Art1..Art6).
+
+    Returns:
+    - A list of 4x4 matrices, the base first and then one per link.
+      Every matrix places the link's own frame in the world frame (mm).
+    """
+    art1, art2, art3, art4, art5, art6 = angles
+    base = identity()
+
+    # Art1 rotates the whole arm around the vertical axis
+    link1 = multiply(base, rot_z(art1))
+
+    # Art2 (shoulder) tilts the upper arm, on top of the base column
+    link2 = multiply(multiply(link1, translate_z(BASE_HEIGHT)), rot_y(art2))
+
+    # Art3 (elbow) tilts the forearm at the end of the upper arm
+    link3 = multiply(multiply(link2, translate_z(UPPER_ARM)), rot_y(art3))
+
+    # Art4 rolls the forearm around its own axis
+    link4 = multiply(link3, rot_z(art4))
+
+    # Art5 tilts the wrist at the end of the forearm
+    link5 = multiply(multiply(link4, translate_z(FOREARM)), rot_y(art5))
+
+    # Art6 rolls the tool flange
+    link6 = multiply(link5, rot_z(art6))
+
+    return [base, link1, link2, link3, link4, link5, link6]
+
+
+def tool_position(angles):
+    """Return the (x, y, z) position of the tool flange in mm."""
+    flange = multiply(forward_kinematics(angles)[-1], translate_z(WRIST))
+    return flange[0][3], flange[1][3], flange[2][3]
@@ -0,0 +1,198 @@
+"""
+    Name: bench_input_latency.py
+    Author:
+    Created:
+    Purpose: Measure gamepad input latency for every input backend
+    A virtual gamepad (Linux uinput) presses a button again and again.
+    For each press the time until Thor handles it (dispatch) and the
+    time until the motion loop writes the G-code line (serial write)
+    are measured, and the percentiles are printed per backend.
+
+    Linux only, needs write access to /dev/uinput:
+    pip install evdev inputs pygame
+    python bench_input_latency.py --backend all --presses 200
+"""
+import os
+import argparse
+import random
+from threading import Thread, Event
+from time import perf_counter, sleep
+
+# No arm needed: the serial port is fake_grbl.py
+os.environ.setdefault("THOR_PORT", "fake://")
+
+import thor as thor_module  # noqa: E402
+from thor import Thor  # noqa: E402
+import gamepad_input  # noqa: E402
+
+# Buttons pressed in turn by the benchmark (art_1 and art_1_cw in
+# gamepad_map.ini), so the arm swings back and forth and never stops
+# at a movement limit
+BENCH_BUTTONS = ["BTN_BASE5", "BTN_BASE6"]
+
+ACTIONS = ["art_1", "art_1_cw"]
+
+# Wait between presses, so every press starts from a still arm
+PAUSE = 0.05
+
+
+class Probe:
+    """Records when Thor gets the press and when the line is written."""
+
+    def __init__(self, thor):
+        self.dispatched = Event()
+        self.written = Event()
+        self.dispatch_time = 0
+        self.write_time = 0
+
+        press = thor.press
+
+        def timed_press(action):
+            if not self.dispatched.is_set():
+                self.dispatch_time = perf_counter()
+                self.dispatched.set()
+            press(action)
+        thor.press = timed_press
+
+        def timed_write(cmd, policy=None, on_sent=None):
+            if not self.written.is_set():
+                self.write_time = perf_counter()
+                self.written.set()
+            return True  # nothing is really written
+        thor.output = timed_write
+
+    def reset(self):
+        self.dispatched.clear()
+        self.written.clear()
+
+
+def make_gamepad():
+    """Create a virtual gamepad with the codes of gamepad_map.ini."""
+    from evdev import UInput, AbsInfo, ecodes
+
+    config = gamepad_input.load_mapping()
+    buttons = [ecodes.ecodes[name] for name, _ in config.items("buttons")]
+    buttons += [ecodes.ecodes[name] for name, _ in config.items("commands")]
+    axes = [(ecodes.ecodes[name], AbsInfo(0, -1, 1, 0, 0, 0))
+            for name, _ in config.items("hats")]
+    axes += [(ecodes.ecodes[name], AbsInfo(128, 0, 255, 0, 0, 0))
+             for name, _ in config.items("sticks")]
+    return UInput({ecodes.EV_KEY: buttons, ecodes.EV_ABS: axes},
+                  name="Thor benchmark gamepad")
+
+
+def pygame_reader(thor):
+    """The control_pygame.py loop: sleep, then drain the event queue."""
+    import pygame
+
+    pygame.init()
+    pygame.joystick.init()
+    joystick = pygame.joystick.Joystick(pygame.joystick.get_count() - 1)
+    reader = type("PygameInput", (), {})()
+    reader.running = True
+    reader.joystick = joystick
+    reader.action = ACTIONS[0]
+
+    def run():
+        while reader.running:
+            sleep(0.01)
+            for ev in pygame.event.get():
+                # Button numbers depend on the device, any press will do
+                # and alternating directions keep the arm off its limits
+                if ev.type == pygame.JOYBUTTONDOWN:
+                    reader.action = ACTIONS[ev.button % 2]
+                    thor.press(reader.action)
+                elif ev.type == pygame.JOYBUTTONUP:
+                    thor.release(reader.action)
+
+    def stop():
+        reader.running = False
+    reader.run = run
+    reader.stop = stop
+    return reader
+
+
+def make_reader(backend, thor, uinput):
+    if backend == "evdev":
+        return gamepad_input.EvdevInput(thor, uinput.device.path)
+    if backend == "inputs":
+        return gamepad_input.InputsInput(thor)
+    return pygame_reader(thor)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def report(backend, name, values):
+    ms = [v * 1000 for v in values]
+    print(f"{backend:7} {name:13} n={len(ms):4}  "
+          f"p50={percentile(ms, 50):7.2f}  p90={percentile(ms, 90):7.2f}  "
+          f"p99={percentile(ms, 99):7.2f}  max={max(ms):7.2f} ms")
+
+
+def bench(backend, presses, rate):
+    from evdev import ecodes
+
+    uinput = make_gamepad()
+    sleep(0.5)  # let the backends see the new device
+    thor = Thor(rate)
+    probe = Probe(thor)
+    reader = make_reader(backend, thor, uinput)
+    Thread(target=reader.run, daemon=True).start()
+    thor.start()
+    sleep(0.5)
+
+    codes = [ecodes.ecodes[name] for name in BENCH_BUTTONS]
+    dispatch, write, lost = [], [], 0
+    for i in range(presses):
+        code = codes[i % 2]
+        probe.reset()
+        start = perf_counter()
+        uinput.write(ecodes.EV_KEY, code, 1)
+        uinput.syn()
+        if probe.written.wait(1) and probe.dispatched.is_set():
+            dispatch.append(probe.dispatch_time - start)
+            write.append(probe.write_time - start)
+        else:
+            lost += 1
+        uinput.write(ecodes.EV_KEY, code, 0)
+        uinput.syn()
+        # Random pause so the presses land on every part of a tick
+        sleep(PAUSE + random.uniform(0, 1 / rate))
+
+    thor.stop()
+    reader.stop()
+    uinput.close()
+    if dispatch:
+        report(backend, "dispatch", dispatch)
+        report(backend, "serial write", write)
+    if lost:
+        print(f"{backend:7} lost {lost} of {presses} presses")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Gamepad input latency for every input backend")
+    parser.add_argument("--backend", default="all",
+                        choices=["all", "evdev", "inputs", "pygame"])
+    parser.add_argument("--presses", type=int, default=200)
+    parser.add_argument("--rate", type=int, default=thor_module.TICK_RATE,
+                        help="motion loop ticks per second")
+    args = parser.parse_args()
+
+    backends = ["evdev", "inputs", "pygame"]
+    if args.backend != "all":
+        backends = [args.backend]
+    for backend in backends:
+        try:
+            bench(backend, args.presses, args.rate)
+        except Exception as e:
+            # Missing library, no /dev/uinput access, device not found...
+            print(f"{backend:7} skipped: {e}")
+
+
+if __name__ == "__main__":
+    main()
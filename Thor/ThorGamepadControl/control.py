@@ -1,51 +1,33 @@
+import argparse
 from my_serial import read_thread
 from thor import Thor
-from threading import Thread
-from inputs import get_gamepad
-import keys
+import gamepad_input
+import session_log
 
-thor = Thor()
+parser = argparse.ArgumentParser(description="Control Thor with a gamepad")
+parser.add_argument("--record", metavar="LOG",
+                    help="record the session to LOG, see replay.py")
+args = parser.parse_args()
+
+recorder = None
+if args.record:
+    recorder = session_log.Recorder(
+        args.record, gamepad_input.mapped_codes(gamepad_input.load_mapping()))
+
+thor = Thor(recorder=recorder)
+# evdev if it is installed, else the inputs library,
+# both dispatch through the table compiled from gamepad_map.ini
+gamepad = gamepad_input.open_gamepad(thor, recorder=recorder)
 
 read_thread.start()  # run the serial listener in a separate thread
-while read_thread.is_alive():
-    try:
-        event = get_gamepad()[0]
-    except KeyboardInterrupt:
-        break
-    btn = f"{event.code} {event.state}"  # event from the gamepad
-    if "MSC" in btn or "SYN" in btn:
-        continue
-    # print(btn)
-    thor.event = btn  # to maintain stop if unpressed
-    match btn:
-        # the moving functions run in separate threads to be able to stop on unpressed key
-        case keys.L2:
-            Thread(target=thor.open_claw).start()
-        case keys.L1:
-            Thread(target=thor.close_claw).start()
-        case keys.RIGHT:
-            Thread(target=thor.rotate_claw).start()
-        case keys.LEFT:
-            Thread(target=thor.rotate_claw_cw).start()
-        case keys.DOWN:
-            Thread(target=thor.move_claw_b).start()
-        case keys.UP:
-            Thread(target=thor.move_claw).start()
-        case keys.A_2:
-            Thread(target=thor.art_4).start()
-        case keys.Y_4:
-            Thread(target=thor.art_4_cw).start()
-        case keys.B_3:
-            Thread(target=thor.art_3_b).start()
-        case keys.X_1:
-            Thread(target=thor.art_3).start()
-        case keys.R1:
-            Thread(target=thor.art_2_b).start()
-        case keys.R2:
-            Thread(target=thor.art_2).start()
-        case keys.L_AN:
-            Thread(target=thor.art_1).start()
-        case keys.R_AN:
-            Thread(target=thor.art_1_cw).start()
-        case keys.START:
-            Thread(target=thor.home).start()
+thor.start()  # one fixed-rate motion loop moves all the held axes
+try:
+    gamepad.run()  # blocks, handling every gamepad event
+except KeyboardInterrupt:
+    pass
+thor.stop()
+if recorder:
+    # Let the motion loop finish its tick before closing the log
+    with recorder.lock:
+        thor.recorder = None
+        recorder.close()
@@ -8,13 +8,39 @@
 from my_serial import read_thread
 # Import the Thor class from thor module
 from thor import Thor
-# Import the Thread class from threading module
-from threading import Thread
 # Import the pygame module for gamepad control
 import pygame
 # Import the sleep function from time module
 from time import sleep
 
+# Joystick button number -> action held by the motion loop
+BUTTONS = {
+    6: "open_claw",
+    4: "close_claw",
+    1: "art_4",
+    3: "art_4_cw",
+    2: "art_3_b",
+    0: "art_3",
+    5: "art_2_b",
+    7: "art_2",
+    10: "art_1",
+    11: "art_1_cw",
+}
+HOME_BUTTON = 9
+
+# Joystick axis number -> (Thor axis, direction)
+# Left stick: base rotation and shoulder, right stick: wrist and elbow
+STICKS = {
+    0: ("art1", -1),
+    1: ("art2", -1),
+    2: ("art4", 1),
+    3: ("art3", -1),
+}
+
+# Hat (d-pad) actions, left/right and down/up
+HAT_X = {1: "rotate_claw", -1: "rotate_claw_cw"}
+HAT_Y = {1: "move_claw", -1: "move_claw_b"}
+
 
 class GamepadController:
     def __init__(self):
@@ -39,80 +65,44 @@ class GamepadController:
         read_thread.start()
 
     def run(self):
+        # One fixed-rate motion loop moves all the held axes
+        self.thor.start()
         # Keep running while the read_thread is alive
         while read_thread.is_alive():
             try:
                 # Sleep for 0.01 seconds
                 sleep(0.01)
-                event = pygame.event.get()  # Get the list of events
+                events = pygame.event.get()  # Get the list of events
             except KeyboardInterrupt:  # Handle keyboard interrupt
                 break  # Break the loop
-            if not event:  # If no event, continue to the next iteration
-                continue
-            ev = event[0]  # Get the first event
-            t = ev.type  # Get the type of the event
-            # Check if the event is a joystick motion or hat motion
-            if t == 1540 or (t == 1538 and ev.value == (0, 0)):
-                self.thor.event = ""  # Clear the event
-                continue
-            btn = None  # Initialize btn as None
-            if t == 1539:  # Check if the event is a button press
-                btn = ev.button  # Get the button number
-            if t == 1538:  # Check if the event is a hat motion
-                btn = ev.value  # Get the hat value
-            if btn is None:  # If btn is still None, continue to the next iteration
-                continue
-            else:
-                self.thor.event = str(btn)  # Set the event in thor instance
-            self.handle_button(btn)
+            # Handle every event, not just the first one
+            for ev in events:
+                self.handle_event(ev)
+        self.thor.stop()
 
-    def handle_button(self, btn):
-        match btn:  # Match the button value
-            case 6:
-                # Start a daemon thread to open the claw
-                Thread(target=self.thor.open_claw, daemon=True).start()
-            case 4:
-                # Start a daemon thread to close the claw
-                Thread(target=self.thor.close_claw, daemon=True).start()
-            case (1, 0):
-                # Start a daemon thread to rotate the claw
-                Thread(target=self.thor.rotate_claw, daemon=True).start()
-            case (-1, 0):
-                # Start a daemon thread to rotate the claw clockwise
-                Thread(target=self.thor.rotate_claw_cw, daemon=True).start()
-            case (0, -1):
-                # Start a daemon thread to move the claw backward
-                Thread(target=self.thor.move_claw_b, daemon=True).start()
-            case (0, 1):
-                # Start a daemon thread to move the claw forward
-                Thread(target=self.thor.move_claw, daemon=True).start()
-            case 1:
-                # Start a daemon thread to move articulation 4
-                Thread(target=self.thor.art_4, daemon=True).start()
-            case 3:
-                # Start a daemon thread to move articulation 4 clockwise
-                Thread(target=self.thor.art_4_cw, daemon=True).start()
-            case 2:
-                # Start a daemon thread to move articulation 3 backward
-                Thread(target=self.thor.art_3_b, daemon=True).start()
-            case 0:
-                # Start a daemon thread to move articulation 3
-                Thread(target=self.thor.art_3, daemon=True).start()
-            case 5:
-                # Start a daemon thread to move articulation 2 backward
-                Thread(target=self.thor.art_2_b, daemon=True).start()
-            case 7:
-                # Start a daemon thread to move articulation 2
-                Thread(target=self.thor.art_2, daemon=True).start()
-            case 10:
-                # Start a daemon thread to move articulation 1
-                Thread(target=self.thor.art_1, daemon=True).start()
-            case 11:
-                # Start a daemon thread to move articulation 1 clockwise
-                Thread(target=self.thor.art_1_cw, daemon=True).start()
-            case 9:
-                # Start a daemon thread to move to home position
-                Thread(target=self.thor.home, daemon=True).start()
+    def handle_event(self, ev):
+        if ev.type == pygame.JOYBUTTONDOWN:
+            if ev.button == HOME_BUTTON:
+                self.thor.home()
+            elif ev.button in BUTTONS:
+                self.thor.press(BUTTONS[ev.button])
+        elif ev.type == pygame.JOYBUTTONUP:
+            if ev.button in BUTTONS:
+                self.thor.release(BUTTONS[ev.button])
+        elif ev.type == pygame.JOYAXISMOTION:
+            # Stick position sets the axis speed, -1.0 to 1.0
+            if ev.axis in STICKS:
+                attribute, direction = STICKS[ev.axis]
+                self.thor.set_analog(attribute, direction * ev.value)
+        elif ev.type == pygame.JOYHATMOTION:
+            # The hat reports its whole state, so release and press again
+            x, y = ev.value
+            for action in list(HAT_X.values()) + list(HAT_Y.values()):
+                self.thor.release(action)
+            if x in HAT_X:
+                self.thor.press(HAT_X[x])
+            if y in HAT_Y:
+                self.thor.press(HAT_Y[y])
 
 
 def main():
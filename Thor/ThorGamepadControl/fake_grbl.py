@@ -0,0 +1,120 @@
+"""
+    Name: fake_grbl.py
+    Author:
+    Created:
+    Purpose: A serial port that answers like the GRBL controller of the
+    arm, to run the programs without it: THOR_PORT=fake:// (see
+    my_serial.py). Every line gets "ok" LINE_TIME after the one before,
+    as if the arm moved, "?" gets a status report with the machine
+    position of the last moves and Ctrl-X resets it.
+"""
+from collections import deque
+from threading import Condition
+from time import monotonic
+
+# Seconds the fake controller takes for every line
+LINE_TIME = 0.01
+
+BANNER = b"Grbl 1.1h ['$' for help]\r\n"
+AXES = "ABCDXYZ"  # order of the machine position in the status report
+
+
+class FakeGrbl:
+    """The part of a pyserial port my_serial uses."""
+
+    def __init__(self, line_time=LINE_TIME):
+        self.line_time = line_time
+        self.baudrate = 115200
+        self.timeout = None
+        self.is_open = False
+        self.position = [0.0] * len(AXES)
+        self.partial = b""  # start of a line not ended yet
+        self.pending = deque()  # (time it is done, line) not answered yet
+        self.answers = deque()  # lines ready to read
+        self.lock = Condition()
+
+    def open(self):
+        # Opening the port resets the Arduino, it greets like GRBL does
+        with self.lock:
+            self.is_open = True
+            self.reset()
+
+    def close(self):
+        with self.lock:
+            self.is_open = False
+            self.lock.notify_all()
+
+    def reset(self):
+        self.partial = b""
+        self.pending.clear()
+        self.answers.clear()
+        self.answers.append(BANNER)
+        self.lock.notify_all()
+
+    @property
+    def in_waiting(self):
+        with self.lock:
+            self.finish_lines()
+            return sum(len(answer) for answer in self.answers)
+
+    def write(self, data):
+        with self.lock:
+            for byte in data:
+                char = bytes([byte])
+                if char == b"?":  # realtime, not buffered
+                    self.answers.append(self.status())
+                elif char == b"\x18":  # Ctrl-X
+                    self.reset()
+                elif char == b"\n":
+                    done = monotonic()
+                    if self.pending:
+                        done = max(done, self.pending[-1][0])
+                    self.pending.append((done + self.line_time, self.partial))
+                    self.partial = b""
+                else:
+                    self.partial += char
+            self.lock.notify_all()
+        return len(data)
+
+    def readline(self):
+        """The next answer line, b"" after timeout seconds without one."""
+        with self.lock:
+            deadline = None if self.timeout is None else monotonic() + self.timeout
+            while True:
+                self.finish_lines()
+                if self.answers:
+                    return self.answers.popleft()
+                wait = None
+                if self.pending:
+                    wait = self.pending[0][0] - monotonic()
+                if deadline is not None:
+                    left = deadline - monotonic()
+                    if left <= 0 or not self.is_open:
+                        return b""
+                    wait = left if wait is None else min(wait, left)
+                self.lock.wait(wait)
+
+    def finish_lines(self):
+        # Call with the lock held
+        now = monotonic()
+        while self.pending and self.pending[0][0] <= now:
+            _, line = self.pending.popleft()
+            self.move(line.decode("UTF-8", errors="ignore"))
+            self.answers.append(b"ok\r\n")
+
+    def move(self, line):
+        words = line.split()
+        if not words or words[0] not in ("G0", "G1"):
+            return
+        for word in words[1:]:
+            axis = AXES.find(word[0])
+            if axis >= 0:
+                try:
+                    self.position[axis] = float(word[1:])
+                except ValueError:
+                    pass
+
+    def status(self):
+        state = "Run" if self.pending else "Idle"
+        mpos = ",".join(f"{value:.3f}" for value in self.position)
+        return f"<{state}|MPos:{mpos}|FS:0,0>\r\n".encode("UTF-8")
@@ -0,0 +1,223 @@
+"""
+    Name: gamepad_input.py
+    Author:
+    Created:
+    Purpose: Read the gamepad and pass every event to Thor
+    The mapping in gamepad_map.ini is compiled once into a dispatch
+    table: event code -> handler. Handling an event is one dictionary
+    lookup and one call, no string building or compares.
+
+    Backends:
+    - evdev:  blocks on the Linux input device and handles every
+              queued event as soon as it arrives (pip install evdev)
+    - inputs: the inputs library used before (pip install inputs)
+"""
+import os
+import configparser
+
+# Mapping file next to this script
+MAP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "gamepad_map.ini")
+
+# Stick range for backends that can't ask the device (inputs library)
+STICK_CENTER = 128
+STICK_RANGE = 127
+
+
+# ------------------------------ MAPPING ----------------------------------- #
+def load_mapping(path=MAP_FILE):
+    """Read the mapping file into a ConfigParser."""
+    config = configparser.ConfigParser(inline_comment_prefixes=("#",))
+    config.optionxform = str  # keep the event codes upper case
+    if not config.read(path):
+        raise FileNotFoundError(path)
+    return config
+
+
+def button_handler(thor, action):
+    def handle(value):
+        if value == 1:
+            thor.press(action)
+        elif value == 0:
+            thor.release(action)
+        # value 2 is key repeat, the motion loop already keeps moving
+    return handle
+
+
+def hat_handler(thor, negative, positive):
+    def handle(value):
+        if value < 0:
+            thor.release(positive)
+            thor.press(negative)
+        elif value > 0:
+            thor.release(negative)
+            thor.press(positive)
+        else:
+            thor.release(negative)
+            thor.release(positive)
+    return handle
+
+
+def stick_handler(thor, attribute, direction, center, half_range):
+    scale = direction / half_range
+
+    def handle(value):
+        thor.set_analog(attribute, (value - center) * scale)
+    return handle
+
+
+def command_handler(thor, command):
+    method = getattr(thor, command)
+
+    def handle(value):
+        if value == 1:
+            method()
+    return handle
+
+
+def mapped_codes(config):
+    """Every event code name used by the mapping, in file order."""
+    codes = []
+    for section in ("buttons", "commands", "hats", "sticks"):
+        if config.has_section(section):
+            codes += [name for name, _ in config.items(section)]
+    return codes
+
+
+def recorded(recorder, name, handler):
+    def handle(value):
+        # Hold the log while Thor handles the event, see Thor.run
+        with recorder.lock:
+            recorder.input(name, value)
+            handler(value)
+    return handle
+
+
+def compile_table(thor, config, key=None, stick_range=None, recorder=None):
+    """
+    Build the dispatch table: key(kind, code name) -> handler(value).
+    - key: turns ("button"/"axis", code name) into the backend's event
+      key, the code name itself by default.
+    - stick_range: returns (center, half range) of a stick code, the
+      STICK_CENTER/STICK_RANGE defaults are used when not given.
+    - recorder: session_log.Recorder, records every mapped raw event.
+    """
+    key = key or (lambda kind, name: name)
+    table = {}
+
+    def add(kind, name, handler):
+        if recorder:
+            handler = recorded(recorder, name, handler)
+        table[key(kind, name)] = handler
+
+    if config.has_section("buttons"):
+        for name, action in config.items("buttons"):
+            add("button", name, button_handler(thor, action.strip()))
+    if config.has_section("commands"):
+        for name, command in config.items("commands"):
+            add("button", name, command_handler(thor, command.strip()))
+    if config.has_section("hats"):
+        for name, actions in config.items("hats"):
+            negative, positive = [a.strip() for a in actions.split(",")]
+            add("axis", name, hat_handler(thor, negative, positive))
+    if config.has_section("sticks"):
+        for name, value in config.items("sticks"):
+            attribute, direction = [v.strip() for v in value.split(",")]
+            if stick_range:
+                center, half_range = stick_range(name)
+            else:
+                center, half_range = STICK_CENTER, STICK_RANGE
+            add("axis", name, stick_handler(
+                thor, attribute, int(direction), center, half_range))
+    return table
+
+
+# ------------------------------ EVDEV ------------------------------------- #
+def find_gamepad():
+    """Return the first evdev device with joystick or gamepad buttons."""
+    import evdev
+    from evdev import ecodes
+
+    for path in evdev.list_devices():
+        device = evdev.InputDevice(path)
+        keys = device.capabilities().get(ecodes.EV_KEY, [])
+        if any(ecodes.BTN_JOYSTICK <= k < ecodes.BTN_DIGI for k in keys):
+            return device
+        device.close()
+    return None
+
+
+class EvdevInput:
+    def __init__(self, thor, device=None, config=None, recorder=None):
+        import evdev
+        from evdev import ecodes
+
+        if device is None:
+            device = find_gamepad()
+        elif isinstance(device, str):
+            device = evdev.InputDevice(device)
+        if device is None:
+            raise OSError("No Gamepad!")
+        self.device = device
+
+        def key(kind, name):
+            kind = ecodes.EV_KEY if kind == "button" else ecodes.EV_ABS
+            return (kind, ecodes.ecodes[name])
+
+        def stick_range(name):
+            info = device.absinfo(ecodes.ecodes[name])
+            return (info.min + info.max) / 2, (info.max - info.min) / 2
+
+        self.table = compile_table(thor, config or load_mapping(),
+                                   key, stick_range, recorder)
+        self.running = False
+
+    def run(self):
+        """Block on the device and handle every event until stop()."""
+        table = self.table
+        self.running = True
+        # read_loop waits on the device and yields every queued event
+        for event in self.device.read_loop():
+            handler = table.get((event.type, event.code))
+            if handler is not None:
+                handler(event.value)
+            if not self.running:
+                break
+
+    def stop(self):
+        self.running = False
+
+
+# ------------------------------ INPUTS ------------------------------------ #
+class InputsInput:
+    def __init__(self, thor, config=None, recorder=None):
+        self.table = compile_table(thor, config or load_mapping(),
+                                   recorder=recorder)
+        self.running = False
+
+    def run(self):
+        # Imported here, the inputs library looks for gamepads on import
+        from inputs import get_gamepad
+
+        table = self.table
+        self.running = True
+        while self.running:
+            # get_gamepad blocks until events arrive, handle all of them
+            for event in get_gamepad():
+                handler = table.get(event.code)
+                if handler is not None:
+                    handler(event.state)
+
+    def stop(self):
+        self.running = False
+
+
+def open_gamepad(thor, backend=None, recorder=None):
+    """Use evdev when it is installed, else the inputs library."""
+    if backend in (None, "evdev"):
+        try:
+            return EvdevInput(thor, recorder=recorder)
+        except ImportError:
+            if backend == "evdev":
+                raise
+    return InputsInput(thor, recorder=recorder)
@@ -5,24 +5,169 @@
     Purpose: Communicate with the Arduino via serial port
     This library uses the pyserial library to communicate with the Arduino
     https://pyserial.readthedocs.io/en/latest/pyserial.html
+
+    Flow control: the controller (GRBL) answers every line with "ok" or
+    "error". The bytes of the lines it has not answered yet are still in
+    its RX buffer, so serial_write only sends a line when it fits in
+    RX_BUFFER_SIZE, otherwise it blocks or coalesces (see POLICY).
+    The count starts again from zero when the controller resets (its
+    "Grbl" banner), raises an ALARM, the port is opened again, or no
+    answer comes for ANSWER_TIMEOUT.
 """
 
-# Import the Serial class from the pyserial library
+import os
+# Import serial_for_url from the pyserial library
 # pip install pyserial
-from serial import Serial
+from serial import serial_for_url
 # Import the Thread class from the threading library
-from threading import Thread
+from threading import Thread, Condition
+from collections import deque
+from time import monotonic, sleep
+
+# Size of the controller's serial receive buffer in bytes
+RX_BUFFER_SIZE = 128
+
+# What serial_write does when the controller buffer is full:
+# "block"    - wait until there is room, every line is sent
+# "coalesce" - keep only the newest waiting line, older ones are dropped.
+#              Fine for absolute position moves, only the last one matters
+POLICY = "block"
+
+# Longest time to wait for room in the controller buffer, in seconds
+WRITE_TIMEOUT = 2
+
+# Seconds without any answer before the unanswered lines count as lost.
+# GRBL answers a line when it enters its planner, so only a full
+# planner of slow moves keeps it quiet this long
+ANSWER_TIMEOUT = 5
+
+# Seconds between tries to open the port again after it was lost
+RECONNECT_INTERVAL = 1
+
+# How often to ask the controller for its status and position
+STATUS_INTERVAL = 0.2
+
+# Serial port, COM3 unless the THOR_PORT environment variable is set.
+# Any pyserial URL works, FAKE_PORT answers like GRBL without the arm
+PORT = os.environ.get("THOR_PORT", "COM3")
+FAKE_PORT = "fake://"
 
-s0 = Serial()  # Create an instance of the Serial class
-s0.port = "COM3"  # Set the serial port to COM3
+if PORT == FAKE_PORT:
+    from fake_grbl import FakeGrbl
+    s0 = FakeGrbl()
+else:
+    s0 = serial_for_url(PORT, do_not_open=True)  # Create the serial port
 s0.baudrate = 115200  # Set the baud rate to 115200
-s0.timeout = 1  # Set the read timeout to 1 second
+s0.timeout = 0.05  # Short read timeout so the status poll stays on time
 s0.close()  # Close the serial port if it is open
 s0.open()  # Open the serial port
 
+# Lengths of the lines sent and not answered yet, oldest first
+sent_lengths = deque()
+# Coalesced line waiting for room in the controller buffer
+waiting_line = None
+# Called when the waiting line is really sent, dropped if it is replaced
+waiting_sent = None
+# Time of the last answer, or of the first line sent after it
+last_answer = 0.0
+# Guards the variables above, notified on every "ok"/"error"
+buffer_free = Condition()
+
+# Latest status report, read by Thor
+state = ""
+position = None  # list of machine positions (A, B, C, D, X, Y, Z)
+errors = 0  # number of "error" answers received
+
+
+# ------------------------------ STATUS ------------------------------------ #
+def parse_status(line):
+    """
+    Store state and machine position from a GRBL status report like
+    <Idle,MPos:0.000,0.000,...,WPos:...> or <Idle|MPos:0.000,...|FS:0,0>
+    """
+    global state, position
+    body = line.strip("<>")
+    fields = body.replace("|", ",").split(",")
+    state = fields[0]
+    values = []
+    reading = False
+    for field in fields[1:]:
+        if field.startswith("MPos:"):
+            reading = True
+            field = field[5:]
+        elif ":" in field:
+            reading = False
+        if reading:
+            try:
+                values.append(float(field))
+            except ValueError:
+                reading = False
+    if values:
+        position = values
+
+
+def line_done():
+    """The controller answered the oldest line: its bytes are free again."""
+    global waiting_line, waiting_sent, last_answer
+    on_sent = None
+    with buffer_free:
+        last_answer = monotonic()
+        if sent_lengths:
+            sent_lengths.popleft()
+        # Send the coalesced line as soon as it fits
+        if waiting_line is not None and fits(len(waiting_line)):
+            send(waiting_line)
+            on_sent = waiting_sent
+            waiting_line = waiting_sent = None
+        buffer_free.notify_all()
+    # Not with buffer_free held: the callback may wait for the motion
+    # loop (the recorder lock), which may be waiting for buffer_free
+    if on_sent:
+        on_sent()
+
+
+def reset_buffer(reason):
+    """
+    The controller forgot the lines it had not answered (reset, alarm,
+    new connection) or their answers were lost: count from zero again.
+    The waiting line is dropped too, the next motion line repeats it.
+    """
+    global waiting_line, waiting_sent
+    with buffer_free:
+        if sent_lengths or waiting_line is not None:
+            print(f"{reason}, forgetting {len(sent_lengths)} unanswered lines")
+        sent_lengths.clear()
+        waiting_line = waiting_sent = None
+        buffer_free.notify_all()
+
+
+def check_answers():
+    """Reset the count when the controller stopped answering."""
+    with buffer_free:
+        if sent_lengths and monotonic() - last_answer > ANSWER_TIMEOUT:
+            reset_buffer(f"No answer for {ANSWER_TIMEOUT} s")
+
+
+def handle_line(line):
+    global errors
+    if line == "ok":
+        line_done()
+    elif line.startswith("error"):
+        errors += 1
+        print(f"Controller {line}")
+        line_done()
+    elif line.startswith("<"):
+        parse_status(line)
+    elif line.startswith("ALARM"):
+        print(f"Controller {line}")
+        reset_buffer("Controller alarm")
+    elif line.startswith("Grbl"):
+        reset_buffer("Controller reset")
+
 
 # ------------------------------ SERIAL READ ------------------------------- #
 def serial_read():
+    last_status = 0
     # Infinite loop to keep the serial interface open
     while True:
         if not s0.is_open:  # Check if the serial port is closed
@@ -35,21 +180,88 @@ def serial_read():
             print("SERIAL-DISCONNECTED")
             # Print a message indicating the serial connection is lost
             print(f"Lost Serial connection! {e}")
+            reconnect()
+            continue
 
         try:
+            # "?" is a realtime command, it doesn't use the RX buffer
+            if monotonic() - last_status > STATUS_INTERVAL:
+                last_status = monotonic()
+                with buffer_free:
+                    s0.write(b"?")
             # Read a line of data from the serial port
-            s0.readline()
+            line = s0.readline().decode("UTF-8", errors="ignore").strip()
+            if line:
+                handle_line(line)
+            check_answers()
         except Exception as e:  # Handle exceptions
             # Print a message indicating an error occurred
             print(f"Something failed: {e}")
 
 
+def reconnect():
+    """Open the port again until it works, nothing sent before is answered"""
+    while True:
+        try:
+            s0.close()
+            s0.open()
+            break
+        except Exception as e:
+            print(f"Reconnect failed: {e}")
+            sleep(RECONNECT_INTERVAL)
+    reset_buffer("Reconnected")
+
+
 # ------------------------------ SERIAL WRITE ------------------------------ #
-def serial_write(cmd):
-    # Append a newline character to the command
-    cmd = cmd + "\n"
-    # Write the command to the serial port encoded as UTF-8
-    s0.write(cmd.encode("UTF-8"))
+def fits(length):
+    return sum(sent_lengths) + length <= RX_BUFFER_SIZE
+
+
+def send(data):
+    # Call with buffer_free held
+    global last_answer
+    if not sent_lengths:
+        last_answer = monotonic()  # the answer timeout starts now
+    sent_lengths.append(len(data))
+    s0.write(data)
+
+
+def serial_write(cmd, policy=None, on_sent=None):
+    """
+    Send a command when it fits in the controller buffer.
+    Returns False if it was coalesced or timed out instead of sent.
+    on_sent is called (from the read thread) when a coalesced command is
+    sent later, not if a newer one replaces it first.
+    """
+    global waiting_line, waiting_sent
+    # Append a newline character to the command, encoded as UTF-8
+    data = (cmd + "\n").encode("UTF-8")
+    policy = policy or POLICY
+    with buffer_free:
+        if policy == "coalesce" and (waiting_line is not None
+                                     or not fits(len(data))):
+            # Replace the older waiting line, it is sent on the next "ok".
+            # Never wait here, and never overtake the waiting line
+            waiting_line = data
+            waiting_sent = on_sent
+            return False
+        if waiting_line is not None:
+            # A blocking write must not overtake a coalesced line
+            if not buffer_free.wait_for(lambda: waiting_line is None,
+                                        WRITE_TIMEOUT):
+                print(f"Controller not answering, dropped: {cmd}")
+                return False
+        if not buffer_free.wait_for(lambda: fits(len(data)), WRITE_TIMEOUT):
+            print(f"Controller not answering, dropped: {cmd}")
+            return False
+        send(data)
+        return True
+
+
+def outstanding_bytes():
+    """Bytes sent that the controller has not answered yet."""
+    with buffer_free:
+        return sum(sent_lengths)
 
 
 # Create a new thread to run the serial_read function
@@ -0,0 +1,129 @@
+"""
+    Name: replay.py
+    Author:
+    Created:
+    Purpose: Run a recorded gamepad session again without the arm
+    The raw gamepad events of the log go through the same dispatch table
+    as control.py and every recorded tick runs Thor.tick with the same
+    dt, so the G-code lines must come out exactly as recorded. Any
+    difference means the mapping or the motion code changed.
+
+    The serial port is simulated: every line gets the answer it got
+    while recording (sent, or coalesced because the arm was busy), and
+    a coalesced line counts as sent at the point of the log where it
+    really went out.
+
+    python control.py --record session.thr
+    python replay.py session.thr
+    python replay.py session.thr --realtime
+"""
+import os
+import argparse
+from time import perf_counter, sleep
+
+# No arm needed: thor.py opens the serial port on import
+os.environ.setdefault("THOR_PORT", "fake://")
+
+from thor import Thor  # noqa: E402
+import gamepad_input  # noqa: E402
+import session_log  # noqa: E402
+
+
+class SimSerial:
+    """Stands in for my_serial.serial_write, answers like the recording."""
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.lines = []
+        # on_sent of the coalesced lines, by line index
+        self.waiting = {}
+
+    def write(self, cmd, policy=None, on_sent=None):
+        self.lines.append(cmd)
+        index = len(self.lines) - 1
+        if index >= len(self.answers):
+            return True  # more lines than recorded, compare() reports it
+        sent = self.answers[index]
+        if not sent and on_sent:
+            self.waiting[index] = on_sent
+        return sent
+
+    def sent_later(self, index):
+        """The recorded port sent the coalesced line index later."""
+        on_sent = self.waiting.pop(index, None)
+        if on_sent:
+            on_sent()
+
+
+def replay(path, realtime=False, config=None):
+    """Replay a session log, return (recorded lines, sim, tick times)."""
+    codes, records = session_log.read_log(path)
+    recorded = [data for kind, _, data in records
+                if kind == session_log.SERIAL]
+
+    sim = SimSerial(sent for _, sent in recorded)
+    thor = Thor(output=sim.write)
+    table = gamepad_input.compile_table(
+        thor, config or gamepad_input.load_mapping())
+    missing = set(codes) - set(table)
+    if missing:
+        print(f"Not in gamepad_map.ini anymore: {', '.join(sorted(missing))}")
+
+    tick_times = []
+    start = perf_counter()
+    for kind, time, data in records:
+        if realtime:
+            # Wait for the moment the record was made
+            delay = time - (perf_counter() - start)
+            if delay > 0:
+                sleep(delay)
+        if kind == session_log.INPUT:
+            name, value = data
+            handler = table.get(name)
+            if handler is not None:
+                handler(value)
+        elif kind == session_log.TICK:
+            tick_start = perf_counter()
+            thor.tick(data)
+            tick_times.append(perf_counter() - tick_start)
+        elif kind == session_log.SENT:
+            sim.sent_later(data)
+    return [line for line, _ in recorded], sim, tick_times
+
+
+def compare(recorded, replayed):
+    """Print the first difference, return True if the lines are equal."""
+    for i, (old, new) in enumerate(zip(recorded, replayed)):
+        if old != new:
+            print(f"Line {i + 1} differs:")
+            print(f"  recorded: {old}")
+            print(f"  replayed: {new}")
+            return False
+    if len(recorded) != len(replayed):
+        print(f"Recorded {len(recorded)} lines, replayed {len(replayed)}")
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay a recorded Thor gamepad session")
+    parser.add_argument("log", help="session log from control.py --record")
+    parser.add_argument("--realtime", action="store_true",
+                        help="keep the recorded timing instead of "
+                             "running as fast as possible")
+    args = parser.parse_args()
+
+    recorded, sim, tick_times = replay(args.log, args.realtime)
+    same = compare(recorded, sim.lines)
+    print(f"{len(tick_times)} ticks, {len(sim.lines)} G-code lines: "
+          f"{'same as recorded' if same else 'DIFFERENT'}")
+    if tick_times:
+        ms = [t * 1000 for t in tick_times]
+        print(f"tick time: mean {sum(ms) / len(ms):.3f} ms, "
+              f"max {max(ms):.3f} ms")
+    raise SystemExit(0 if same else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+    Name: session_log.py
+    Author:
+    Created:
+    Purpose: Record a gamepad session to a compact binary log
+    The log keeps the raw gamepad events, every motion loop tick and
+    every line written to the serial port, with timestamps, so replay.py
+    can run the exact same session again.
+
+    File layout (little endian):
+    - header: "THRL", version (1 byte), number of codes (2 bytes),
+      then every event code name as length (1 byte) + UTF-8 text
+    - records, each starting with type (1 byte) and time (float64 s):
+      INPUT  code index (uint16), value (int32)
+      TICK   dt (float64)
+      SERIAL sent (1 byte), length (uint16), line (UTF-8)
+      SENT   line (uint32), index of the SERIAL record of a coalesced
+             line that went out later, on an "ok" of the controller
+"""
+import struct
+from threading import RLock
+from time import monotonic
+
+MAGIC = b"THRL"
+VERSION = 2  # 1 had no SENT records, still read
+
+INPUT = 1
+TICK = 2
+SERIAL = 3
+SENT = 4
+
+RECORD = struct.Struct("<Bd")
+INPUT_DATA = struct.Struct("<Hi")
+TICK_DATA = struct.Struct("<d")
+SERIAL_DATA = struct.Struct("<?H")
+SENT_DATA = struct.Struct("<I")
+
+
+class Recorder:
+    def __init__(self, path, codes):
+        self.codes = list(codes)
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        self.file = open(path, "wb")
+        # The input thread and the motion loop both record
+        self.lock = RLock()
+        self.start = monotonic()
+        self.lines = 0  # SERIAL records so far, the index of the next one
+
+        header = MAGIC + struct.pack("<BH", VERSION, len(self.codes))
+        for code in self.codes:
+            name = code.encode("UTF-8")
+            header += struct.pack("<B", len(name)) + name
+        self.file.write(header)
+
+    def input(self, code, value):
+        with self.lock:
+            self.file.write(RECORD.pack(INPUT, monotonic() - self.start))
+            self.file.write(INPUT_DATA.pack(self.index[code], int(value)))
+
+    def tick(self, dt):
+        with self.lock:
+            self.file.write(RECORD.pack(TICK, monotonic() - self.start))
+            self.file.write(TICK_DATA.pack(dt))
+
+    def serial(self, line, sent=True):
+        """sent: False if the serial port coalesced or dropped the line."""
+        data = line.encode("UTF-8")
+        with self.lock:
+            self.file.write(RECORD.pack(SERIAL, monotonic() - self.start))
+            self.file.write(SERIAL_DATA.pack(sent, len(data)) + data)
+            self.lines += 1
+
+    def sent(self, index):
+        """The coalesced line of SERIAL record index was sent later."""
+        with self.lock:
+            if self.file.closed:
+                return  # answered after the session ended
+            self.file.write(RECORD.pack(SENT, monotonic() - self.start))
+            self.file.write(SENT_DATA.pack(index))
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def read_log(path):
+    """
+    Read a session log.
+    Returns the code names and a list of records (type, time, data):
+    INPUT data is (code name, value), TICK data is dt,
+    SERIAL data is (line, sent), SENT data is the index of a SERIAL
+    record.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != MAGIC:
+        raise ValueError(f"{path} is not a Thor session log")
+    version, count = struct.unpack_from("<BH", data, 4)
+    if version not in (1, VERSION):
+        raise ValueError(f"Unknown session log version {version}")
+
+    offset = 7
+    codes = []
+    for i in range(count):
+        length = data[offset]
+        codes.append(data[offset + 1:offset + 1 + length].decode("UTF-8"))
+        offset += 1 + length
+
+    records = []
+    while offset < len(data):
+        kind, time = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        if kind == INPUT:
+            index, value = INPUT_DATA.unpack_from(data, offset)
+            offset += INPUT_DATA.size
+            records.append((kind, time, (codes[index], value)))
+        elif kind == TICK:
+            dt = TICK_DATA.unpack_from(data, offset)[0]
+            offset += TICK_DATA.size
+            records.append((kind, time, dt))
+        elif kind == SERIAL:
+            sent, length = SERIAL_DATA.unpack_from(data, offset)
+            offset += SERIAL_DATA.size
+            line = data[offset:offset + length].decode("UTF-8")
+            offset += length
+            records.append((kind, time, (line, sent)))
+        elif kind == SENT:
+            index = SENT_DATA.unpack_from(data, offset)[0]
+            offset += SENT_DATA.size
+            records.append((kind, time, index))
+        else:
+            raise ValueError(f"Bad record type {kind} in {path}")
+    return codes, records
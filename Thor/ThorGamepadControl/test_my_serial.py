@@ -0,0 +1,61 @@
+"""
+    Name: test_my_serial.py
+    Author:
+    Created:
+    Purpose: Check the flow control of my_serial.py against fake_grbl.py:
+    lines keep going out past the controller buffer, and the count of
+    unanswered bytes starts again after a reset or lost answers. Run
+    with pytest from this folder:
+
+    python -m pytest -q test_my_serial.py
+"""
+import os
+from time import sleep
+
+import pytest
+
+os.environ.setdefault("THOR_PORT", "fake://")
+
+import my_serial  # noqa: E402
+import fake_grbl  # noqa: E402
+
+if my_serial.PORT != my_serial.FAKE_PORT:
+    pytest.skip("THOR_PORT is not the fake controller", allow_module_level=True)
+
+
+@pytest.fixture
+def port(monkeypatch):
+    if not my_serial.read_thread.is_alive():
+        my_serial.read_thread.start()
+    monkeypatch.setattr(my_serial, "ANSWER_TIMEOUT", 0.3)
+    port = my_serial.s0
+    yield port
+    # back to an empty, quick controller for the next test
+    port.line_time = fake_grbl.LINE_TIME
+    port.write(b"\x18")
+    sleep(0.2)
+
+
+def test_lines_go_out_past_the_buffer(port):
+    lines = [f"G0 A{i} B1 C1 D1" for i in range(40)]
+    assert sum(len(line) + 1 for line in lines) > my_serial.RX_BUFFER_SIZE
+    assert all(my_serial.serial_write(line) for line in lines)
+
+
+def test_reset_clears_the_count(port):
+    port.line_time = 10  # busy, nothing is answered
+    results = [my_serial.serial_write("G0 A1", policy="coalesce")
+               for _ in range(30)]
+    assert not results[-1]  # the buffer filled up
+    port.write(b"\x18")  # Ctrl-X, the controller greets again
+    sleep(0.2)
+    assert my_serial.outstanding_bytes() == 0
+    assert my_serial.waiting_line is None
+
+
+def test_lost_answers_time_out(port):
+    port.line_time = 10
+    my_serial.serial_write("G0 A2")
+    assert my_serial.outstanding_bytes()
+    sleep(my_serial.ANSWER_TIMEOUT + 0.3)
+    assert my_serial.outstanding_bytes() == 0
@@ -0,0 +1,76 @@
+"""
+    Name: test_replay.py
+    Author:
+    Created:
+    Purpose: Check that replay.py gives back the G-code lines of a
+    recorded session, also when the arm was busy and lines were
+    coalesced. Run with pytest from this folder:
+
+    python -m pytest -q test_replay.py
+"""
+import os
+
+os.environ.setdefault("THOR_PORT", "fake://")
+
+from thor import Thor  # noqa: E402
+import gamepad_input  # noqa: E402
+import session_log  # noqa: E402
+import replay  # noqa: E402
+
+DT = 0.02
+
+
+class BusyPort:
+    """Takes one line, then coalesces until answer(), like my_serial."""
+
+    def __init__(self):
+        self.busy = False
+        self.waiting = None  # on_sent of the coalesced line
+        self.lines = []
+
+    def write(self, cmd, policy=None, on_sent=None):
+        self.lines.append(cmd)
+        if self.busy:
+            self.waiting = on_sent
+            return False
+        self.busy = True
+        return True
+
+    def answer(self):
+        """The controller answered "ok", the coalesced line goes out"""
+        on_sent, self.waiting = self.waiting, None
+        if on_sent:
+            on_sent()
+        else:
+            self.busy = False
+
+
+def test_replay_with_coalesced_lines(tmp_path):
+    path = str(tmp_path / "session.thr")
+    config = gamepad_input.load_mapping()
+    recorder = session_log.Recorder(path, gamepad_input.mapped_codes(config))
+    port = BusyPort()
+    thor = Thor(output=port.write, recorder=recorder)
+    table = gamepad_input.compile_table(thor, config, recorder=recorder)
+
+    def tick():
+        with recorder.lock:
+            recorder.tick(DT)
+            thor.tick(DT)
+
+    table["BTN_BASE5"](1)  # art_1 held
+    tick()  # sent
+    tick()  # coalesced
+    table["BTN_BASE2"](1)  # art_2 held too
+    tick()  # coalesced, replaces the line before
+    port.answer()  # the waiting line goes out between two ticks
+    table["BTN_BASE5"](0)
+    tick()  # only art_2 moves since the line that went out
+    port.answer()
+    tick()
+    recorder.close()
+
+    assert port.lines[-2].startswith("G0 B")  # no A: it was sent
+    recorded, sim, _ = replay.replay(path)
+    assert recorded == port.lines
+    assert replay.compare(recorded, sim.lines)
@@ -1,6 +1,16 @@
-from time import sleep
+"""
+    Name: thor.py
+    Author:
+    Created:
+    Purpose: Move the Thor arm from the held gamepad buttons and sticks
+    One control loop runs at a fixed rate. Every tick it reads the set
+    of held buttons and the stick positions, moves every axis at once
+    and sends at most one combined G-code line to the arm.
+"""
+from threading import Thread, Lock
+from time import monotonic, sleep
+import my_serial
 from my_serial import serial_write
-import keys
 
 # Movement limits
 CLAW_MIN = 0
@@ -18,118 +28,275 @@ ART2_MAX = 90
 ART1_MIN = -90
 ART1_MAX = 90
 
+# Movement speeds while a button is held, in units per second
+CLAW_SPEED = 250
+CLAW_ROT_SPEED = 10
+CLAW_MOVE_SPEED = 5
+ART4_SPEED = 20
+ART3_SPEED = 10
+ART2_SPEED = 10
+ART1_SPEED = 20
+
+# How many times per second the control loop runs
+TICK_RATE = 50
+
+# Analog stick shaping
+DEAD_ZONE = 0.08  # stick deflection (0.0-1.0) ignored around the center
+EXPO = 0.6  # 0.0 linear, 1.0 fully cubic: fine control near the center
+
+# Every action moves one axis: (attribute, direction)
+ACTIONS = {
+    "open_claw": ("claw", 1),
+    "close_claw": ("claw", -1),
+    "rotate_claw": ("claw_rot", 1),
+    "rotate_claw_cw": ("claw_rot", -1),
+    "move_claw": ("claw_move", 1),
+    "move_claw_b": ("claw_move", -1),
+    "art_4": ("art4", 1),  # wrist rotation
+    "art_4_cw": ("art4", -1),
+    "art_3": ("art3", 1),  # elbow
+    "art_3_b": ("art3", -1),
+    "art_2": ("art2", 1),  # shoulder
+    "art_2_b": ("art2", -1),
+    "art_1": ("art1", 1),  # rotate arm
+    "art_1_cw": ("art1", -1),
+}
+
+# Speed and limits of every axis
+AXES = {
+    "claw": (CLAW_SPEED, CLAW_MIN, CLAW_MAX),
+    "claw_rot": (CLAW_ROT_SPEED, CLAW_ROT_MIN, CLAW_ROT_MAX),
+    "claw_move": (CLAW_MOVE_SPEED, CLAW_MOVE_MIN, CLAW_MOVE_MAX),
+    "art4": (ART4_SPEED, ART4_MIN, ART4_MAX),
+    "art3": (ART3_SPEED, ART3_MIN, ART3_MAX),
+    "art2": (ART2_SPEED, ART2_MIN, ART2_MAX),
+    "art1": (ART1_SPEED, ART1_MIN, ART1_MAX),
+}
+
+
+def shape_axis(value, dead_zone=DEAD_ZONE, expo=EXPO):
+    """
+    Turn a raw stick deflection (-1.0 to 1.0) into a speed command.
+    Deflections inside the dead zone give 0, the rest is rescaled to
+    0-1 and bent by the expo curve, so small moves are slow and precise
+    while full deflection still gives full speed.
+    """
+    magnitude = abs(value)
+    if magnitude <= dead_zone:
+        return 0.0
+    magnitude = min(1.0, (magnitude - dead_zone) / (1.0 - dead_zone))
+    magnitude = (1.0 - expo) * magnitude + expo * magnitude**3
+    return magnitude if value > 0 else -magnitude
+
+
+def fmt(value):
+    """Format a G-code number, 2 decimals are plenty for the arm."""
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def recorded_sent(recorder, index, on_sent):
+    """
+    Wrap the on_sent of a coalesced line so the log keeps when it was
+    sent. The recorder lock keeps it out of a tick, so replay.py runs
+    it between the same two ticks.
+    """
+    def sent():
+        with recorder.lock:
+            recorder.sent(index)
+            on_sent()
+    return sent
+
 
 class Thor:
-    def __init__(self) -> None:
-        self.event = ""
+    def __init__(self, rate=TICK_RATE, output=None, recorder=None) -> None:
+        self.rate = rate
+        self.running = False
+        # Where the G-code lines go, my_serial unless replaying
+        self.output = output or serial_write
+        # session_log.Recorder, records every tick and line when set
+        self.recorder = recorder
+        # Held actions, written by the input thread, read by the loop
+        self.held = set()
+        # Shaped analog stick commands (-1.0 to 1.0) for each axis
+        self.analog = {}
+        self.home_requested = False
+        self.lock = Lock()
         # current positions
         self.claw = 500
-        self.y = 0
-        self.z = 0
         self.claw_rot = 0
         self.claw_move = 0
         self.art4 = 0
         self.art3 = 0
         self.art2 = 0
         self.art1 = 0
+        # G-code words of the last line the serial port accepted
+        self.sent_words = self.gcode_words()
+        # Motion lines written, and the number of the one in sent_words
+        self.line_number = self.sent_number = 0
+
+    # Latest state and machine position reported by the controller
+    @property
+    def state(self):
+        return my_serial.state
+
+    @property
+    def position(self):
+        return my_serial.position
+
+    # y and z together drive the claw rotate and move functions
+    @property
+    def y(self):
+        return self.claw_rot - self.claw_move
+
+    @property
+    def z(self):
+        return self.claw_rot + self.claw_move
 
-    def open_claw(self):
-        while self.claw < CLAW_MAX and self.event != keys._L2 and self.event:
-            self.claw += 1
-            serial_write(f"M3 S{self.claw}")
-
-    def close_claw(self):
-        while self.claw > CLAW_MIN and self.event != keys._L1 and self.event:
-            self.claw -= 1  # step can be adjustable
-            serial_write(f"M3 S{self.claw}")
-            sleep(0.002)  # can be adjustable
-
-    def rotate_claw(self):
-        while self.claw_rot < CLAW_ROT_MAX and self.event != keys._RIGHT and self.event:
-            self.claw_rot += 1
-            # y and x are needed to track positions for claw move and rotate functions together
-            self.y += 1
-            self.z += 1
-            serial_write(f"G0 Y{self.y} Z{self.z}")
-            sleep(0.1)
-
-    def rotate_claw_cw(self):
-        while self.claw_rot > CLAW_ROT_MIN and self.event != keys._LEFT and self.event:
-            self.claw_rot -= 1
-            self.y -= 1
-            self.z -= 1
-            serial_write(f"G0 Y{self.y} Z{self.z}")
-            sleep(0.1)
-
-    def move_claw(self):
-        while (
-            self.claw_move < CLAW_MOVE_MAX and self.event != keys._DOWN and self.event
-        ):
-            self.claw_move += 0.1
-            self.y -= 0.1
-            self.z += 0.1
-            serial_write(f"G0 Y{self.y} Z{self.z}")
-            sleep(0.02)
-
-    def move_claw_b(self):
-        while self.claw_move > CLAW_MOVE_MIN and self.event != keys._UP and self.event:
-            self.claw_move -= 0.1
-            self.y += 0.1
-            self.z -= 0.1
-            serial_write(f"G0 Y{self.y} Z{self.z}")
-            sleep(0.02)
-
-    def art_4(self):  # wrist rotation
-        while self.art4 < ART4_MAX and self.event != keys._A_2 and self.event:
-            self.art4 += 2
-            serial_write(f"G0 X{self.art4}")
-            sleep(0.1)
-
-    def art_4_cw(self):
-        while self.art4 > ART4_MIN and self.event != keys._Y_4 and self.event:
-            self.art4 -= 2
-            serial_write(f"G0 X{self.art4}")
-            sleep(0.1)
-
-    def art_3(self):  # elbow
-        while self.art3 < ART3_MAX and self.event != keys._X_1 and self.event:
-            self.art3 += 1
-            serial_write(f"G0 D{self.art3}")
-            sleep(0.1)
-
-    def art_3_b(self):
-        while self.art3 > ART3_MIN and self.event != keys._B_3 and self.event:
-            self.art3 -= 1
-            serial_write(f"G0 D{self.art3}")
-            sleep(0.1)
-
-    def art_2(self):  # shoulder
-        while self.art2 < ART2_MAX and self.event != keys._R2 and self.event:
-            self.art2 += 1
-            serial_write(f"G0 B{self.art2} C{self.art2}")
-            sleep(0.1)
-
-    def art_2_b(self):
-        while self.art2 > ART2_MIN and self.event != keys._R1 and self.event:
-            self.art2 -= 1
-            serial_write(f"G0 B{self.art2} C{self.art2}")
-            sleep(0.1)
-
-    def art_1(self):  # rotate arm
-        while self.art1 < ART1_MAX and self.event != keys._L_AN and self.event:
-            self.art1 += 2
-            serial_write(f"G0 A{self.art1}")
-            sleep(0.1)
-
-    def art_1_cw(self):
-        while self.art1 > ART1_MIN and self.event != keys._R_AN and self.event:
-            self.art1 -= 2
-            serial_write(f"G0 A{self.art1}")
-            sleep(0.1)
+    # ----------------------------- INPUT ---------------------------------- #
+    def press(self, action):
+        with self.lock:
+            self.held.add(action)
+
+    def release(self, action):
+        with self.lock:
+            self.held.discard(action)
+
+    def release_all(self):
+        with self.lock:
+            self.held.clear()
+            self.analog.clear()
+
+    def set_analog(self, attribute, value):
+        """Set an axis speed from a raw stick deflection (-1.0 to 1.0)."""
+        value = shape_axis(value)
+        with self.lock:
+            if value:
+                self.analog[attribute] = value
+            else:
+                self.analog.pop(attribute, None)
 
     def home(self):
-        serial_write("M3 S500")
-        serial_write("G1 A0 B0 C0 D0 X0 Y0 Z0 F500")
+        # Done by the control loop, so only one thread writes to the port
+        with self.lock:
+            self.held.clear()
+            self.analog.clear()
+            self.home_requested = True
+
+    # ----------------------------- CONTROL -------------------------------- #
+    def tick(self, dt):
+        """Move every held axis by dt seconds, return the G-code sent."""
+        with self.lock:
+            held = list(self.held)
+            analog = list(self.analog.items())
+            home = self.home_requested
+            self.home_requested = False
+
+        if home:
+            return self.send_home()
+
+        # Buttons give full speed, sticks a part of it
+        commands = {}
+        for action in held:
+            attribute, direction = ACTIONS[action]
+            commands[attribute] = commands.get(attribute, 0) + direction
+        for attribute, value in analog:
+            commands[attribute] = commands.get(attribute, 0) + value
+
+        for attribute, command in commands.items():
+            speed, low, high = AXES[attribute]
+            # Never faster than the axis speed limit
+            command = max(-1.0, min(1.0, command))
+            value = getattr(self, attribute) + command * speed * dt
+            setattr(self, attribute, max(low, min(high, value)))
+
+        # Only send the words that changed, all in one line
+        current = self.gcode_words()
+        words = [w for w, s in zip(current, self.sent_words) if w != s]
+        if not words:
+            return None
+        motion = [w for w in words if not w.startswith("S")]
+        claw = [w for w in words if w.startswith("S")]
+        line = " ".join(
+            (["G0"] + motion if motion else []) + (["M3"] + claw if claw else [])
+        )
+        # Positions are absolute, so when the controller is busy only the
+        # newest line needs to wait. Until a coalesced line is really sent
+        # the next line repeats every word changed since the last sent one,
+        # so replacing it loses nothing.
+        self.line_number += 1
+        number = self.line_number
+
+        def coalesced_sent():
+            # A newer line may have been sent right after this one
+            if number > self.sent_number:
+                self.sent_words = current
+                self.sent_number = number
+        if self.write(line, policy="coalesce", on_sent=coalesced_sent):
+            self.sent_words = current
+            self.sent_number = number
+        return line
+
+    def gcode_words(self):
+        return [
+            f"A{fmt(self.art1)}",
+            f"B{fmt(self.art2)}",
+            f"C{fmt(self.art2)}",
+            f"D{fmt(self.art3)}",
+            f"X{fmt(self.art4)}",
+            f"Y{fmt(self.y)}",
+            f"Z{fmt(self.z)}",
+            f"S{fmt(self.claw)}",
+        ]
+
+    def write(self, line, policy=None, on_sent=None):
+        recorder = self.recorder
+        if recorder and on_sent:
+            on_sent = recorded_sent(recorder, recorder.lines, on_sent)
+        sent = self.output(line, policy=policy, on_sent=on_sent)
+        if recorder:
+            recorder.serial(line, sent)
+        return sent
+
+    def send_home(self):
+        self.write("M3 S500")
+        self.write("G1 A0 B0 C0 D0 X0 Y0 Z0 F500")
         self.claw = 500
-        self.y = self.z = self.claw_rot = self.claw_move = 0
+        self.claw_rot = self.claw_move = 0
         self.art4 = self.art3 = self.art2 = self.art1 = 0
+        self.sent_words = self.gcode_words()
+        self.line_number += 1  # a coalesced line sent after this is older
+        self.sent_number = self.line_number
+        return "G1 A0 B0 C0 D0 X0 Y0 Z0 F500"
+
+    def run(self):
+        """Run the control loop at a fixed rate until stop() is called."""
+        period = 1 / self.rate
+        last = next_tick = monotonic()
+        self.running = True
+        while self.running:
+            now = monotonic()
+            if self.recorder:
+                # Gamepad events wait for the whole tick, so the log
+                # keeps the order in which Thor really saw them
+                with self.recorder.lock:
+                    self.recorder.tick(now - last)
+                    self.tick(now - last)
+            else:
+                self.tick(now - last)
+            last = now
+            next_tick += period
+            delay = next_tick - monotonic()
+            if delay > 0:
+                sleep(delay)
+            else:
+                # Fell behind, start counting again instead of catching up
+                next_tick = monotonic()
+
+    def start(self):
+        """Run the control loop in a daemon thread."""
+        thread = Thread(target=self.run, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.running = False
@@ -7,10 +7,24 @@
     changing the voice, volume, and speed rate of the audio.
     https://pypi.org/project/pyttsx3/
     https://pyttsx3.readthedocs.io/en/latest/
+
+    speak() never waits for Thor to finish talking: the text goes into
+    a queue and one speech thread says it. Every phrase is rendered to
+    a sound file once and cached by text, voice, rate and volume, so
+    saying it again only plays the file. The known phrases (sayings and
+    greetings) are rendered in the background when nothing is said.
 """
 # Linux:   pip3 install pyttsx3
 # Windows: pip install pyttsx3
 import pyttsx3
+import os
+import sys
+import wave
+import hashlib
+import subprocess
+from queue import PriorityQueue, Empty
+from threading import Thread, Event, Lock
+from itertools import count
 from time import sleep, strftime
 from datetime import datetime
 from random import choice, randint
@@ -20,6 +34,15 @@ RATE = 125    # integer default 200 words per minute
 VOLUME = 0.9  # float 0.0-1.0 inclusive default 1.0
 VOICE = 0     # Set 1 for Zira (female), 0 for David (male)
 
+# Rendered phrases are kept here, next to this script
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "speech_cache")
+
+# speak() priorities, the lowest number is said first
+URGENT = 0
+NORMAL = 1
+CHATTER = 2
+
 thor_sayings = [
     "Hello, I am Thor. Let's have fun!",
     "Do you want to have fun?",
@@ -42,13 +65,159 @@ thor_sayings = [
     "As You Wish.",
 ]
 
-# init function creates an engine instance/object for speech synthesis
-engine = pyttsx3.init()
+GREETINGS = [
+    "Good morning.",
+    "Good afternoon.",
+    "Good evening.",
+    "Good night.",
+    "I am Thor.",
+    "How may I help you today?",
+]
+
+
+# -------------------------- PLAYBACK -------------------------------------- #
+class Player:
+    """Play a wav file, stop() ends it early."""
+
+    def __init__(self):
+        self.process = None
+        # Set by stop(), cleared before every new phrase
+        self.stopped = Event()
+
+    def play(self, path):
+        if sys.platform == "win32":
+            import winsound
+            winsound.PlaySound(path, winsound.SND_FILENAME | winsound.SND_ASYNC)
+            # PlaySound can't tell when it is done, wait the file length
+            with wave.open(path) as w:
+                length = w.getnframes() / w.getframerate()
+            if self.stopped.wait(length):
+                winsound.PlaySound(None, 0)
+        else:
+            command = ["afplay", path] if sys.platform == "darwin" \
+                else ["aplay", "-q", path]
+            self.process = subprocess.Popen(command)
+            if self.stopped.is_set():  # stopped while starting
+                self.process.terminate()
+            self.process.wait()
+            self.process = None
+
+    def stop(self):
+        self.stopped.set()
+        process = self.process
+        if process is not None:
+            process.terminate()
+
+
+# -------------------------- SPEECH THREAD --------------------------------- #
+class Speech:
+    def __init__(self, rate=RATE, volume=VOLUME, voice=VOICE,
+                 phrases=thor_sayings + GREETINGS):
+        self.rate = rate
+        self.volume = volume
+        self.voice = voice
+        # Phrases still to render while nothing is said
+        self.to_render = list(phrases)
+        self.queue = PriorityQueue()
+        self.order = count()  # keeps the same priority first in, first out
+        # Raised by every interrupt, older phrases are not said anymore
+        self.generation = 0
+        self.lock = Lock()
+        self.player = Player()
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def cache_path(self, text):
+        """Sound file of text with the current voice, rate and volume."""
+        key = f"{text}|{self.voice}|{self.rate}|{self.volume}"
+        name = hashlib.sha1(key.encode("UTF-8")).hexdigest()
+        return os.path.join(CACHE_DIR, name + ".wav")
+
+    def render(self, text, engine):
+        """Render text to its cache file once, return the file."""
+        path = self.cache_path(text)
+        if not os.path.exists(path):
+            temp = path + ".tmp.wav"
+            engine.save_to_file(text, temp)
+            engine.runAndWait()
+            # Only complete files get the cache name
+            os.replace(temp, path)
+        return path
+
+    def run(self):
+        if sys.platform == "win32":
+            import comtypes
+            comtypes.CoInitialize()  # the Windows voices need COM here
+        # The engine is used by this thread only, pyttsx3 isn't thread safe
+        engine = pyttsx3.init()
+        engine.setProperty('rate', self.rate)
+        engine.setProperty('volume', self.volume)
+        engine.setProperty('voice', self.voice)
+        while True:
+            try:
+                # Render the known phrases while nothing is queued
+                wait = 0 if self.to_render else None
+                priority, order, generation, text = self.queue.get(
+                    timeout=wait)
+            except Empty:
+                # The phrase leaves the list even if it fails, so a bad
+                # engine or cache folder can't stop the thread or loop
+                text = self.to_render.pop(0)
+                try:
+                    self.render(text, engine)
+                except Exception as e:
+                    print(f"Speech render failed: {e}")
+                continue
+            try:
+                self.player.stopped.clear()
+                path = self.render(text, engine)
+                if generation == self.generation:
+                    self.player.play(path)
+            except Exception as e:
+                print(f"Speech failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    def say(self, text, priority=NORMAL, interrupt=False):
+        """Queue text and return at once. interrupt stops all other speech."""
+        with self.lock:
+            if interrupt:
+                self.generation += 1
+                self.clear()
+                self.player.stop()
+            self.queue.put((priority, next(self.order), self.generation, text))
+
+    def clear(self):
+        """Drop everything still waiting to be said."""
+        while True:
+            try:
+                self.queue.get_nowait()
+            except Empty:
+                return
+            self.queue.task_done()
+
+    def stop(self):
+        """Stop talking now."""
+        with self.lock:
+            self.generation += 1
+            self.clear()
+            self.player.stop()
+
+    def wait(self):
+        """Block until everything queued has been said."""
+        self.queue.join()
+
+
+speech = None
+
 
-# Set text engine properties
-engine.setProperty('rate', RATE)
-engine.setProperty('volume', VOLUME)
-engine.setProperty('voice', VOICE)
+def start():
+    """Start the speech thread, speak() calls it when needed."""
+    global speech
+    if speech is None:
+        speech = Speech()
+    return speech
 
 
 # -------------------------- SPEAK TIME ------------------------------------ #
@@ -66,18 +235,16 @@ def greeting():
     speak("I am Thor.")
 
     current_time = strftime("%I:%M %p")
-    # Pass text to engine.say method
+    # Queue the text for the speech thread
     speak(f"The current time is {current_time}")
 
     speak("How may I help you today?")
 
 
 # -------------------------- SPEAK TEXT ------------------------------------ #
-def speak(text):
-    # Pass text to engine.say method
-    engine.say(text)
-    # Processes and speaks the text
-    engine.runAndWait()
+def speak(text, priority=NORMAL, interrupt=False):
+    # Queue the text, the speech thread renders (once) and plays it
+    start().say(text, priority, interrupt)
 
 
 def main():
@@ -87,10 +254,11 @@ def main():
             sleep(randint(5, 15))
             # Select a random saying
             saying = choice(thor_sayings)
-            speak(saying)
+            speak(saying, CHATTER)
 
         except KeyboardInterrupt:
-            speak("I'll be back.")
+            speak("I'll be back.", URGENT, interrupt=True)
+            speech.wait()
             break
 
 
@@ -0,0 +1,139 @@
+"""
+    Filename: motor_scheduler.py
+    Description: Run the movements of several MotorWithEncoder motors at
+    the same time with asyncio, instead of one blocking loop after the
+    other. Copy it to the CIRCUITPY drive next to code.py, with the
+    asyncio and adafruit_ticks libraries in lib.
+
+    Every motor has its own list of movements, run one after the other,
+    and the lists of all the motors run together. One task reads all
+    the encoders every SAMPLE_INTERVAL and prints them on one line.
+
+        scheduler = MotorScheduler({"Motor_A": motor_a, "Motor_B": motor_b})
+        scheduler.run([
+            Movement("Motor_A", "Forward slow", 0.5, 2),
+            Movement("Motor_B", "Forward fast", 1.0, 1, on_done=stopped),
+            Movement("Motor_B", "Backwards slow", -0.5, 1),
+        ])
+
+    Motor_A runs for 2 seconds while Motor_B does both of its 1 second
+    movements, every motor keeps its own durations.
+"""
+
+# Import necessary libraries
+import time  # For the sampling deadlines
+import asyncio  # For running the movements together
+
+SAMPLE_INTERVAL = 0.1  # Seconds between encoder readings
+
+
+class Movement:
+    """
+    One movement of one motor.
+
+    Parameters:
+    - motor_name: The name of the motor in the scheduler.
+    - description: A string describing the movement (e.g., "Forward slow").
+    - throttle: The motor speed (-1.0 for full reverse,
+      1.0 for full forward, None for free spin).
+    - duration: The duration of the movement in seconds.
+    - on_done: Called with the motor name and its angle in degrees
+      when the movement is over (optional).
+    """
+
+    def __init__(self, motor_name, description, throttle, duration, on_done=None):
+        self.motor_name = motor_name
+        self.description = description
+        self.throttle = throttle
+        self.duration = duration
+        self.on_done = on_done
+
+
+class MotorScheduler:
+    """
+    Runs movements of several motors at the same time.
+    """
+
+    def __init__(self, motors, sample_interval=SAMPLE_INTERVAL, verbose=True):
+        """
+        Parameters:
+        - motors: A dict of motor name to MotorWithEncoder.
+        - sample_interval: Seconds between encoder readings.
+        - verbose: Print the movements and the encoder angles.
+        """
+        self.motors = motors
+        self.sample_interval = sample_interval
+        self.verbose = verbose
+        # Encoder angle of every motor in degrees, from the last reading
+        self.angles = {name: 0.0 for name in motors}
+        # Movement running now on every motor
+        self.running = {}
+        self._sampling = False
+
+# ------------------------------ SAMPLE ------------------------------------ #
+    def sample(self):
+        """Read all the encoders once"""
+        for name, motor in self.motors.items():
+            self.angles[name] = motor.to_degrees(motor.encoder.position)
+
+    async def _sample_task(self):
+        """Read all the encoders at a fixed rate while movements run"""
+        next_time = time.monotonic()
+        while self._sampling:
+            self.sample()
+            if self.verbose and self.running:
+                print("  ".join(f"{name}: {self.angles[name]:.2f}"
+                                for name in self.running))
+            next_time += self.sample_interval
+            delay = next_time - time.monotonic()
+            if delay < 0:
+                next_time = time.monotonic()  # Fell behind, start again
+                delay = 0
+            await asyncio.sleep(delay)
+
+# ------------------------------ MOVE -------------------------------------- #
+    async def _move(self, movement):
+        """Run one movement, the other motors keep going meanwhile"""
+        name = movement.motor_name
+        motor = self.motors[name]
+        if self.verbose:
+            print(name, movement.description)
+        self.running[name] = movement
+        motor.motor.throttle = movement.throttle  # Set the motor speed
+        await asyncio.sleep(movement.duration)
+        motor.motor.throttle = 0  # Stop the motor after the movement
+        del self.running[name]
+        angle = motor.to_degrees(motor.encoder.position)
+        self.angles[name] = angle
+        if movement.on_done:
+            movement.on_done(name, angle)
+
+    async def _run_motor(self, movements):
+        """The movements of one motor, one after the other"""
+        for movement in movements:
+            await self._move(movement)
+
+    async def run_async(self, movements):
+        """Run a list of movements, the ones of different motors together"""
+        per_motor = {}
+        for movement in movements:
+            per_motor.setdefault(movement.motor_name, []).append(movement)
+        self._sampling = True
+        sampler = asyncio.create_task(self._sample_task())
+        try:
+            await asyncio.gather(*(self._run_motor(motor_movements)
+                                   for motor_movements in per_motor.values()))
+        finally:
+            self._sampling = False
+            await sampler
+            self.stop()
+
+    def run(self, movements):
+        """Run a list of movements and return when all of them are over"""
+        asyncio.run(self.run_async(movements))
+
+    def stop(self):
+        """Stop all the motors"""
+        for motor in self.motors.values():
+            motor.motor.throttle = 0
+        self.running.clear()
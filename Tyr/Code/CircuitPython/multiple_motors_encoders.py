@@ -1,15 +1,15 @@
 """
-    Filename: test_motor_and_encoder.py
-    Description: CircuitPython code to drive a single motor 
-    and read encoder values using OOP.
+    Filename: multiple_motors_encoders.py
+    Description: CircuitPython code to drive three motors at the same
+    time and read their encoder values using OOP.
 """
 
 # Import necessary libraries
-import time  # For delays and timing
 import board  # For accessing board pins
 import pwmio  # For generating PWM signals
 import rotaryio  # For reading rotary encoders
 from adafruit_motor import motor  # For motor control
+from motor_scheduler import MotorScheduler, Movement  # For moving the motors together
 
 # Timers are for the motor run time
 TIMER_LONG = 15
@@ -71,118 +71,71 @@ class MotorWithEncoder:
         """
         return (position * 360.0) / self.counts_per_rev
 
-# ----------------------------- PERFORM MOVEMENT --------------------------- #
-    def perform_movement(self, description, motor_name, throttle, duration):
-        """
-        Perform a motor movement while reading and displaying encoder values.
-
-        Parameters:
-        - description: A string describing the movement (e.g., "Forward slow").
-        - throttle: The motor speed (-1.0 for full reverse,
-          1.0 for full forward, None for free spin).
-        - duration: The duration of the movement in seconds.
-        """
-        print(motor_name) # Prints the motor name to tell the difference
-        print(description)  # Print the description of the movement
-        
-
-        self.motor.throttle = throttle  # Set the motor speed
-
-        start_time = time.monotonic()  # Record the start time
-
-        while time.monotonic() - start_time < duration:
-            # Loop for the specified duration
 
-            # Read the encoder position and convert it to degrees
-            angle = self.to_degrees(self.encoder.position)
-
-            # Print the current encoder angle
-            print(f"Encoder Angle ({self}): {angle:.2f} degrees")
-            time.sleep(0.1)  # Wait for 0.1 seconds before reading again
-        self.motor.throttle = 0  # Stop the motor after the movement
+def print_done(motor_name, angle):
+    """Completion callback of the scheduler, prints where a motor stopped"""
+    print(f"{motor_name} done at {angle:.2f} degrees")
 
 
 def main():
     """
     Main function to run the motor and encoder test.
     """
+    # Create an instance of the MotorWithEncoder class for Motor A
+    motor_with_encoder_A = MotorWithEncoder(
+        motor_p_pin=board.MOTOR_A_P,
+        motor_n_pin=board.MOTOR_A_N,
+        encoder_a_pin=board.ENCODER_A_A,
+        encoder_b_pin=board.ENCODER_A_B,
+        gear_ratio=50
+    )
+
+    # Create an instance of the MotorWithEncoder class for Motor B
+    motor_with_encoder_B = MotorWithEncoder(
+        motor_p_pin=board.MOTOR_B_P,
+        motor_n_pin=board.MOTOR_B_N,
+        encoder_a_pin=board.ENCODER_B_A,
+        encoder_b_pin=board.ENCODER_B_B,
+        gear_ratio=50
+    )
+    # Create an instance of the MotorWithEncoder class for Motor C
+    motor_with_encoder_C = MotorWithEncoder(
+        motor_p_pin=board.MOTOR_C_P,
+        motor_n_pin=board.MOTOR_C_N,
+        encoder_a_pin=board.ENCODER_C_A,
+        encoder_b_pin=board.ENCODER_C_B,
+        gear_ratio=50
+    )
+
+    # The scheduler runs the movements of the three motors at the same
+    # time and reads all the encoders together, see motor_scheduler.py
+    scheduler = MotorScheduler({
+        "Motor_A": motor_with_encoder_A,
+        "Motor_B": motor_with_encoder_B,
+        "Motor_C": motor_with_encoder_C,
+    })
+
+    # Every step moves all the motors together for TIMER_LONG
+    steps = [
+        ("Forward fast", FORWARD_FAST),
+        ("Forward slow", FORWARD_SLOW),
+        ("Backwards fast", BACKWARD_FAST),
+        ("Backwards slow", BACKWARD_SLOW),
+    ]
     try:
-        # Create an instance of the MotorWithEncoder class for Motor A
-        motor_with_encoder_A = MotorWithEncoder(
-            motor_p_pin=board.MOTOR_A_P,
-            motor_n_pin=board.MOTOR_A_N,
-            encoder_a_pin=board.ENCODER_A_A,
-            encoder_b_pin=board.ENCODER_A_B,
-            gear_ratio=50
-        )
-        
-        # Create an instance of the MotorWithEncoder class for Motor B
-        motor_with_encoder_B = MotorWithEncoder(
-            motor_p_pin=board.MOTOR_B_P,
-            motor_n_pin=board.MOTOR_B_N,
-            encoder_a_pin=board.ENCODER_B_A,
-            encoder_b_pin=board.ENCODER_B_B,
-            gear_ratio=50
-        )
-        # Create an instance of the MotorWithEncoder class for Motor C
-        motor_with_encoder_C = MotorWithEncoder(
-            motor_p_pin=board.MOTOR_C_P,
-            motor_n_pin=board.MOTOR_C_N,
-            encoder_a_pin=board.ENCODER_C_A,
-            encoder_b_pin=board.ENCODER_C_B,
-            gear_ratio=50
-        )
-    while True:
-            # Perform a series of movements with the motor
-            # Move forward at 50% speed for 1 second
-            motor_with_encoder_A.perform_movement("Forward slow", "Motor_A", FORWARD_FAST, TIMER_LONG)
-            motor_with_encoder_B.perform_movement("Forward slow", "Motor_B", FORWARD_FAST, TIMER_LONG)
-            motor_with_encoder_C.perform_movement("Forward slow", "Motor_C", FORWARD_FAST, TIMER_LONG)
-
-            # Move forward at full speed for 1 second
-            motor_with_encoder_A.perform_movement("Forward fast", "Motor_A", FORWARD_SLOW, TIMER_LONG)
-            motor_with_encoder_B.perform_movement("Forward fast", "Motor_B", FORWARD_SLOW, TIMER_LONG)
-            motor_with_encoder_C.perform_movement("Forward fast", "Motor_C", FORWARD_SLOW, TIMER_LONG)
-            
-            # Move backward at 50% speed for 1 second
-            motor_with_encoder_A.perform_movement("Backwards slow", "Motor_A", BACKWARD_FAST, TIMER_LONG)
-            motor_with_encoder_B.perform_movement("Backwards slow", "Motor_B", BACKWARD_FAST, TIMER_LONG)
-            motor_with_encoder_C.perform_movement("Backwards slow", "Motor_C", BACKWARD_FAST, TIMER_LONG)
-            
-            # Move backward at full speed for 1 second
-            motor_with_encoder_A.perform_movement("Backwards fast", "Motor_A", BACKWARD_SLOW, TIMER_LONG)
-            motor_with_encoder_B.perform_movement("Backwards fast", "Motor_B", BACKWARD_SLOW, TIMER_LONG)
-            motor_with_encoder_C.perform_movement("Backwards fast", "Motor_C", BACKWARD_SLOW, TIMER_LONG)
-        
-
-        #Stops the motors
-        # motor_with_encoder_A.perform_movement(
-            #"Stop", 0, 1)  # Stop the motor for 1 second        
-        #motor_with_encoder_B.perform_movement(
-            #"Stop", 0, 1)  # Stop the motor for 1 second
-        
-        
-        
-        """
-        # Move forward at full speed for 1 second
-        motor_with_encoder.perform_movement("Forward fast", 1.0, 1)
-        # Let the motor spin freely for 1 second
-        motor_with_encoder.perform_movement("Spin freely", None, 1)
-        # Move backward at 50% speed for 1 second
-        motor_with_encoder.perform_movement("Backwards slow", -0.5, 1)
-        motor_with_encoder.perform_movement(
-            "Stop", 0, 1)  # Stop the motor for 1 second
-        # Move backward at full speed for 1 second
-        motor_with_encoder.perform_movement("Backwards fast", -1.0, 1)
-        # Let the motor spin freely for 1 second
-        motor_with_encoder.perform_movement("Spin freely", None, 1)
-        """
+        while True:
+            for description, throttle in steps:
+                scheduler.run([
+                    Movement("Motor_A", description, throttle, TIMER_LONG, print_done),
+                    Movement("Motor_B", description, throttle, TIMER_LONG, print_done),
+                    Movement("Motor_C", description, throttle, TIMER_LONG, print_done),
+                ])
 
     except KeyboardInterrupt:
         # Handle the case where the user interrupts the program (e.g., with Ctrl+C)
-        print("Stopping motor...")  # Print a message
-        motor_with_encoder.motor.throttle = 0  # Stop the motor
+        print("Stopping motors...")  # Print a message
+        scheduler.stop()  # Stop all the motors
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,15 +1,16 @@
 """
     Filename: test_motor_and_encoder.py
     Description: CircuitPython code to drive a single motor 
-    and read encoder values using OOP.
+    and read encoder values using OOP. Needs motor_scheduler.py next
+    to it on the CIRCUITPY drive.
 """
 
 # Import necessary libraries
-import time  # For delays and timing
 import board  # For accessing board pins
 import pwmio  # For generating PWM signals
 import rotaryio  # For reading rotary encoders
 from adafruit_motor import motor  # For motor control
+from motor_scheduler import MotorScheduler, Movement  # For timing the movements
 
 
 class MotorWithEncoder:
@@ -64,71 +65,41 @@ class MotorWithEncoder:
         """
         return (position * 360.0) / self.counts_per_rev
 
-# ----------------------------- PERFORM MOVEMENT --------------------------- #
-    def perform_movement(self, description, throttle, duration):
-        """
-        Perform a motor movement while reading and displaying encoder values.
-
-        Parameters:
-        - description: A string describing the movement (e.g., "Forward slow").
-        - throttle: The motor speed (-1.0 for full reverse,
-          1.0 for full forward, None for free spin).
-        - duration: The duration of the movement in seconds.
-        """
-        print(description)  # Print the description of the movement
-
-        self.motor.throttle = throttle  # Set the motor speed
-
-        start_time = time.monotonic()  # Record the start time
-
-        while time.monotonic() - start_time < duration:
-            # Loop for the specified duration
-
-            # Read the encoder position and convert it to degrees
-            angle = self.to_degrees(self.encoder.position)
-
-            # Print the current encoder angle
-            print(f"Encoder Angle: {angle:.2f} degrees")
-            time.sleep(0.1)  # Wait for 0.1 seconds before reading again
-        self.motor.throttle = 0  # Stop the motor after the movement
-
 
 def main():
     """
     Main function to run the motor and encoder test.
     """
-    try:
-        # Create an instance of the MotorWithEncoder class
-        motor_with_encoder = MotorWithEncoder(
-            motor_p_pin=board.MOTOR_A_P,
-            motor_n_pin=board.MOTOR_A_N,
-            encoder_a_pin=board.ENCODER_A_A,
-            encoder_b_pin=board.ENCODER_A_B,
-            gear_ratio=50
-        )
+    # Create an instance of the MotorWithEncoder class
+    motor_with_encoder = MotorWithEncoder(
+        motor_p_pin=board.MOTOR_A_P,
+        motor_n_pin=board.MOTOR_A_N,
+        encoder_a_pin=board.ENCODER_A_A,
+        encoder_b_pin=board.ENCODER_A_B,
+        gear_ratio=50
+    )
+
+    # The scheduler runs the movements one after the other and reads
+    # the encoder meanwhile, see motor_scheduler.py
+    scheduler = MotorScheduler({"Motor_A": motor_with_encoder})
 
-        # Perform a series of movements with the motor
-        # Move forward at 50% speed for 1 second
-        motor_with_encoder.perform_movement("Forward slow", 0.5, 1)
-        motor_with_encoder.perform_movement(
-            "Stop", 0, 1)  # Stop the motor for 1 second
-        # Move forward at full speed for 1 second
-        motor_with_encoder.perform_movement("Forward fast", 1.0, 1)
-        # Let the motor spin freely for 1 second
-        motor_with_encoder.perform_movement("Spin freely", None, 1)
-        # Move backward at 50% speed for 1 second
-        motor_with_encoder.perform_movement("Backwards slow", -0.5, 1)
-        motor_with_encoder.perform_movement(
-            "Stop", 0, 1)  # Stop the motor for 1 second
-        # Move backward at full speed for 1 second
-        motor_with_encoder.perform_movement("Backwards fast", -1.0, 1)
-        # Let the motor spin freely for 1 second
-        motor_with_encoder.perform_movement("Spin freely", None, 1)
+    try:
+        # Perform a series of movements with the motor, 1 second each
+        scheduler.run([
+            Movement("Motor_A", "Forward slow", 0.5, 1),     # 50% speed
+            Movement("Motor_A", "Stop", 0, 1),
+            Movement("Motor_A", "Forward fast", 1.0, 1),     # Full speed
+            Movement("Motor_A", "Spin freely", None, 1),
+            Movement("Motor_A", "Backwards slow", -0.5, 1),  # 50% speed
+            Movement("Motor_A", "Stop", 0, 1),
+            Movement("Motor_A", "Backwards fast", -1.0, 1),  # Full speed
+            Movement("Motor_A", "Spin freely", None, 1),
+        ])
 
     except KeyboardInterrupt:
         # Handle the case where the user interrupts the program (e.g., with Ctrl+C)
         print("Stopping motor...")  # Print a message
-        motor_with_encoder.motor.throttle = 0  # Stop the motor
+        scheduler.stop()  # Stop the motor
 
 
 if __name__ == "__main__":
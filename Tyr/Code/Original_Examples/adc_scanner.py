@@ -0,0 +1,186 @@
+"""
+    Name: adc_scanner.py
+    Author:
+    Created:
+    Purpose: Read the channels behind the analog mux of a Motor2040
+    (motor currents, battery voltage, sensors) on a fixed schedule,
+    without blocking the motor loop. Copy it to the CIRCUITPY drive next
+    to code.py.
+
+    Every channel gets a time slot, scan_rate scans of all the channels
+    per second. poll() only does work when a slot has come: it reads the
+    ADC OVERSAMPLE times and keeps the average, then selects the next
+    address, so the mux settles for a whole slot before its reading.
+    A value is never older than one scan (scan_period seconds). A loop
+    with nothing else to do can sleep until scanner.deadline (in ns)
+    instead of spinning on poll(), as sensor_reading.py does.
+
+        scanner = AdcScanner(adc, mux_pins, motor2040_channels())
+        while True:
+            scanner.poll(time.monotonic_ns())
+            amps = scanner.values[0]                  # latest, motor A
+            low, high, rms = scanner.stats(0)         # last HISTORY samples
+
+    The samples of every channel go into a ring buffer of HISTORY, for
+    min / max / RMS, and peaks keeps the largest single reading since
+    reset_peaks(), so a spike between two samples still shows.
+"""
+import math
+from array import array
+
+OVERSAMPLE = 8  # ADC readings averaged into one sample
+HISTORY = 32  # samples kept per channel
+SCAN_RATE = 100  # scans of all the channels per second
+REFERENCE_VOLTAGE = 3.3
+MAX_COUNT = 65535  # AnalogIn.value at the reference voltage
+
+# Mux addresses of the Motor2040 (board.CURRENT_SENSE_A_ADDR and so on)
+CURRENT_SENSE_ADDR = (0b000, 0b001, 0b010, 0b011)
+VOLTAGE_SENSE_ADDR = 0b100
+FAULT_SENSE_ADDR = 0b101
+SENSOR_ADDR = (0b110, 0b111)
+
+# ADC volts to units: (volts + offset) * gain, the ones of sensor_reading.py
+CURRENT_GAIN = 1 / 0.47  # amps per volt over the shunt resistor
+CURRENT_OFFSET = -0.005
+VOLTAGE_GAIN = 13.9 / 3.9  # battery volts per ADC volt
+
+
+class Channel:
+    def __init__(self, name, address, gain=1.0, offset=0.0):
+        self.name = name
+        self.address = address  # mux address, 0 to 7
+        self.gain = gain
+        self.offset = offset  # volts, added before the gain
+
+
+def motor2040_channels(motors=4, sensors=2):
+    """Currents of the motors (amps), battery voltage and the sensors (volts)"""
+    channels = [Channel("C" + str(i + 1), CURRENT_SENSE_ADDR[i], CURRENT_GAIN,
+                        CURRENT_OFFSET) for i in range(motors)]
+    channels.append(Channel("Voltage", VOLTAGE_SENSE_ADDR, VOLTAGE_GAIN))
+    channels += [Channel("S" + str(i + 1), SENSOR_ADDR[i])
+                 for i in range(sensors)]
+    return channels
+
+
+class AdcScanner:
+    def __init__(self, adc, mux_pins, channels, scan_rate=SCAN_RATE,
+                 oversample=OVERSAMPLE, history=HISTORY):
+        """adc: the AnalogIn of board.SHARED_ADC, mux_pins: the outputs
+        of board.ADC_ADDR_0, 1 and 2"""
+        self.adc = adc
+        self.mux_pins = mux_pins
+        self.channels = channels
+        self.oversample = oversample
+        self.history = history
+        count = len(channels)
+        self.slot = 1_000_000_000 // (scan_rate * count)  # ns per channel
+        self.scan_period = self.slot * count / 1e9  # seconds, oldest a value gets
+        reference = getattr(adc, "reference_voltage", REFERENCE_VOLTAGE)
+        self.volts_per_count = reference / MAX_COUNT
+        zeros = [0.0] * count
+        self.values = array("f", zeros)  # latest average of every channel
+        self.peaks = array("f", zeros)  # largest reading since reset_peaks()
+        self.buffers = [array("f", [0.0] * history) for _ in channels]
+        self.heads = [0] * count  # next place in every ring buffer
+        self.filled = [0] * count  # samples in every ring buffer
+        self.times = [0] * count  # ns of the latest sample of every channel
+        self.scans = 0
+        self.overruns = 0  # slots taken later than a whole slot
+        self.channel = 0  # the channel of the next slot
+        self.deadline = None
+        self.select(channels[0].address)
+
+    def select(self, address):
+        for i, pin in enumerate(self.mux_pins):
+            pin.value = bool(address & (1 << i))
+
+    def index(self, name):
+        for i, channel in enumerate(self.channels):
+            if channel.name == name:
+                return i
+        raise ValueError("no channel " + name)
+
+    def poll(self, now_ns):
+        """Sample the next channel if its slot has come, call it as often as
+        possible, or sleep until deadline in between. Returns True when a
+        scan of all the channels ended."""
+        if self.deadline is None:
+            # the first channel settles for a whole slot too
+            self.deadline = now_ns + self.slot
+            return False
+        if now_ns < self.deadline:
+            return False
+        i = self.channel
+        channel = self.channels[i]
+        adc = self.adc
+        total = 0
+        high = 0
+        for _ in range(self.oversample):
+            raw = adc.value
+            total += raw
+            if raw > high:
+                high = raw
+        volts = total * self.volts_per_count / self.oversample
+        value = (volts + channel.offset) * channel.gain
+        self.values[i] = value
+        peak = (high * self.volts_per_count + channel.offset) * channel.gain
+        if peak > self.peaks[i]:
+            self.peaks[i] = peak
+        head = self.heads[i]
+        self.buffers[i][head] = value
+        self.heads[i] = (head + 1) % self.history
+        if self.filled[i] < self.history:
+            self.filled[i] += 1
+        self.times[i] = now_ns
+
+        # the next channel settles until its slot
+        self.channel = (i + 1) % len(self.channels)
+        self.select(self.channels[self.channel].address)
+        self.deadline += self.slot
+        if self.deadline <= now_ns:
+            # fell behind, start counting again instead of catching up
+            self.overruns += 1
+            self.deadline = now_ns + self.slot
+        if self.channel == 0:
+            self.scans += 1
+            return True
+        return False
+
+    def samples(self, i):
+        """The samples in the ring buffer of a channel, oldest first"""
+        buffer = self.buffers[i]
+        filled = self.filled[i]
+        if filled < self.history:
+            return buffer[:filled]
+        head = self.heads[i]
+        return buffer[head:] + buffer[:head]
+
+    def stats(self, i):
+        """(min, max, RMS) of the samples of a channel in one pass"""
+        buffer = self.buffers[i]
+        filled = self.filled[i]
+        if not filled:
+            return 0.0, 0.0, 0.0
+        low = high = buffer[0]
+        squares = 0.0
+        for k in range(filled):
+            value = buffer[k]
+            if value < low:
+                low = value
+            if value > high:
+                high = value
+            squares += value * value
+        return low, high, math.sqrt(squares / filled)
+
+    def mean(self, i):
+        filled = self.filled[i]
+        if not filled:
+            return 0.0
+        buffer = self.buffers[i]
+        return sum(buffer[k] for k in range(filled)) / filled
+
+    def reset_peaks(self):
+        for i in range(len(self.peaks)):
+            self.peaks[i] = self.values[i]
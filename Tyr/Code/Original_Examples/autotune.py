@@ -0,0 +1,186 @@
+"""
+    Name: autotune.py
+    Author:
+    Created:
+    Purpose: Find the PID gains of a motor with a relay experiment, and
+    save them to gains.json (see pid_gains.py) for the examples and the
+    firmware. Copy it to the CIRCUITPY drive as code.py, with
+    loop_runner.py and pid_gains.py, or run it on the PC with
+    Simulation/run_board.py.
+
+    Instead of the PID the output switches between +RELAY and -RELAY
+    every time the value crosses the setpoint. The motor then swings
+    around the setpoint, and from the size (amplitude) and length
+    (period Tu) of the swings:
+        ultimate gain Ku = 4 * RELAY / (pi * amplitude)
+    the gain where a P controller alone would keep swinging. The gains
+    come from Ku and Tu with a PD rule of our own (see RULES), the same
+    for both loops: KP = 0.8 * Ku, KD = KP * Tu / 25 and no KI.
+
+    The relay takes the place of the PID output, in its units, so Ku is
+    in the units of the gains:
+    LOOP = "position": position_control.py and quad_position_wave.py,
+    degrees in, rev/s out (throttle = output / SPEED_SCALE).
+    LOOP = "velocity": velocity_control.py, quad_velocity_sequence.py
+    and GamePad_Control/code.py, rev/s in, rev/s per second out
+    (throttle += output * dt / SPEED_SCALE), around VELOCITY.
+
+    The wheel turns back and forth during the test, lift the rover.
+    Press the user switch to stop early.
+"""
+import math
+import board
+import pwmio
+import digitalio
+import rotaryio
+from adafruit_motor import motor
+from loop_runner import LoopRunner
+from pid_gains import save_gains
+
+# Pin constants, the motor to tune
+MOTOR_P = board.MOTOR_A_P
+MOTOR_N = board.MOTOR_A_N
+CHANNEL_A = board.ENCODER_A_A
+CHANNEL_B = board.ENCODER_A_B
+
+# Setting constants, the same as the examples
+FREQUENCY = 25000                   # Chose a frequency above human hearing
+DECAY_MODE = motor.SLOW_DECAY
+GEAR_RATIO = 50                     # The gear ratio of the motor
+COUNTS_PER_REV = 12 * GEAR_RATIO    # The counts per revolution of the motor's output shaft
+SPEED_SCALE = 5.4                   # The scaling to apply to each motor's speed to match its real-world speed
+UPDATES = 100                       # How many times to update the motor per second
+
+# Relay experiment
+LOOP = "position"                   # "position" or "velocity", the loop to tune
+VELOCITY = 2.0                      # rev/s the velocity test swings around
+RELAY = {"position": 1.6, "velocity": 20.0}  # PID output of the relay, rev/s or rev/s per second
+HYSTERESIS = {"position": 2.0, "velocity": 0.2}  # degrees or rev/s past the setpoint before switching
+SETTLE_CYCLES = 3                   # swings left out while the motor settles
+CYCLES = 6                          # swings measured
+TIMEOUT = 20                        # seconds before giving up
+
+# Rules: Kc / Ku, Ti / Tu, Td / Tu (Ti None: no integral). Not the
+# Ziegler-Nichols table: a PD with Kc = 0.8 Ku like its PD rule, but Td =
+# Tu / 25 instead of Tu / 8, because the encoder counts make the
+# derivative noisy at 100 updates per second. This gives about the hand
+# tuned gains of the examples on the simulated motor.
+RULES = {
+    "position": (0.8, None, 0.04),  # PD
+    "velocity": (0.8, None, 0.04),  # PD
+}
+
+# Create a digitalinout object for the user switch
+user_sw = digitalio.DigitalInOut(board.USER_SW)
+user_sw.direction = digitalio.Direction.INPUT
+user_sw.pull = digitalio.Pull.UP
+
+# Create the pwm and objects
+pwm_p = pwmio.PWMOut(MOTOR_P, frequency=FREQUENCY)
+pwm_n = pwmio.PWMOut(MOTOR_N, frequency=FREQUENCY)
+mot = motor.DCMotor(pwm_p, pwm_n)
+mot.decay_mode = DECAY_MODE
+
+# Create the encoder object
+encoder = rotaryio.IncrementalEncoder(CHANNEL_B, CHANNEL_A, divisor=1)
+
+
+class RelayTest:
+    """Relay with hysteresis, measures the swings of the value around
+    the setpoint"""
+
+    def __init__(self, relay, hysteresis):
+        self.relay = relay
+        self.hysteresis = hysteresis
+        self.output = relay  # push up first
+        self.starts = []  # times the output switched up, one per swing
+        self.amplitudes = []  # half of the peak to peak of every swing
+        self.high = None
+        self.low = None
+
+    def update(self, error, now):
+        """error = setpoint - value, now in seconds. Returns +-relay"""
+        value = -error  # value relative to the setpoint
+        if self.high is None or value > self.high:
+            self.high = value
+        if self.low is None or value < self.low:
+            self.low = value
+        if self.output > 0 and error < -self.hysteresis:
+            self.output = -self.relay
+        elif self.output < 0 and error > self.hysteresis:
+            self.output = self.relay
+            # one whole swing since the last switch up
+            if self.starts:
+                self.amplitudes.append((self.high - self.low) / 2)
+            self.starts.append(now)
+            self.high = self.low = value
+        return self.output
+
+    def swings(self):
+        return len(self.amplitudes)
+
+    def result(self, settle):
+        """(Ku, Tu) of the swings after the first settle ones"""
+        # swing k runs from starts[k] to starts[k + 1], amplitudes[k] is its
+        # size, so Tu and the amplitude are measured on the same swings
+        last = len(self.amplitudes)
+        amplitudes = self.amplitudes[settle:last]
+        tu = (self.starts[last] - self.starts[settle]) / len(amplitudes)
+        amplitude = sum(amplitudes) / len(amplitudes)
+        # hysteresis moves the switching points, take it out of the amplitude
+        effective = math.sqrt(max(amplitude ** 2 - self.hysteresis ** 2, 1e-12))
+        ku = 4 * self.relay / (math.pi * effective)
+        return ku, tu
+
+
+def gains(loop, ku, tu):
+    """(kp, ki, kd) of the examples' PID from the relay results"""
+    kc_part, ti_part, td_part = RULES[loop]
+    kp = kc_part * ku
+    ki = kp / (ti_part * tu) if ti_part else 0.0
+    kd = kp * td_part * tu
+    return kp, ki, kd
+
+
+def button_pressed():
+    return not user_sw.value
+
+
+relay = RelayTest(RELAY[LOOP], HYSTERESIS[LOOP])
+setpoint = VELOCITY if LOOP == "velocity" else 0.0
+mot.throttle = setpoint / SPEED_SCALE
+last_position = encoder.position
+elapsed = 0.0
+
+print("Relay test of the", LOOP, "loop, output +-", RELAY[LOOP])
+loop = LoopRunner(UPDATES)
+while not button_pressed() and elapsed < TIMEOUT:
+    dt = loop.tick()
+    elapsed += dt
+
+    position = encoder.position
+    if LOOP == "velocity":
+        value = (position - last_position) / COUNTS_PER_REV / dt  # rev/s
+        accel = relay.update(setpoint - value, elapsed)
+        throttle = mot.throttle + (accel * dt) / SPEED_SCALE
+    else:
+        value = position * 360.0 / COUNTS_PER_REV  # degrees
+        throttle = relay.update(setpoint - value, elapsed) / SPEED_SCALE
+    last_position = position
+
+    mot.throttle = max(min(throttle, 1.0), -1.0)
+    if relay.swings() >= SETTLE_CYCLES + CYCLES:
+        break
+
+mot.throttle = 0.0
+print(loop.report())
+
+if relay.swings() < SETTLE_CYCLES + 2:
+    print("Not enough swings ({}), try a bigger RELAY".format(relay.swings()))
+else:
+    ku, tu = relay.result(SETTLE_CYCLES)
+    kp, ki, kd = gains(LOOP, ku, tu)
+    print("Ku = {:.4f}, Tu = {:.3f} s".format(ku, tu))
+    print("KP = {:.4f}, KI = {:.4f}, KD = {:.5f}".format(kp, ki, kd))
+    if save_gains(LOOP, (kp, ki, kd)):
+        print("Saved to gains.json, the examples and code.py load it")
@@ -0,0 +1,73 @@
+"""
+    Name: loop_runner.py
+    Author:
+    Created:
+    Purpose: Fixed-rate loop for the control examples. Copy it to the
+    CIRCUITPY drive next to code.py.
+
+    time.sleep(UPDATE_RATE) at the end of a loop adds the time of the
+    work and the prints to every update, so the loop runs slower than
+    UPDATES and the PID's sample rate is wrong. LoopRunner sleeps to
+    deadlines on time.monotonic_ns() instead, so the rate does not
+    drift, and gives the real time of every update for the PID.
+
+        loop = LoopRunner(UPDATES)
+        while not button_pressed():
+            dt = loop.tick()  # seconds since the last update
+            ...
+        print(loop.report())
+"""
+import time
+
+
+class LoopRunner:
+    def __init__(self, rate):
+        self.rate = rate
+        self.period = 1_000_000_000 // rate  # nanoseconds
+        self.deadline = None  # time of the next update
+        self.last = None  # time of the last update
+        self.dt = 1 / rate  # seconds between the last two updates
+        self.reset()
+
+    def reset(self):
+        """Start the statistics again"""
+        self.count = 0
+        self.overruns = 0  # updates later than a tenth of a period
+        self.min_ns = None
+        self.max_ns = 0
+        self.sum_ns = 0
+
+    def tick(self):
+        """Wait for the next update, return the real time since the
+        last one in seconds (1 / rate on the first update)"""
+        now = time.monotonic_ns()
+        if self.deadline is None:
+            # first update, nothing to wait for
+            self.deadline = now
+        elif now < self.deadline:
+            time.sleep((self.deadline - now) / 1_000_000_000)
+            now = time.monotonic_ns()
+        elif now - self.deadline > self.period // 10:
+            self.overruns += 1
+        if self.last is not None:
+            elapsed = now - self.last
+            self.dt = elapsed / 1_000_000_000
+            self.count += 1
+            self.sum_ns += elapsed
+            self.max_ns = max(self.max_ns, elapsed)
+            if self.min_ns is None or elapsed < self.min_ns:
+                self.min_ns = elapsed
+        self.last = now
+        self.deadline += self.period
+        if self.deadline <= now:
+            # fell behind, start counting again instead of catching up
+            self.deadline = now + self.period
+        return self.dt
+
+    def report(self):
+        """Loop time min/mean/max in milliseconds and the overruns"""
+        if not self.count:
+            return "no updates"
+        return "loop {} Hz: min {:.2f} mean {:.2f} max {:.2f} ms, {} overruns of {}".format(
+            self.rate, self.min_ns / 1e6, self.sum_ns / self.count / 1e6,
+            self.max_ns / 1e6, self.overruns, self.count)
@@ -0,0 +1,93 @@
+"""
+    Name: mecanum.py
+    Author:
+    Created:
+    Purpose: Kinematics of a four wheel mecanum (or X omni) base for the
+    Motor2040 examples. Copy it to the CIRCUITPY drive next to code.py.
+
+    Mixer.wheels(vx, vy, w) gives the wheel speeds in revolutions per
+    second for any body velocity: vx forward and vy to the left in m/s,
+    w counterclockwise in rad/s. The mixing matrix is computed once, so
+    every call is twelve multiplications. If a wheel would go faster than
+    max_speed all of them are scaled down together, the direction of the
+    motion stays the same.
+
+    Mixer.body(speeds) is the other way round, the body velocity from
+    measured wheel speeds, and Odometry adds it up into a position.
+"""
+import math
+
+# The example robot, change them for your own
+WHEEL_RADIUS = 0.03  # meters
+HALF_LENGTH = 0.08  # front to rear axle / 2, meters
+HALF_WIDTH = 0.09  # left to right wheel / 2, meters
+MAX_SPEED = 5.4  # wheel revolutions per second at full throttle
+
+
+class Mixer:
+    def __init__(self, order, radius=WHEEL_RADIUS, half_length=HALF_LENGTH,
+                 half_width=HALF_WIDTH, max_speed=MAX_SPEED, count=4):
+        """order: motor index of the front left, front right, rear left
+        and rear right wheel, like (FL, FR, RL, RR)"""
+        self.order = tuple(order)
+        self.count = count
+        self.max_speed = max_speed
+        self.turn = half_length + half_width  # meters, lever of w
+        to_revs = 1 / (2 * math.pi * radius)  # m/s of the wheel rim to rev/s
+        # (vx, vy, w) factor of every wheel: FL, FR, RL, RR
+        signs = ((1, -1, -1), (1, 1, 1), (1, 1, -1), (1, -1, 1))
+        self.matrix = [(sx * to_revs, sy * to_revs, sw * self.turn * to_revs)
+                       for sx, sy, sw in signs]
+        # the other way round: body velocity from the wheel speeds
+        to_meters = 2 * math.pi * radius / 4
+        self.inverse = [(sx * to_meters, sy * to_meters,
+                         sw * to_meters / self.turn) for sx, sy, sw in signs]
+
+    def wheels(self, vx, vy, w, speeds=None):
+        """Wheel speeds (rev/s) of a body velocity, in motor order.
+        Give speeds (a list) to fill it instead of making a new one"""
+        if speeds is None:
+            speeds = [0.0] * self.count
+        top = 0.0
+        for index, (ax, ay, aw) in zip(self.order, self.matrix):
+            speed = ax * vx + ay * vy + aw * w
+            speeds[index] = speed
+            top = max(top, abs(speed))
+        if top > self.max_speed:
+            # normalise: slow every wheel by the same factor
+            scale = self.max_speed / top
+            for index in self.order:
+                speeds[index] *= scale
+        return speeds
+
+    def body(self, speeds):
+        """Body velocity (vx, vy, w) of the wheel speeds (rev/s)"""
+        vx = vy = w = 0.0
+        for index, (bx, by, bw) in zip(self.order, self.inverse):
+            speed = speeds[index]
+            vx += bx * speed
+            vy += by * speed
+            w += bw * speed
+        return vx, vy, w
+
+
+class Odometry:
+    """Position of the base from the wheel speeds, starting at 0, 0"""
+
+    def __init__(self, mixer):
+        self.mixer = mixer
+        self.x = 0.0  # meters
+        self.y = 0.0
+        self.heading = 0.0  # radians, counterclockwise
+
+    def update(self, speeds, dt):
+        """Add one update of the measured wheel speeds (rev/s)"""
+        vx, vy, w = self.mixer.body(speeds)
+        # the heading in the middle of the update
+        heading = self.heading + w * dt / 2
+        cos_h = math.cos(heading)
+        sin_h = math.sin(heading)
+        self.x += (vx * cos_h - vy * sin_h) * dt
+        self.y += (vx * sin_h + vy * cos_h) * dt
+        self.heading += w * dt
+        return self.x, self.y, self.heading
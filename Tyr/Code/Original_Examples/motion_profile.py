@@ -0,0 +1,130 @@
+"""
+    Name: motion_profile.py
+    Author:
+    Created:
+    Purpose: Setpoint profiles for the Motor2040 examples and firmware.
+    Copy it to the CIRCUITPY drive next to code.py.
+
+    The shape of a move is computed once into a table of fractions (0.0
+    at the start, 1.0 at the end), one per update, so the control loop
+    only does start + (end - start) * table[i], no math.cos on every tick.
+
+    Shapes: STEP (0), LINEAR (1), COSINE (2), TRAPEZOID (3), SCURVE (4)
+
+    A sequence is a list of moves, every one (seconds, shape, targets)
+    with one target per motor, from the targets of the move before:
+
+        SEQUENCE = [
+            (1.0, COSINE, [270.0, 270.0]),
+            (1.0, COSINE, [0.0, 0.0]),
+        ]
+        sequence = Sequence(SEQUENCE, UPDATES, [0.0, 0.0])
+        while True:
+            setpoints = sequence.next()
+"""
+import math
+from array import array
+
+STEP = 0
+LINEAR = 1
+COSINE = 2
+TRAPEZOID = 3
+SCURVE = 4
+
+ACCEL_PART = 0.25  # part of a TRAPEZOID move spent speeding up, and slowing down
+
+
+def fraction(shape, x):
+    """How far along a move of the shape at time x (0.0 to 1.0)"""
+    if shape == STEP:
+        return 1.0
+    if shape == COSINE:
+        return (1.0 - math.cos(x * math.pi)) / 2.0
+    if shape == TRAPEZOID:
+        # constant acceleration, cruise, constant deceleration
+        top = 1.0 / (1.0 - ACCEL_PART)  # cruise speed
+        if x < ACCEL_PART:
+            return top * x * x / (2 * ACCEL_PART)
+        if x > 1.0 - ACCEL_PART:
+            return 1.0 - top * (1.0 - x) ** 2 / (2 * ACCEL_PART)
+        return top * (x - ACCEL_PART / 2)
+    if shape == SCURVE:
+        # no jump in speed or acceleration at either end
+        return x * x * x * (x * (x * 6 - 15) + 10)
+    return x  # LINEAR
+
+
+_tables = {}
+
+
+def unit_table(shape, steps):
+    """Fractions of a move of the shape over steps updates, the last is 1.0.
+    Tables are kept, moves of the same shape and length share one."""
+    steps = max(1, int(steps))
+    key = (shape, steps)
+    if key not in _tables:
+        _tables[key] = array("f", [fraction(shape, (i + 1) / steps)
+                                   for i in range(steps)])
+    return _tables[key]
+
+
+def table(shape, start, end, steps):
+    """Setpoints of one move from start to end"""
+    return array("f", [start + (end - start) * f
+                       for f in unit_table(shape, steps)])
+
+
+class Move:
+    """Moves the setpoints of count motors along a unit table"""
+
+    def __init__(self, unit, count=1):
+        self.unit = unit
+        self.values = [0.0] * count  # the setpoints now
+        self._start = [0.0] * count
+        self._delta = [0.0] * count
+        self.index = len(unit)  # done until to() is called
+
+    def to(self, targets, unit=None):
+        """Start a move from the setpoints now to the targets"""
+        if unit is not None:
+            self.unit = unit
+        for i, target in enumerate(targets):
+            self._start[i] = self.values[i]
+            self._delta[i] = target - self.values[i]
+        self.index = 0
+
+    @property
+    def done(self):
+        return self.index >= len(self.unit)
+
+    def next(self):
+        """Setpoints of the next update, the targets once the move is done"""
+        if self.index < len(self.unit):
+            f = self.unit[self.index]
+            self.index += 1
+            values, start, delta = self.values, self._start, self._delta
+            for i in range(len(values)):
+                values[i] = start[i] + delta[i] * f
+        return self.values
+
+
+class Sequence:
+    """Runs a list of (seconds, shape, targets) moves, around again
+    when repeat is True, or holding the last targets"""
+
+    def __init__(self, steps, rate, start, repeat=True):
+        self.steps = [(unit_table(shape, round(seconds * rate)), targets)
+                      for seconds, shape, targets in steps]
+        self.repeat = repeat
+        self.index = -1  # move running now
+        self.move = Move(self.steps[0][0], len(start))
+        self.move.values[:] = list(start)
+
+    def next(self):
+        """Setpoints of every motor for the next update"""
+        if self.move.done:
+            if self.index + 1 < len(self.steps) or self.repeat:
+                self.index = (self.index + 1) % len(self.steps)
+                unit, targets = self.steps[self.index]
+                self.move.to(targets, unit)
+        return self.move.next()
@@ -0,0 +1,138 @@
+"""
+    Name: multi_pid.py
+    Author:
+    Created:
+    Purpose: PID control of all the motors of a Motor2040 in one pass.
+    Copy it to the CIRCUITPY drive next to code.py.
+
+    The gains, integrals and last values of every motor are kept in flat
+    arrays and the constants of the nominal update rate are computed once,
+    so one update() call costs a single loop over the motors instead of a
+    PID object per motor. The integral stops growing while the output is
+    saturated (anti-windup) and the output can be limited per second (slew).
+
+        pids = MultiPID(4, VEL_KP, VEL_KI, VEL_KD, UPDATES,
+                        scale=1 / COUNTS_PER_REV, velocity=True,
+                        output_rate=1 / SPEED_SCALE)
+        pids.reset([enc.position for enc in encoders])
+        while True:
+            dt = loop.tick()
+            throttles = pids.update([enc.position for enc in encoders], dt)
+
+    scale turns a reading (encoder counts) into the controlled unit, with
+    velocity=True the controlled value is the change of the reading per
+    second. With output_rate the PID gives the rate of change of the
+    output, like the velocity examples do with the throttle:
+        throttle += pid * dt * output_rate
+"""
+from array import array
+
+
+class MultiPID:
+    def __init__(self, count, kp, ki, kd, rate, scale=1.0, velocity=False,
+                 output_rate=None, limit=1.0, slew=None, windup=None):
+        self.count = count
+        self.scale = scale
+        self.velocity = velocity  # control the rate of change of the reading
+        self.output_rate = output_rate  # None: the output is the PID itself
+        self.limit = limit  # outputs stay within -limit..limit
+        self.slew = slew  # largest output change per second, None for any
+        self.windup = windup  # largest integral, None for any
+        zeros = [0.0] * count
+        self.kp = array("f", zeros)
+        self.ki = array("f", zeros)
+        self.kd = array("f", zeros)
+        self.setpoints = array("f", zeros)
+        self.outputs = array("f", zeros)
+        self.measured = array("f", zeros)  # controlled values of the last update
+        self._sums = array("f", zeros)
+        self._readings = array("l", [0] * count)  # last raw readings
+        self.set_rate(rate)
+        self.set_gains(kp, ki, kd)
+
+    def set_rate(self, rate):
+        """Nominal updates per second, used when update() gets no dt"""
+        self.dt = 1 / rate
+        self._inv_dt = rate
+
+    def set_gains(self, kp, ki, kd, motor=None):
+        """New gains for one motor, or all of them when motor is None"""
+        motors = range(self.count) if motor is None else (motor,)
+        for i in motors:
+            self.kp[i] = kp
+            self.ki[i] = ki
+            self.kd[i] = kd
+
+    def reset(self, readings=None, outputs=None):
+        """Forget the integrals and start again from these readings and
+        outputs, so the next update does not kick"""
+        for i in range(self.count):
+            self._sums[i] = 0.0
+            if readings is not None:
+                self._readings[i] = int(readings[i])
+                self.measured[i] = 0.0 if self.velocity else readings[i] * self.scale
+            if outputs is not None:
+                self.outputs[i] = outputs[i]
+
+    def track(self, readings, outputs, dt=None):
+        """Follow readings and outputs set by something else (open loop),
+        so the control can take over at any time without a jump"""
+        inv_dt = self._inv_dt if dt is None else 1 / dt
+        scale = self.scale
+        for i in range(self.count):
+            reading = int(readings[i])
+            if self.velocity:
+                self.measured[i] = (reading - self._readings[i]) * scale * inv_dt
+            else:
+                self.measured[i] = reading * scale
+            self._readings[i] = reading
+            self._sums[i] = 0.0
+            self.outputs[i] = outputs[i]
+
+    def update(self, readings, dt=None):
+        """One update of every motor from its reading, returns the outputs"""
+        if dt is None:
+            dt = self.dt
+            inv_dt = self._inv_dt
+        else:
+            inv_dt = 1 / dt
+        # local names are faster than attributes in the loop
+        kp, ki, kd = self.kp, self.ki, self.kd
+        setpoints, outputs, measured = self.setpoints, self.outputs, self.measured
+        sums, last_readings = self._sums, self._readings
+        scale, velocity, windup = self.scale, self.velocity, self.windup
+        limit = self.limit
+        output_step = None if self.output_rate is None else dt * self.output_rate
+        slew_step = None if self.slew is None else self.slew * dt
+        for i in range(self.count):
+            reading = int(readings[i])
+            if velocity:
+                value = (reading - last_readings[i]) * scale * inv_dt
+            else:
+                value = reading * scale
+            last_readings[i] = reading
+            error = setpoints[i] - value
+            error_sum = sums[i] + error * dt
+            if windup is not None:
+                error_sum = max(-windup, min(windup, error_sum))
+            rate_error = (value - measured[i]) * inv_dt
+            measured[i] = value
+            out = error * kp[i] + error_sum * ki[i] - rate_error * kd[i]
+            last = outputs[i]
+            if output_step is not None:
+                out = last + out * output_step
+            held = 0  # 1 when the output is held down, -1 when held up
+            if slew_step is not None:
+                if out > last + slew_step:
+                    out, held = last + slew_step, 1
+                elif out < last - slew_step:
+                    out, held = last - slew_step, -1
+            if out > limit:
+                out, held = limit, 1
+            elif out < -limit:
+                out, held = -limit, -1
+            # anti-windup: no integration further into a held output
+            if not (held > 0 and error > 0 or held < 0 and error < 0):
+                sums[i] = error_sum
+            outputs[i] = out
+        return outputs
@@ -0,0 +1,61 @@
+"""
+    Name: pid_gains.py
+    Author:
+    Created:
+    Purpose: PID gains kept in a small file on the CIRCUITPY drive, so the
+    gains autotune.py found are used by the examples and the firmware
+    instead of the constants typed into every file. Copy it to the
+    CIRCUITPY drive next to code.py.
+
+    gains.json, written by autotune.py or by hand:
+        {"velocity": [30.0, 0.0, 0.4], "position": [0.14, 0.0, 0.0022]}
+
+    A loop missing from the file keeps the constants of the program:
+        VEL_KP, VEL_KI, VEL_KD = load_gains("velocity", (VEL_KP, VEL_KI, VEL_KD))
+
+    The board can only write its own drive when boot.py allows it (and
+    then the PC cannot write it until boot.py is changed back):
+        import storage
+        storage.remount("/", readonly=False)
+    Without it save_gains() prints the file, copy it to the drive by hand.
+"""
+import json
+
+GAINS_FILE = "gains.json"
+
+
+def read_gains(name=GAINS_FILE):
+    """Everything in the gains file, {} when there is none"""
+    try:
+        with open(name) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_gains(loop, defaults, name=GAINS_FILE):
+    """(kp, ki, kd) of a loop ("velocity" or "position") from the gains
+    file, the defaults when the file does not have it"""
+    gains = read_gains(name).get(loop)
+    if not gains or len(gains) != 3:
+        return tuple(defaults)
+    print("{} gains from {}: {}".format(loop, name, gains))
+    return tuple(float(g) for g in gains)
+
+
+def save_gains(loop, gains, name=GAINS_FILE, **extra):
+    """Write the (kp, ki, kd) of a loop to the gains file, keeping the
+    other loops. extra values are written next to them.
+    Returns False when the drive is read only."""
+    values = read_gains(name)
+    values[loop] = [float(g) for g in gains]
+    values.update(extra)
+    text = json.dumps(values)
+    try:
+        with open(name, "w") as file:
+            file.write(text)
+        return True
+    except OSError:
+        print("The drive is read only, save this as {}:".format(name))
+        print(text)
+        return False
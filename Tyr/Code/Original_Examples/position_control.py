@@ -1,13 +1,15 @@
 # SPDX-License-Identifier: MIT
 
-import time
 import board
-import math
 import random
 import pwmio
 import digitalio
 import rotaryio
 from adafruit_motor import motor
+from loop_runner import LoopRunner
+from pid_gains import load_gains
+from telemetry_stream import TelemetryStream
+import motion_profile
 
 # Pin constants
 MOTOR_P = board.MOTOR_A_P
@@ -27,13 +29,14 @@ UPDATE_RATE = 1 / UPDATES
 TIME_FOR_EACH_MOVE = 1              # The time to travel between each random value
 UPDATES_PER_MOVE = TIME_FOR_EACH_MOVE * UPDATES
 PRINT_DIVIDER = 4                   # How many of the updates should be printed (i.e. 2 would be every other update)
+TELEMETRY = False                   # Send binary telemetry every update instead of printing, see telemetry_stream.py
 SPEED_SCALE = 5.4                   # The scaling to apply to the motor's speed to match its real-world speed
 
 # Multipliers for the different printed values, so they appear nicely on the Thonny plotter
 SPD_PRINT_SCALE = 20                # Driving Speed multipler
 
 POSITION_EXTENT = 180               # How far from zero to move the motor, in degrees
-INTERP_MODE = 2                     # The interpolating mode between setpoints. STEP (0), LINEAR (1), COSINE (2)
+INTERP_MODE = 2                     # The interpolating mode between setpoints. STEP (0), LINEAR (1), COSINE (2), TRAPEZOID (3), SCURVE (4)
 
 
 # PID values
@@ -41,6 +44,9 @@ POS_KP = 0.14                       # Position proportional (P) gain
 POS_KI = 0.0                        # Position integral (I) gain
 POS_KD = 0.0022                     # Position derivative (D) gain
 
+# Gains found by autotune.py, when gains.json has them, see pid_gains.py
+POS_KP, POS_KI, POS_KD = load_gains("position", (POS_KP, POS_KI, POS_KD))
+
 # Create a digitalinout object for the user switch
 user_sw = digitalio.DigitalInOut(board.USER_SW)
 user_sw.direction = digitalio.Direction.INPUT
@@ -69,10 +75,13 @@ class PID:
         self._last_value = 0
         self._sample_rate = sample_rate
 
-    def calculate(self, value):
+    # dt is the real time since the last calculation, the sample rate if not given
+    def calculate(self, value, dt=None):
+        if dt is None:
+            dt = self._sample_rate
         error = self.setpoint - value
-        self._error_sum += error * self._sample_rate
-        rate_error = (value - self._last_value) / self._sample_rate
+        self._error_sum += error * dt
+        rate_error = (value - self._last_value) / dt
         self._last_value = value
 
         return (error * self.kp) + (self._error_sum * self.ki) - (rate_error * self.kd)
@@ -96,33 +105,37 @@ print_count = 0
 start_value = 0.0
 end_value = random.uniform(-POSITION_EXTENT, POSITION_EXTENT)
 
+# How far along the movement to be on every update, see motion_profile.py
+profile = motion_profile.unit_table(INTERP_MODE, UPDATES_PER_MOVE)
+
+# Binary telemetry to the data USB port, when it is turned on
+stream = TelemetryStream(1) if TELEMETRY else None
+
+# Run the updates at a fixed rate, see loop_runner.py
+loop = LoopRunner(UPDATES)
+
 # Run until the user switch is pressed
 while not button_pressed():
 
+    # Wait for the next update, dt is the real time since the last one
+    dt = loop.tick()
+
     # Capture the state of the encoder
     angle = to_degrees(encoder.position)
 
-    # Calculate how far along this movement to be
-    percent_along = min(update / UPDATES_PER_MOVE, 1.0)
-
-    if INTERP_MODE == 0:
-        # Move the motor instantly to the end value
-        pos_pid.setpoint = end_value
-    elif INTERP_MODE == 2:
-        # Move the motor between values using cosine
-        pos_pid.setpoint = (((-math.cos(percent_along * math.pi) + 1.0) / 2.0) * (end_value - start_value)) + start_value
-    else:
-        # Move the motor linearly between values
-        pos_pid.setpoint = (percent_along * (end_value - start_value)) + start_value
+    # Move the setpoint along the profile, computed once before the loop
+    pos_pid.setpoint = (profile[update] * (end_value - start_value)) + start_value
 
     # Calculate the velocity to move the motor closer to the position setpoint
-    vel = pos_pid.calculate(angle)
+    vel = pos_pid.calculate(angle, dt)
 
     # Set the new motor driving speed
     mot.throttle = max(min(vel / SPEED_SCALE, 1.0), -1.0)
 
-    # Print out the current motor values and their setpoints, but only on every multiple
-    if print_count == 0:
+    # Send every update as telemetry, or else print out the current motor values and their setpoints, but only on every multiple
+    if stream:
+        stream.send(loop.last, [pos_pid.setpoint], [angle], [vel], [mot.throttle])
+    elif print_count == 0:
         print("Pos =", angle, end=", ")
         print("Pos SP =", pos_pid.setpoint, end=", ")
         print("Speed =", mot.throttle * SPEED_SCALE * SPD_PRINT_SCALE)
@@ -140,4 +153,6 @@ while not button_pressed():
         start_value = end_value
         end_value = random.uniform(-POSITION_EXTENT, POSITION_EXTENT)
 
-    time.sleep(UPDATE_RATE)
+
+# Print how well the loop kept its rate
+print(loop.report())
@@ -1,12 +1,15 @@
 # SPDX-License-Identifier: MIT
 
-import time
 import board
-import math
 import pwmio
 import digitalio
 import rotaryio
 from adafruit_motor import motor
+from loop_runner import LoopRunner
+from pid_gains import load_gains
+from telemetry_stream import TelemetryStream
+from multi_pid import MultiPID
+import motion_profile
 
 # Setting constants
 FREQUENCY = 25000                   # Chose a frequency above human hearing
@@ -20,6 +23,7 @@ UPDATE_RATE = 1 / UPDATES
 TIME_FOR_EACH_MOVE = 1              # The time to travel between each random value
 UPDATES_PER_MOVE = TIME_FOR_EACH_MOVE * UPDATES
 PRINT_DIVIDER = 4                   # How many of the updates should be printed (i.e. 2 would be every other update)
+TELEMETRY = False                   # Send binary telemetry every update instead of printing, see telemetry_stream.py
 SPEED_SCALE = 5.4                   # The scaling to apply to the motor's speed to match its real-world speed
 
 # Multipliers for the different printed values, so they appear nicely on the Thonny plotter
@@ -33,6 +37,9 @@ POS_KP = 0.14                       # Position proportional (P) gain
 POS_KI = 0.0                        # Position integral (I) gain
 POS_KD = 0.0022                     # Position derivative (D) gain
 
+# Gains found by autotune.py, when gains.json has them, see pid_gains.py
+POS_KP, POS_KI, POS_KD = load_gains("position", (POS_KP, POS_KI, POS_KD))
+
 # Create a digitalinout object for the user switch
 user_sw = digitalio.DigitalInOut(board.USER_SW)
 user_sw.direction = digitalio.Direction.INPUT
@@ -70,84 +77,64 @@ encoders = [enc_a, enc_b, enc_c, enc_d]
 ENCODER_NAMES = ["A", "B", "C", "D"]
 
 
-# A simple class for handling Proportional, Integral & Derivative (PID) control calculations
-class PID:
-    def __init__(self, kp, ki, kd, sample_rate):
-        self.kp = kp
-        self.ki = ki
-        self.kd = kd
-        self.setpoint = 0
-        self._error_sum = 0
-        self._last_value = 0
-        self._sample_rate = sample_rate
-
-    def calculate(self, value):
-        error = self.setpoint - value
-        self._error_sum += error * self._sample_rate
-        rate_error = (value - self._last_value) / self._sample_rate
-        self._last_value = value
-
-        return (error * self.kp) + (self._error_sum * self.ki) - (rate_error * self.kd)
-
-
 def button_pressed():
     return not user_sw.value
 
 
-def to_degrees(position):
-    return (position * 360.0) / COUNTS_PER_REV
-
+# Create the PIDs of all the motors for position control, in degrees
+# The gains are divided by SPEED_SCALE so the outputs are the throttles
+pos_pids = MultiPID(board.NUM_MOTORS, POS_KP / SPEED_SCALE, POS_KI / SPEED_SCALE,
+                    POS_KD / SPEED_SCALE, UPDATES, scale=360.0 / COUNTS_PER_REV)
+pos_pids.reset([enc.position for enc in encoders])
 
-# Create PID object for position control
-pos_pids = [PID(POS_KP, POS_KI, POS_KD, UPDATE_RATE) for i in range(board.NUM_MOTORS)]
-
-update = 0
 print_count = 0
 
 # Set the initial and end values
 start_value = 0.0
 end_value = 270.0
 
-angles = [0.0] * board.NUM_MOTORS
+# Move all the motors from the start to the end value and back using cosine,
+# the profile is computed once, see motion_profile.py
+WAVE = [
+    (TIME_FOR_EACH_MOVE, motion_profile.COSINE, [end_value] * board.NUM_MOTORS),
+    (TIME_FOR_EACH_MOVE, motion_profile.COSINE, [start_value] * board.NUM_MOTORS),
+]
+wave = motion_profile.Sequence(WAVE, UPDATES, [start_value] * board.NUM_MOTORS)
+
+# Binary telemetry to the data USB port, when it is turned on
+stream = TelemetryStream(board.NUM_MOTORS) if TELEMETRY else None
+
+# Run the updates at a fixed rate, see loop_runner.py
+loop = LoopRunner(UPDATES)
 
 # Run until the user switch is pressed
 while not button_pressed():
 
-    # Capture the state of the encoders
-    for i in range(board.NUM_MOTORS):
-        angles[i] = to_degrees(encoders[i].position)
-
-    # Calculate how far along this movement to be
-    percent_along = min(update / UPDATES_PER_MOVE, 1.0)
+    # Wait for the next update, dt is the real time since the last one
+    dt = loop.tick()
 
+    # Move the setpoints along the wave
+    setpoints = wave.next()
     for i in range(board.NUM_MOTORS):
-        # Move the motor between values using cosine
-        pos_pids[i].setpoint = (((-math.cos(percent_along * math.pi) + 1.0) / 2.0) * (end_value - start_value)) + start_value
-
-        # Calculate the velocity to move the motor closer to the position setpoint
-        vel = pos_pids[i].calculate(angles[i])
+        pos_pids.setpoints[i] = setpoints[i]
 
-        # Set the new motor driving speed
-        motors[i].throttle = max(min(vel / SPEED_SCALE, 1.0), -1.0)
+    # Calculate the throttles to move the motors closer to the position setpoint, all in one pass
+    throttles = pos_pids.update([enc.position for enc in encoders], dt)
+    for i in range(board.NUM_MOTORS):
+        motors[i].throttle = throttles[i]
 
-    # Print out the current motor values and their setpoints, but only on every multiple
-    if print_count == 0:
+    # Send every update as telemetry, or else print out the current motor values and their setpoints, but only on every multiple
+    if stream:
+        stream.send(loop.last, pos_pids.setpoints, pos_pids.measured,
+                    [t * SPEED_SCALE for t in throttles], throttles)
+    elif print_count == 0:
         for i in range(board.NUM_MOTORS):
-            print(ENCODER_NAMES[i], "=", angles[i], end=", ")
+            print(ENCODER_NAMES[i], "=", pos_pids.measured[i], end=", ")
         print()
 
     # Increment the print count, and wrap it
     print_count = (print_count + 1) % PRINT_DIVIDER
 
-    update += 1     # Move along in time
-
-    # Have we reached the end of this movement?
-    if update >= UPDATES_PER_MOVE:
-        update = 0  # Reset the counter
-
-        # Swap the start and end values
-        temp = start_value
-        start_value = end_value
-        end_value = temp
 
-    time.sleep(UPDATE_RATE)
+# Print how well the loop kept its rate
+print(loop.report())
@@ -1,11 +1,17 @@
 # SPDX-License-Identifier: MIT
 
-import time
 import board
+import math
 import pwmio
 import digitalio
 import rotaryio
 from adafruit_motor import motor
+from loop_runner import LoopRunner
+from pid_gains import load_gains
+from telemetry_stream import TelemetryStream
+from multi_pid import MultiPID
+import motion_profile
+import mecanum
 
 # Wheel friendly names
 FL = 2
@@ -28,6 +34,7 @@ UPDATE_RATE = 1 / UPDATES
 TIME_FOR_EACH_MOVE = 1              # The time to travel between each random value
 UPDATES_PER_MOVE = TIME_FOR_EACH_MOVE * UPDATES
 PRINT_DIVIDER = 4                   # How many of the updates should be printed (i.e. 2 would be every other update)
+TELEMETRY = False                   # Send binary telemetry every update instead of printing, see telemetry_stream.py
 
 DRIVING_SPEED = 1.0                 # The speed to drive the wheels at, from 0.0 to SPEED_SCALE
 
@@ -36,6 +43,9 @@ VEL_KP = 30.0                       # Velocity proportional (P) gain
 VEL_KI = 0.0                        # Velocity integral (I) gain
 VEL_KD = 0.4                        # Velocity derivative (D) gain
 
+# Gains found by autotune.py, when gains.json has them, see pid_gains.py
+VEL_KP, VEL_KI, VEL_KD = load_gains("velocity", (VEL_KP, VEL_KI, VEL_KD))
+
 # Create a digitalinout object for the user switch
 user_sw = digitalio.DigitalInOut(board.USER_SW)
 user_sw.direction = digitalio.Direction.INPUT
@@ -73,130 +83,101 @@ encoders = [enc_a, enc_b, enc_c, enc_d]
 ENCODER_NAMES = ["RR", "RL", "FL", "FR"]
 
 
-# A simple class for handling Proportional, Integral & Derivative (PID) control calculations
-class PID:
-    def __init__(self, kp, ki, kd, sample_rate):
-        self.kp = kp
-        self.ki = ki
-        self.kd = kd
-        self.setpoint = 0
-        self._error_sum = 0
-        self._last_value = 0
-        self._sample_rate = sample_rate
-
-    def calculate(self, value):
-        error = self.setpoint - value
-        self._error_sum += error * self._sample_rate
-        rate_error = (value - self._last_value) / self._sample_rate
-        self._last_value = value
-
-        return (error * self.kp) + (self._error_sum * self.ki) - (rate_error * self.kd)
-
-
 def button_pressed():
     return not user_sw.value
 
 
-def to_revs(position):
-    return position / COUNTS_PER_REV
+# Wheel kinematics of the mecanum base, see mecanum.py
+mixer = mecanum.Mixer((FL, FR, RL, RR), max_speed=SPEED_SCALE)
+odometry = mecanum.Odometry(mixer)
+WHEEL_TRAVEL = 2 * math.pi * mecanum.WHEEL_RADIUS  # meters per wheel revolution
 
 
-# Helper functions for driving in common directions
+# Helper functions for the wheel speeds of common directions, speed in wheel rev/s
 def drive_forward(speed):
-    vel_pids[FL].setpoint = speed
-    vel_pids[FR].setpoint = speed
-    vel_pids[RL].setpoint = speed
-    vel_pids[RR].setpoint = speed
+    return mixer.wheels(speed * WHEEL_TRAVEL, 0, 0)
 
 
 def turn_right(speed):
-    vel_pids[FL].setpoint = speed
-    vel_pids[FR].setpoint = -speed
-    vel_pids[RL].setpoint = speed
-    vel_pids[RR].setpoint = -speed
+    return mixer.wheels(0, 0, -speed * WHEEL_TRAVEL / mixer.turn)
 
 
 def strafe_right(speed):
-    vel_pids[FL].setpoint = speed
-    vel_pids[FR].setpoint = -speed
-    vel_pids[RL].setpoint = -speed
-    vel_pids[RR].setpoint = speed
+    return mixer.wheels(0, -speed * WHEEL_TRAVEL, 0)
 
 
 def stop():
-    vel_pids[FL].setpoint = 0
-    vel_pids[FR].setpoint = 0
-    vel_pids[RL].setpoint = 0
-    vel_pids[RR].setpoint = 0
+    return mixer.wheels(0, 0, 0)
+
 
+# The sequence to drive, every part (seconds, shape, wheel speeds), see motion_profile.py
+# STEP changes the speeds at once, SCURVE would ramp them smoothly
+# Any motion works too, like mixer.wheels(0.1, 0.1, 0.5): diagonal while turning left
+SEQUENCE = [
+    (TIME_FOR_EACH_MOVE, motion_profile.STEP, drive_forward(DRIVING_SPEED)),
+    (TIME_FOR_EACH_MOVE, motion_profile.STEP, drive_forward(-DRIVING_SPEED)),
+    (TIME_FOR_EACH_MOVE, motion_profile.STEP, turn_right(DRIVING_SPEED)),
+    (TIME_FOR_EACH_MOVE, motion_profile.STEP, turn_right(-DRIVING_SPEED)),
+    (TIME_FOR_EACH_MOVE, motion_profile.STEP, strafe_right(DRIVING_SPEED)),
+    (TIME_FOR_EACH_MOVE, motion_profile.STEP, strafe_right(-DRIVING_SPEED)),
+    (TIME_FOR_EACH_MOVE, motion_profile.STEP, stop()),
+]
 
-# Create PID objects for velocity control
-vel_pids = [PID(VEL_KP, VEL_KI, VEL_KD, UPDATE_RATE) for i in range(board.NUM_MOTORS)]
 
-update = 0
+# Create the PIDs of all the motors for velocity control, in revolutions per second
+# The PIDs give the acceleration, the throttles follow it
+vel_pids = MultiPID(board.NUM_MOTORS, VEL_KP, VEL_KI, VEL_KD, UPDATES,
+                    scale=1 / COUNTS_PER_REV, velocity=True, output_rate=1 / SPEED_SCALE)
+
 print_count = 0
-sequence = 0
+sequence = motion_profile.Sequence(SEQUENCE, UPDATES, stop())
 
 # Initialise the motors
 for i in range(board.NUM_MOTORS):
     motors[i].throttle = 0.0
 
-revs = [0.0] * board.NUM_MOTORS
-last_revs = [0.0] * board.NUM_MOTORS
+vel_pids.reset([enc.position for enc in encoders], [0.0] * board.NUM_MOTORS)
+
+# Binary telemetry to the data USB port, when it is turned on
+stream = TelemetryStream(board.NUM_MOTORS) if TELEMETRY else None
+
+# Run the updates at a fixed rate, see loop_runner.py
+loop = LoopRunner(UPDATES)
 
 # Run until the user switch is pressed
 while not button_pressed():
 
-    for i in range(board.NUM_MOTORS):
-        # Capture the state of the encoder
-        last_revs[i] = revs[i]
-        revs[i] = to_revs(encoders[i].position)
+    # Wait for the next update, dt is the real time since the last one
+    dt = loop.tick()
 
+    # Set the motor speeds, based on the sequence
+    setpoints = sequence.next()
     for i in range(board.NUM_MOTORS):
-        vel = (revs[i] - last_revs[i]) / UPDATE_RATE
+        vel_pids.setpoints[i] = setpoints[i]
 
-        # Calculate the acceleration to apply to the motor to move it closer to the velocity setpoint
-        accel = vel_pids[i].calculate(vel)
+    # Accelerate or decelerate the motors closer to their velocity setpoints, all in one pass
+    counts = [enc.position for enc in encoders]
+    throttles = vel_pids.update(counts, dt)
+    for i in range(board.NUM_MOTORS):
+        motors[i].throttle = throttles[i]
 
-        # Accelerate or decelerate the motor
-        motors[i].throttle = max(min(motors[i].throttle + ((accel * UPDATE_RATE) / SPEED_SCALE), 1.0), -1.0)
+    # Where the base is, from the measured wheel speeds
+    x, y, heading = odometry.update(vel_pids.measured, dt)
 
-    # Print out the current motor values, but only on every multiple
-    if print_count == 0:
+    # Send every update as telemetry, or else print out the current motor values, but only on every multiple
+    if stream:
+        stream.send(loop.last, vel_pids.setpoints,
+                    [c / COUNTS_PER_REV for c in counts], vel_pids.measured, throttles)
+    elif print_count == 0:
         for i in range(board.NUM_MOTORS):
-            print(ENCODER_NAMES[i], "=", revs[i], end=", ")
-        print()
+            print(ENCODER_NAMES[i], "=", encoders[i].position / COUNTS_PER_REV, end=", ")
+        print("X =", x, end=", ")
+        print("Y =", y, end=", ")
+        print("Heading =", math.degrees(heading))
 
     # Increment the print count, and wrap it
     print_count = (print_count + 1) % PRINT_DIVIDER
 
-    update += 1     # Move along in time
 
-    # Have we reached the end of this movement?
-    if update >= UPDATES_PER_MOVE:
-        update = 0  # Reset the counter
-
-        # Move on to the next part of the sequence
-        sequence += 1
-
-        # Loop the sequence back around
-        if sequence >= 7:
-            sequence = 0
-
-    # Set the motor speeds, based on the sequence
-    if sequence == 0:
-        drive_forward(DRIVING_SPEED)
-    elif sequence == 1:
-        drive_forward(-DRIVING_SPEED)
-    elif sequence == 2:
-        turn_right(DRIVING_SPEED)
-    elif sequence == 3:
-        turn_right(-DRIVING_SPEED)
-    elif sequence == 4:
-        strafe_right(DRIVING_SPEED)
-    elif sequence == 5:
-        strafe_right(-DRIVING_SPEED)
-    elif sequence == 6:
-        stop()
-
-    time.sleep(UPDATE_RATE)
+# Print how well the loop kept its rate
+print(loop.report())
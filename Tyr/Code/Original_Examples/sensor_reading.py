@@ -2,55 +2,46 @@
 #
 # SPDX-License-Identifier: MIT
 
-"""CircuitPython Essentials Analog In example"""
+"""CircuitPython Essentials Analog In example, with the scanner of adc_scanner.py"""
 import time
 import board
 from digitalio import DigitalInOut, Direction
 from analogio import AnalogIn
+from adc_scanner import AdcScanner, motor2040_channels
 
-addr0_pin = DigitalInOut(board.ADC_ADDR_0)
-addr0_pin.direction = Direction.OUTPUT
+PRINT_INTERVAL = 0.5  # seconds between prints, the scanner keeps sampling meanwhile
+SCAN_RATE = 100  # scans of all the channels per second
 
-addr1_pin = DigitalInOut(board.ADC_ADDR_1)
-addr1_pin.direction = Direction.OUTPUT
-
-addr2_pin = DigitalInOut(board.ADC_ADDR_2)
-addr2_pin.direction = Direction.OUTPUT
+mux_pins = []
+for pin in (board.ADC_ADDR_0, board.ADC_ADDR_1, board.ADC_ADDR_2):
+    addr_pin = DigitalInOut(pin)
+    addr_pin.direction = Direction.OUTPUT
+    mux_pins.append(addr_pin)
 
 analog_in = AnalogIn(board.SHARED_ADC)
 
+# Currents C1 to C4 (amps), the voltage sense and the sensors S1, S2 (volts)
+scanner = AdcScanner(analog_in, mux_pins,
+                     motor2040_channels(board.NUM_MOTORS, board.NUM_SENSORS),
+                     scan_rate=SCAN_RATE)
 
-def get_voltage(pin):
-    return (pin.value * 3.3) / 65536
-
-
-def select(address):
-    addr0_pin.value = address & 0b001
-    addr1_pin.value = address & 0b010
-    addr2_pin.value = address & 0b100
-
-
-VOLTAGE_GAIN = 13.9 / 3.9
-CURRENT_GAIN = 1 / 0.47
-CURRENT_OFFSET = -0.005
-
+next_print = time.monotonic() + PRINT_INTERVAL
 while True:
-    # Read each sensor in turn and print its voltage
-    for i in range(board.NUM_SENSORS):
-        select(i + board.SENSOR_1_ADDR)
-        print("S", i + 1, " = ", round(get_voltage(analog_in), 3), sep="", end=", ")
-
-    # Read the voltage sense and print the value
-    select(board.VOLTAGE_SENSE_ADDR)
-    voltage = get_voltage(analog_in) * VOLTAGE_GAIN
-    print("Voltage =", round(voltage, 4), end=", ")
-
-    # Read the current sense and print the value
-    for i in range(board.NUM_MOTORS):
-        select(i + board.CURRENT_SENSE_A_ADDR)
-        current = (get_voltage(analog_in) + CURRENT_OFFSET) * CURRENT_GAIN
-        print("C", i + 1, " = ", round(current, 4), sep="", end=", ")
-
-    print()
-
-    time.sleep(0.5)
+    scanner.poll(time.monotonic_ns())
+    if time.monotonic() < next_print:
+        # nothing to do until the next slot or print, let the CPU rest
+        # (in ns first, a float of monotonic_ns() loses the digits)
+        delay = min((scanner.deadline - time.monotonic_ns()) / 1e9,
+                    next_print - time.monotonic())
+        time.sleep(max(delay, 0))
+        continue
+    next_print += PRINT_INTERVAL
+
+    # Latest value of every channel, and min/max/RMS of the last samples
+    for i, channel in enumerate(scanner.channels):
+        low, high, rms = scanner.stats(i)
+        print(channel.name, "=", round(scanner.values[i], 4),
+              "(min", round(low, 4), "max", round(high, 4),
+              "rms", round(rms, 4), "peak", round(scanner.peaks[i], 4), end="), ")
+    print("scans", scanner.scans, "overruns", scanner.overruns)
+    scanner.reset_peaks()
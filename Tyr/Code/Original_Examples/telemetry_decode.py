@@ -0,0 +1,142 @@
+"""
+    Name: telemetry_decode.py
+    Author:
+    Created:
+    Purpose: Read the binary telemetry of telemetry_stream.py on the PC
+    (not on the board) into NumPy arrays, to plot or save them.
+
+    python telemetry_decode.py COM5 --seconds 10 --save run.npz --plot
+    python telemetry_decode.py run.bin --plot    a file saved before
+
+    The port is the second USB serial port of the Motor2040 (the data
+    port, not the console). pip install numpy pyserial matplotlib
+"""
+import os
+import argparse
+import numpy as np
+from telemetry_stream import SYNC, FIELDS, HEADER_LENGTH, frame_length
+
+
+def frame_dtype(count):
+    """NumPy layout of one frame of count motors"""
+    fields = [("sync", "u1", 2), ("count", "u1"), ("seq", "u1"),
+              ("time", "<u4")]
+    fields += [(name, "<f4", (count,)) for name in FIELDS]
+    fields.append(("checksum", "u1"))
+    return np.dtype(fields)
+
+
+def find_frames(data):
+    """
+    Start and motor count of every good frame in data, skipping noise,
+    console text and frames with a bad checksum.
+    Returns (starts, count, bad)
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    candidates = np.flatnonzero((buf[:-1] == SYNC[0]) & (buf[1:] == SYNC[1]))
+    starts = []
+    bad = 0
+    count = None
+    end = 0  # frames do not overlap
+    for start in candidates:
+        if start < end or start + HEADER_LENGTH > len(buf):
+            continue
+        n = int(buf[start + 2])
+        if count is not None and n != count:
+            continue  # all frames of a run have the same count
+        length = frame_length(n)
+        if start + length > len(buf):
+            break
+        if int(buf[start:start + length].sum()) & 0xFF:
+            bad += 1
+            continue
+        count = n
+        starts.append(start)
+        end = start + length
+    return np.array(starts, dtype=np.int64), count, bad
+
+
+def decode(data):
+    """
+    Decode raw telemetry bytes. Returns a dict of arrays:
+    time (seconds from the first frame), seq, and one (frames, count)
+    array per field, plus the number of lost and bad frames.
+    """
+    starts, count, bad = find_frames(data)
+    if count is None:
+        return {"time": np.zeros(0), "lost": 0, "bad": bad}
+    length = frame_length(count)
+    buf = np.frombuffer(data, dtype=np.uint8)
+    # copy the good frames next to each other and read them in one go
+    index = starts[:, None] + np.arange(length)
+    frames = buf[index].reshape(-1).tobytes()
+    records = np.frombuffer(frames, dtype=frame_dtype(count))
+    # the board time wraps around, make it grow
+    micros = records["time"].astype(np.int64)
+    steps = np.diff(micros) % (1 << 32)
+    time = np.concatenate(([0], np.cumsum(steps))) / 1e6
+    seq = records["seq"]
+    lost = int(((np.diff(seq.astype(np.int16)) - 1) % 256).sum())
+    result = {"time": time, "seq": seq, "lost": lost, "bad": bad}
+    for name in FIELDS:
+        result[name] = records[name].astype(np.float64)
+    return result
+
+
+def read_port(port, seconds):
+    """Raw bytes from the data port for some seconds"""
+    import serial  # pip install pyserial
+    from time import monotonic
+
+    data = bytearray()
+    with serial.Serial(port, timeout=0.1) as device:
+        end = monotonic() + seconds
+        while monotonic() < end:
+            data += device.read(device.in_waiting or 1)
+    return bytes(data)
+
+
+def plot(result):
+    import matplotlib.pyplot as plt  # pip install matplotlib
+
+    fields = [name for name in FIELDS if name in result]
+    figure, axes = plt.subplots(len(fields), 1, sharex=True)
+    for axis, name in zip(axes, fields):
+        axis.plot(result["time"], result[name])
+        axis.set_ylabel(name)
+    axes[-1].set_xlabel("seconds")
+    plt.show()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode Motor2040 telemetry")
+    parser.add_argument("source", help="serial port, or a file of raw bytes")
+    parser.add_argument("--seconds", type=float, default=5,
+                        help="how long to read the serial port")
+    parser.add_argument("--raw", help="also save the raw bytes to this file")
+    parser.add_argument("--save", help="save the arrays to this .npz file")
+    parser.add_argument("--plot", action="store_true", help="plot the fields")
+    args = parser.parse_args()
+
+    if os.path.isfile(args.source):
+        with open(args.source, "rb") as file:
+            data = file.read()
+    else:
+        data = read_port(args.source, args.seconds)
+    if args.raw:
+        with open(args.raw, "wb") as file:
+            file.write(data)
+
+    result = decode(data)
+    frames = len(result["time"])
+    rate = (frames - 1) / result["time"][-1] if frames > 1 else 0
+    print(f"{frames} frames, {rate:.1f}/s, lost {result['lost']}, "
+          f"bad {result['bad']}")
+    if args.save:
+        np.savez(args.save, **result)
+    if args.plot and frames:
+        plot(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+    Name: telemetry_stream.py
+    Author:
+    Created:
+    Purpose: Binary telemetry from a Motor2040 at the full loop rate,
+    instead of printing floats. Copy it to the CIRCUITPY drive next to
+    code.py, read it on the PC with telemetry_decode.py.
+
+    The frames go to the second USB serial port of the board, the
+    console stays free for print(). Turn that port on with a boot.py:
+        import usb_cdc
+        usb_cdc.enable(console=True, data=True)
+
+    Frame for count motors, all values little endian:
+        bytes 0-1  SYNC (0xA5 0x5A)
+        byte 2     count
+        byte 3     sequence number, 0-255 and around again
+        bytes 4-7  board time in microseconds (wraps every 71 minutes)
+        then count float32 values each of:
+                   setpoints, positions, velocities, throttles, currents
+        last byte  checksum: all bytes add up to 0 (mod 256)
+    The units are the ones of the program that sends them, like rev and
+    rev/s in velocity_control.py or degrees in position_control.py.
+"""
+import struct
+
+try:
+    import usb_cdc
+except ImportError:  # on the PC, only the frame format is used
+    usb_cdc = None
+
+SYNC = b"\xa5\x5a"
+FIELDS = ("setpoints", "positions", "velocities", "throttles", "currents")
+HEADER_FORMAT = "<2sBBI"
+HEADER_LENGTH = struct.calcsize(HEADER_FORMAT)
+
+
+def frame_format(count):
+    """struct format of a frame without the checksum"""
+    return HEADER_FORMAT + "{}f".format(len(FIELDS) * count)
+
+
+def frame_length(count):
+    return struct.calcsize(frame_format(count)) + 1  # + checksum
+
+
+class TelemetryStream:
+    def __init__(self, count, port=None):
+        """port: a usb_cdc.Serial, usb_cdc.data when not given"""
+        if port is None and usb_cdc is not None:
+            port = usb_cdc.data
+        self.port = port
+        self.count = count
+        self.values_format = "<{}f".format(count)
+        self.field_length = 4 * count
+        self.frame = bytearray(frame_length(count))
+        self.seq = 0
+        self.zeros = [0.0] * count
+        if port is not None:
+            port.write_timeout = 0  # never wait for the PC, drop instead
+        else:
+            print("telemetry: no data port, enable it in boot.py")
+
+    def send(self, now_ns, setpoints, positions, velocities, throttles,
+             currents=None):
+        """Send one frame, now_ns from time.monotonic_ns()"""
+        port = self.port
+        if port is None or not port.connected:
+            return
+        if currents is None:
+            currents = self.zeros
+        frame = self.frame
+        struct.pack_into(HEADER_FORMAT, frame, 0, SYNC, self.count, self.seq,
+                         (now_ns // 1000) & 0xFFFFFFFF)
+        offset = HEADER_LENGTH
+        for values in (setpoints, positions, velocities, throttles, currents):
+            struct.pack_into(self.values_format, frame, offset, *values)
+            offset += self.field_length
+        frame[-1] = 0
+        frame[-1] = -sum(frame) & 0xFF
+        self.seq = (self.seq + 1) & 0xFF
+        port.write(frame)
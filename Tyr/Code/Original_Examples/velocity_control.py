@@ -1,13 +1,15 @@
 # SPDX-License-Identifier: MIT
 
-import time
 import board
-import math
 import random
 import pwmio
 import digitalio
 import rotaryio
 from adafruit_motor import motor
+from loop_runner import LoopRunner
+from pid_gains import load_gains
+from telemetry_stream import TelemetryStream
+import motion_profile
 
 # Pin constants
 MOTOR_P = board.MOTOR_A_P
@@ -30,18 +32,22 @@ UPDATE_RATE = 1 / UPDATES
 TIME_FOR_EACH_MOVE = 1              # The time to travel between each random value
 UPDATES_PER_MOVE = TIME_FOR_EACH_MOVE * UPDATES
 PRINT_DIVIDER = 4                   # How many of the updates should be printed (i.e. 2 would be every other update)
+TELEMETRY = False                   # Send binary telemetry every update instead of printing, see telemetry_stream.py
 
 # Multipliers for the different printed values, so they appear nicely on the Thonny plotter
 ACC_PRINT_SCALE = 0.05              # Acceleration multiplier
 
 VELOCITY_EXTENT = 3                 # How far from zero to drive the motor at, in revolutions per second
-INTERP_MODE = 2                     # The interpolating mode between setpoints. STEP (0), LINEAR (1), COSINE (2)
+INTERP_MODE = 2                     # The interpolating mode between setpoints. STEP (0), LINEAR (1), COSINE (2), TRAPEZOID (3), SCURVE (4)
 
 # PID values
 VEL_KP = 30.0                       # Velocity proportional (P) gain
 VEL_KI = 0.0                        # Velocity integral (I) gain
 VEL_KD = 0.4                        # Velocity derivative (D) gain
 
+# Gains found by autotune.py, when gains.json has them, see pid_gains.py
+VEL_KP, VEL_KI, VEL_KD = load_gains("velocity", (VEL_KP, VEL_KI, VEL_KD))
+
 # Create a digitalinout object for the user switch
 user_sw = digitalio.DigitalInOut(board.USER_SW)
 user_sw.direction = digitalio.Direction.INPUT
@@ -70,10 +76,13 @@ class PID:
         self._last_value = 0
         self._sample_rate = sample_rate
 
-    def calculate(self, value):
+    # dt is the real time since the last calculation, the sample rate if not given
+    def calculate(self, value, dt=None):
+        if dt is None:
+            dt = self._sample_rate
         error = self.setpoint - value
-        self._error_sum += error * self._sample_rate
-        rate_error = (value - self._last_value) / self._sample_rate
+        self._error_sum += error * dt
+        rate_error = (value - self._last_value) / dt
         self._last_value = value
 
         return (error * self.kp) + (self._error_sum * self.ki) - (rate_error * self.kd)
@@ -103,35 +112,39 @@ end_value = random.uniform(-VELOCITY_EXTENT, VELOCITY_EXTENT)
 revs = 0.0
 last_revs = 0.0
 
+# How far along the movement to be on every update, see motion_profile.py
+profile = motion_profile.unit_table(INTERP_MODE, UPDATES_PER_MOVE)
+
+# Binary telemetry to the data USB port, when it is turned on
+stream = TelemetryStream(1) if TELEMETRY else None
+
+# Run the updates at a fixed rate, see loop_runner.py
+loop = LoopRunner(UPDATES)
+
 # Run until the user switch is pressed
 while not button_pressed():
 
+    # Wait for the next update, dt is the real time since the last one
+    dt = loop.tick()
+
     # Capture the state of the encoder
     last_revs = revs
     revs = to_revs(encoder.position)
 
-    # Calculate how far along this movement to be
-    percent_along = min(update / UPDATES_PER_MOVE, 1.0)
-
-    if INTERP_MODE == 0:
-        # Move the motor instantly to the end value
-        vel_pid.setpoint = end_value
-    elif INTERP_MODE == 2:
-        # Move the motor between values using cosine
-        vel_pid.setpoint = (((-math.cos(percent_along * math.pi) + 1.0) / 2.0) * (end_value - start_value)) + start_value
-    else:
-        # Move the motor linearly between values
-        vel_pid.setpoint = (percent_along * (end_value - start_value)) + start_value
+    # Move the setpoint along the profile, computed once before the loop
+    vel_pid.setpoint = (profile[update] * (end_value - start_value)) + start_value
 
     # Calculate the acceleration to apply to the motor to move it closer to the velocity setpoint
-    vel = (revs - last_revs) / UPDATE_RATE
-    accel = vel_pid.calculate(vel)
+    vel = (revs - last_revs) / dt
+    accel = vel_pid.calculate(vel, dt)
 
     # Set the new motor driving speed
-    mot.throttle = max(min(mot.throttle + ((accel * UPDATE_RATE) / SPEED_SCALE), 1.0), -1.0)
+    mot.throttle = max(min(mot.throttle + ((accel * dt) / SPEED_SCALE), 1.0), -1.0)
 
-    # Print out the current motor values and their setpoints, but only on every multiple
-    if print_count == 0:
+    # Send every update as telemetry, or else print out the current motor values and their setpoints, but only on every multiple
+    if stream:
+        stream.send(loop.last, [vel_pid.setpoint], [revs], [vel], [mot.throttle])
+    elif print_count == 0:
         print("Vel =", vel, end=", ")
         print("Vel SP =", vel_pid.setpoint, end=", ")
         print("Accel =", accel * ACC_PRINT_SCALE, end=", ")
@@ -150,4 +163,6 @@ while not button_pressed():
         start_value = end_value
         end_value = random.uniform(-VELOCITY_EXTENT, VELOCITY_EXTENT)
 
-    time.sleep(UPDATE_RATE)
+
+# Print how well the loop kept its rate
+print(loop.report())
@@ -2,10 +2,41 @@ import time
 import board
 from i2ctarget import I2CTarget
 import pwmio
+import rotaryio
+import analogio
+import digitalio
 from adafruit_motor import motor
+from multi_pid import MultiPID
+from motion_profile import Move, SCURVE, unit_table
+from telemetry_stream import TelemetryStream
+from pid_gains import load_gains
+from adc_scanner import AdcScanner, Channel
+from tyr_protocol import (
+    CMD_DRIVE, CMD_VELOCITY, CMD_GAINS, REG_TELEMETRY, REG_GAINS, REG_LOOP,
+    MAX_SPEED, unpack_drive, unpack_velocity, unpack_gains, pack_telemetry,
+    pack_gains, pack_loop)
 
+ADDRESS = 0x44  # 0x44 right controller, 0x48 left controller
 FREQUENCY = 25000  # Chose a frequency above human hearing
 DECAY_MODE = motor.SLOW_DECAY  # The decay mode affects how the motor behaves
+SAMPLE_INTERVAL = 0.02  # seconds between telemetry snapshots
+SHUNT_RESISTOR = 0.47  # current sense resistor of every motor, ohms
+CURRENT_GAIN = 1  # current sense amplifier gain
+CURRENT_OFFSET = -0.005  # current sense offset, volts
+GEAR_RATIO = 50  # The gear ratio of the motor
+COUNTS_PER_REV = 12 * GEAR_RATIO  # counts per revolution of the output shaft
+SPEED_SCALE = 5.4  # output shaft revolutions per second at full throttle
+LOOP_RATE = 100  # velocity PID updates per second, the Pi can change it
+MIN_LOOP_RATE = 20
+MAX_LOOP_RATE = 500
+RAMP_TIME = 0.1  # seconds to reach new wheel speeds, along an S-curve
+TELEMETRY = False  # binary telemetry on the USB data port every loop, see telemetry_stream.py
+# PID values, the ones of Code/Original_Examples/velocity_control.py
+VEL_KP = 30.0  # Velocity proportional (P) gain
+VEL_KI = 0.0  # Velocity integral (I) gain
+VEL_KD = 0.4  # Velocity derivative (D) gain
+# Gains found by autotune.py, when gains.json on the drive has them
+VEL_KP, VEL_KI, VEL_KD = load_gains("velocity", (VEL_KP, VEL_KI, VEL_KD))
 pwm_ap = pwmio.PWMOut(board.MOTOR_A_P, frequency=FREQUENCY)
 pwm_an = pwmio.PWMOut(board.MOTOR_A_N, frequency=FREQUENCY)
 pwm_bp = pwmio.PWMOut(board.MOTOR_B_P, frequency=FREQUENCY)
@@ -18,36 +49,217 @@ motC = motor.DCMotor(pwm_cp, pwm_cn)
 motA.decay_mode = DECAY_MODE
 motB.decay_mode = DECAY_MODE
 motC.decay_mode = DECAY_MODE
+motors = (motA, motB, motC)
 
-# Set Motor2040 as an I2C slave at address 0x44
-with I2CTarget(board.SCL, board.SDA, (0x44,)) as device:
-    reg = None
+# Encoders of the motors, the same way as Code/CircuitPython
+encoders = (
+    rotaryio.IncrementalEncoder(board.ENCODER_A_B, board.ENCODER_A_A, divisor=1),
+    rotaryio.IncrementalEncoder(board.ENCODER_B_B, board.ENCODER_B_A, divisor=1),
+    rotaryio.IncrementalEncoder(board.ENCODER_C_B, board.ENCODER_C_A, divisor=1),
+)
+
+# The current sense of every motor is on the shared ADC behind a mux
+adc = analogio.AnalogIn(board.SHARED_ADC)
+mux = []
+for pin in (board.ADC_ADDR_0, board.ADC_ADDR_1, board.ADC_ADDR_2):
+    mux_pin = digitalio.DigitalInOut(pin)
+    mux_pin.direction = digitalio.Direction.OUTPUT
+    mux.append(mux_pin)
+CURRENT_SENSE = (0b000, 0b001, 0b010)  # mux address of motor A, B, C
+# Oversampled currents in amps, a whole scan every loop, see adc_scanner.py
+scanner = AdcScanner(adc, mux, [
+    Channel("C" + str(i + 1), address, 1 / (CURRENT_GAIN * SHUNT_RESISTOR),
+            CURRENT_OFFSET) for i, address in enumerate(CURRENT_SENSE)],
+    scan_rate=LOOP_RATE)
+
+last_seq = None  # sequence number of the last drive frame
+lost = 0  # frames missed or rejected, printed when it changes
+
+last_counts = [0, 0, 0]
+last_sample = time.monotonic()
+# latest telemetry snapshot, sent as it is when the Pi reads
+snapshot = pack_telemetry(0, (0, 0, 0), (0, 0, 0), (0, 0, 0))
+stream = TelemetryStream(len(motors)) if TELEMETRY else None
+
+
+# ---- VELOCITY LOOP ---- #
+# The PID loop runs on the board, where the encoders are: the Pi only
+# sends the wheel speeds (VELOCITY frames) and the board holds them.
+closed_loop = False  # True after a VELOCITY frame, False after a DRIVE frame
+loop_rate = LOOP_RATE
+loop_period = 1_000_000_000 // loop_rate  # nanoseconds
+# PIDs of the three wheels in rev/s, they give the acceleration of the throttles
+pids = MultiPID(len(motors), VEL_KP, VEL_KI, VEL_KD, loop_rate,
+                scale=1 / COUNTS_PER_REV, velocity=True,
+                output_rate=1 / SPEED_SCALE)
+pids.reset([enc.position for enc in encoders], [0.0] * len(motors))
+# new wheel speeds are reached along a precomputed S-curve, not at once
+ramp = Move(unit_table(SCURVE, RAMP_TIME * loop_rate), len(motors))
+last_loop = time.monotonic_ns()
+next_loop = last_loop + loop_period
+# loop timing, sent and started again on every LOOP read
+period_sum = 0
+period_count = 0
+period_max = 0
+late = 0  # loops later than one and a half periods, never reset
+
+
+def control(now):
+    """One velocity update of the three wheels, now in nanoseconds"""
+    global last_loop, period_sum, period_count, period_max, late
+    period = now - last_loop
+    last_loop = now
+    period_sum += period
+    period_count += 1
+    period_max = max(period_max, period)
+    if period * 2 > loop_period * 3:
+        late += 1
+    counts = [enc.position for enc in encoders]
+    dt = period / 1_000_000_000
+    if closed_loop:
+        setpoints = ramp.next()
+        for i in range(len(motors)):
+            pids.setpoints[i] = setpoints[i]
+        for mot, throttle in zip(motors, pids.update(counts, dt)):
+            mot.throttle = throttle
+    else:
+        # follow the open loop throttles, the PID takes over without a jump
+        pids.track(counts, [mot.throttle or 0.0 for mot in motors], dt)
+    if stream:
+        stream.send(now, pids.setpoints, [c / COUNTS_PER_REV for c in counts],
+                    pids.measured, pids.outputs, scanner.values)
+
+
+def loop_status():
+    """LOOP read of the timing since the last one"""
+    global period_sum, period_count, period_max
+    mean = period_sum // period_count if period_count else 0
+    status = pack_loop(loop_rate, mean // 1000, period_max // 1000, late)
+    period_sum = period_count = period_max = 0
+    return status
+
+
+def sample(now):
+    """Read the encoders and currents into a new telemetry snapshot"""
+    global last_sample, snapshot
+    counts = [enc.position for enc in encoders]
+    dt = now - last_sample
+    velocities = [(c - last) / dt for c, last in zip(counts, last_counts)]
+    currents = [1000 * amps for amps in scanner.values]  # milliamps
+    snapshot = pack_telemetry(int(now * 1000), counts, velocities, currents)
+    last_counts[:] = counts
+    last_sample = now
+
+
+def received(unpack, frame):
+    """Unpack a DRIVE or VELOCITY frame and count the lost frames,
+    return the speeds or None if the frame is bad"""
+    global last_seq, lost
+    try:
+        seq, speeds = unpack(frame)
+    except ValueError as e:
+        lost += 1
+        print(e, lost)
+        return None
+    if last_seq is not None and seq != (last_seq + 1) & 0xFF:
+        lost += (seq - last_seq - 1) & 0xFF
+        print("lost frames", lost)
+    last_seq = seq
+    return speeds
+
+
+def drive(frame):
+    """Set all three wheels from one DRIVE frame (see tyr_protocol.py)"""
+    global closed_loop
+    speeds = received(unpack_drive, frame)
+    if speeds is None:
+        return
+    closed_loop = False
+    for mot, speed in zip(motors, speeds):
+        mot.throttle = speed / MAX_SPEED
+
+
+def velocity(frame):
+    """Set the speed setpoints (rev/s) of the PID loop, VELOCITY frame"""
+    global closed_loop
+    revs = received(unpack_velocity, frame)
+    if revs is None:
+        return
+    if not closed_loop:
+        ramp.values[:] = list(pids.measured)  # from the wheel speeds now
+    closed_loop = True
+    ramp.to(revs)
+
+
+def gains(frame):
+    """New PID gains and loop rate from a GAINS frame"""
+    global loop_rate, loop_period
+    try:
+        kp, ki, kd, rate = unpack_gains(frame)
+    except ValueError as e:
+        print(e)
+        return
+    loop_rate = max(MIN_LOOP_RATE, min(MAX_LOOP_RATE, rate))
+    loop_period = 1_000_000_000 // loop_rate
+    pids.set_gains(kp, ki, kd)
+    pids.set_rate(loop_rate)
+    ramp.unit = unit_table(SCURVE, RAMP_TIME * loop_rate)
+
+
+def legacy(reg, val):
+    """Old protocol: one register (0-5) and speed (0-255) per write"""
+    global closed_loop
+    closed_loop = False
+    val /= 255
+    if reg < 6:
+        # even registers forward, odd registers backward
+        motors[reg // 2].throttle = -val if reg % 2 else val
+
+
+# Set Motor2040 as an I2C slave at address ADDRESS
+with I2CTarget(board.SCL, board.SDA, (ADDRESS,)) as device:
+    reg = None  # register selected for the next read
     while True:
         try:
+            now_ns = time.monotonic_ns()
+            if now_ns >= next_loop:
+                control(now_ns)
+                next_loop += loop_period
+                if next_loop <= now_ns:
+                    # fell behind, start counting again instead of catching up
+                    next_loop = now_ns + loop_period
+            scanner.poll(now_ns)
+            now = time.monotonic()
+            if now - last_sample >= SAMPLE_INTERVAL:
+                sample(now)
             i2c_target_request = device.request()
             if not i2c_target_request:
                 continue  # No request, loop again
             with i2c_target_request:
-                data = i2c_target_request.read(1)
-                # separate register and data
-                if reg is None:
-                    reg = data[0]
+                if i2c_target_request.is_read:
+                    if reg == REG_TELEMETRY:
+                        i2c_target_request.write(snapshot)
+                    elif reg == REG_GAINS:
+                        i2c_target_request.write(pack_gains(
+                            pids.kp[0], pids.ki[0], pids.kd[0], loop_rate)[1:])
+                    elif reg == REG_LOOP:
+                        i2c_target_request.write(loop_status())
+                    else:
+                        i2c_target_request.write(bytes(1))
+                    continue
+                # the whole write in one read: command and data
+                data = i2c_target_request.read()
+                if not data:
                     continue
-                val = data[0]
-                val /= 255
-                if reg == 0:
-                    motA.throttle = val
-                elif reg == 1:  # reg = 1 for backward
-                    motA.throttle = -val
-                elif reg == 2:
-                    motB.throttle = val
-                elif reg == 3:
-                    motB.throttle = -val
-                elif reg == 4:
-                    motC.throttle = val
-                elif reg == 5:
-                    motC.throttle = -val
-                print(reg, val)
-                reg = None
+                if data[0] == CMD_DRIVE:
+                    drive(data)
+                elif data[0] == CMD_VELOCITY:
+                    velocity(data)
+                elif data[0] == CMD_GAINS:
+                    gains(data)
+                elif len(data) == 1:
+                    reg = data[0]  # a read of this register follows
+                elif len(data) == 2:
+                    legacy(data[0], data[1])
         except Exception as e:
             print(e)
@@ -5,218 +5,236 @@ from pyPS4Controller.controller import Controller
 import smbus
 # pip install adafruit-circuitpython-servokit
 from adafruit_servokit import ServoKit
-from time import sleep
-from math import tan, atan, degrees, radians
+from time import sleep, monotonic
+from threading import Thread, Lock
 import shutdown_raspi
+from tyr_protocol import (
+    CMD_GAINS, MAX_SPEED, pack_drive, pack_velocity, pack_gains)
+import tyr_kinematics
+from tyr_kinematics import HALF_RANGE, ROVER_ANGLES
+from tyr_steering import Steering, FREQUENCY
+from tyr_telemetry import TelemetryPoller
 
 bus = smbus.SMBus(1)
 RMC = 0x44  # right motor2040 controller addr
 LMC = 0x48  # left motor2040 controller addr
-R_ANGLE = 52  # calc from the rover dimentions
-R_COEF = 0.624  # calc from the rover dimentions
-FULL_RANGE = 180
-HALF_RANGE = FULL_RANGE // 2  # straight wheels position
 COEF = 32767 // HALF_RANGE
-DR = 255 / 160  # proportional distance between the opposite wheels
-servos = None
+TICK_RATE = 50  # control ticks per second, outputs are sent only here
+SERVO_TIME = 0.5  # seconds for the servos to complete a mode switch turn
+CLOSED_LOOP = True  # send wheel speeds for the PID loop of the boards
+MAX_REVS = 5.0  # wheel revolutions per second at full stick, closed loop
+# velocity PID of the boards (code.py), sent at start when SEND_GAINS is
+# True, else the boards keep their own (gains.json of autotune.py)
+SEND_GAINS = False
+VEL_KP = 30.0
+VEL_KI = 0.0
+VEL_KD = 0.4
+LOOP_RATE = 100  # PID updates per second on the boards
+steering = None  # writes all the servos in one transaction
 try:
-    kit = ServoKit(channels=16)
-    servos = [kit.servo[i] for i in range(6)]
-    for i in range(6):
-        servos[i].set_pulse_width_range(min_pulse=470, max_pulse=2520)
-        servos[i].actuation_range = FULL_RANGE
-        servos[i].angle = HALF_RANGE
-except ValueError:
+    # ServoKit sets up the PCA9685 and its PWM frequency
+    ServoKit(channels=16, frequency=FREQUENCY)
+    steering = Steering(bus)
+    steering.set_angles([HALF_RANGE] * 6)  # straight wheels
+except (ValueError, OSError):
     print("Servo controller is not connected")
 
 
 class MyController(Controller):
-    def __init__(self, **kwargs):
+    def __init__(self, tick_rate=TICK_RATE, closed_loop=CLOSED_LOOP, **kwargs):
         Controller.__init__(self, **kwargs)
+        self.tick_rate = tick_rate
+        self.closed_loop = closed_loop
+        self.running = False
+        self.thread = None  # of the control tick
+        # held by the control tick and the mode switches
+        self.lock = Lock()
         self.car_mode = True  # car/parallel
         self.onestick = True  # use one stick to control
         self.rover_mode = False  # static turn
+        # (car_mode, rover_mode) being switched to, None when not switching
+        self.next_mode = None
+        self.switch_done = 0  # monotonic time the servos are in place
         self.v0 = 0  # original speed from controller
-        self.v1 = 0
-        self.v2 = 0
-        self.v3 = 0
         self.alpha = 0  # original angle from controller
-        self.beta = 0
-
-    def spin(self, controller, reg, val):
-        """Low Level Function to set motor rotation"""
+        self.seq = 0  # sequence number of the drive frames
+        # last wheel speeds sent, only changes are sent again
+        self.speeds = {}
+        # encoder counts, velocities and currents of both sides
+        self.telemetry = TelemetryPoller(bus, {"left": LMC, "right": RMC})
+
+    def drive(self, controller, a, b, c):
+        """Low Level Function to set the speed of all three wheels of a
+        controller (-255 backward to 255 forward) in one I2C transaction.
+        In closed loop the speeds go as rev/s setpoints of the boards' PID"""
+        self.seq = (self.seq + 1) & 0xFF
+        if self.closed_loop:
+            revs = [s * MAX_REVS / MAX_SPEED for s in (a, b, c)]
+            frame = pack_velocity(self.seq, revs)
+        else:
+            frame = pack_drive(self.seq, (a, b, c))
         try:
-            bus.write_i2c_block_data(controller, reg, val)
+            # the first byte goes as the command, the rest as the block
+            bus.write_i2c_block_data(controller, frame[0], list(frame[1:]))
         except OSError:
             print("motor2040 is not connected")
 
-    def straight(self):
-        """Set the wheels straight"""
-        if not servos:
+    def set_gains(self, kp=VEL_KP, ki=VEL_KI, kd=VEL_KD, rate=LOOP_RATE):
+        """Send the velocity PID gains and loop rate to both boards"""
+        frame = pack_gains(kp, ki, kd, rate)
+        for controller in (LMC, RMC):
+            try:
+                bus.write_i2c_block_data(controller, CMD_GAINS, list(frame[1:]))
+            except OSError:
+                print("motor2040 is not connected")
+
+    def set_wheels(self, controller, a, b, c):
+        """Send the wheel speeds of a controller if they changed"""
+        if self.speeds.get(controller) != (a, b, c):
+            self.drive(controller, a, b, c)
+            self.speeds[controller] = (a, b, c)
+
+    def steer(self, angles):
+        """Move the six servos, only the changed ones are written"""
+        if steering:
+            steering.set_angles(angles)
+
+    ### Mode Switch Functions ###
+
+    def switch_mode(self, car_mode, rover_mode):
+        """Start a mode switch, the control tick stops the wheels, turns
+        the servos and finishes the switch after SERVO_TIME"""
+        if not steering:
             return False
-        for i in range(6):
-            servos[i].angle = HALF_RANGE
-        sleep(0.5)  # let servos complete turn
+        with self.lock:
+            self.next_mode = (car_mode, rover_mode)
+            self.switch_done = monotonic() + SERVO_TIME
         return True
 
-    ### Car Mode Functions ###
-
-    def car_calc(self):
-        """Calculate the secondary wheel angle and speeds for car mode"""
-        # these are the most complicated calculations here, 1 is proportional adjacent distance
-        alpha = abs(self.alpha)
-        v0 = abs(self.v0)
-        if alpha < 3:  # threshold and avoid zero division
-            self.beta = alpha
-            self.v1 = self.v2 = self.v3 = v0
-            return True
-        r = 1 / tan(radians(alpha))
-        r_ = (r**2 + 1) ** 0.5
-        R = r + DR
-        R_ = (R**2 + 1) ** 0.5
-        coef = v0 / R_
-        self.beta = round(degrees(atan(1 / R)))
-        self.v1 = round(R * coef)
-        self.v2 = round(r_ * coef)
-        self.v3 = round(r * coef)
-
-    def car_turn(self):
-        if not servos:
-            return False
-        if self.alpha > 0:  # turn right
-            servos[0].angle = HALF_RANGE + self.alpha
-            servos[2].angle = HALF_RANGE - self.alpha
-            servos[3].angle = HALF_RANGE + self.beta
-            servos[5].angle = HALF_RANGE - self.beta
-        else:  # turn left
-            servos[0].angle = HALF_RANGE - self.beta
-            servos[2].angle = HALF_RANGE + self.beta
-            servos[3].angle = HALF_RANGE + self.alpha
-            servos[5].angle = HALF_RANGE - self.alpha
-
-    def car_move(self):
-        v0 = abs(self.v0)
-        c1, c2 = LMC, RMC
-        if self.alpha > 0:
-            c2, c1 = LMC, RMC
-        self.spin(c1, 0x00 + (self.v0 > 0), [self.v2])
-        self.spin(c1, 0x02 + (self.v0 > 0), [self.v3])
-        self.spin(c1, 0x04 + (self.v0 > 0), [self.v2])
-        self.spin(c2, 0x00 + (self.v0 > 0), [v0])
-        self.spin(c2, 0x02 + (self.v0 > 0), [self.v1])
-        self.spin(c2, 0x04 + (self.v0 > 0), [v0])
-
-    ### Rover Mode Functions ###
-
-    def rover_turn(self):
-        if not servos:
-            return False
-        servos[0].angle = HALF_RANGE - R_ANGLE
-        servos[1].angle = HALF_RANGE
-        servos[2].angle = HALF_RANGE + R_ANGLE
-        servos[3].angle = HALF_RANGE + R_ANGLE
-        servos[4].angle = HALF_RANGE
-        servos[5].angle = HALF_RANGE - R_ANGLE
-        sleep(0.5)  # let the servos complete turn
-        return True  # switch successful
-
-    def rover_move(self):
-        v0 = abs(self.v0)
-        v1 = round(v0 * R_COEF)
-        self.spin(LMC, 0x00 + (self.v0 < 0), [v0])
-        self.spin(LMC, 0x02 + (self.v0 < 0), [v1])
-        self.spin(LMC, 0x04 + (self.v0 < 0), [v0])
-        self.spin(RMC, 0x00 + (self.v0 > 0), [v0])
-        self.spin(RMC, 0x02 + (self.v0 > 0), [v1])
-        self.spin(RMC, 0x04 + (self.v0 > 0), [v0])
+    def switching(self):
+        """One control tick of a mode switch, call with the lock held"""
+        car_mode, rover_mode = self.next_mode
+        if rover_mode:
+            angles = ROVER_ANGLES
+        else:
+            angles = [HALF_RANGE] * 6  # straight
+        self.steer(angles)
+        # the wheels stay stopped while the servos turn
+        self.set_wheels(LMC, 0, 0, 0)
+        self.set_wheels(RMC, 0, 0, 0)
+        if monotonic() >= self.switch_done:
+            self.car_mode, self.rover_mode = car_mode, rover_mode
+            self.next_mode = None
 
     ### High Level Functions ###
 
-    def turning(self):
-        if self.rover_mode:
-            return False
-        if self.car_mode:
-            self.car_calc()
-            self.car_turn()
-            self.car_move()  # important to set a new calculated speed
-        elif servos:  # parallel
-            for i in range(6):
-                servos[i].angle = HALF_RANGE + self.alpha
-
-    def driving(self):
-        if self.rover_mode:
-            self.rover_move()
-        elif self.car_mode:
-            self.car_calc()
-            self.car_move()
-        else:  # parallel
-            v0 = abs(self.v0)
-            self.spin(LMC, 0x00 + (self.v0 > 0), [v0])
-            self.spin(LMC, 0x02 + (self.v0 > 0), [v0])
-            self.spin(LMC, 0x04 + (self.v0 > 0), [v0])
-            self.spin(RMC, 0x00 + (self.v0 > 0), [v0])
-            self.spin(RMC, 0x02 + (self.v0 > 0), [v0])
-            self.spin(RMC, 0x04 + (self.v0 > 0), [v0])
+    def tick(self):
+        """Compute the wheel angles and speeds from the stick state and
+        send the ones that changed"""
+        with self.lock:
+            if self.next_mode:
+                self.switching()
+                return
+            if self.rover_mode:
+                angles, left, right = tyr_kinematics.rover(self.v0)
+            elif self.car_mode:
+                angles, left, right = tyr_kinematics.car(self.alpha, self.v0)
+            else:  # parallel
+                angles, left, right = tyr_kinematics.parallel(
+                    self.alpha, self.v0)
+            self.steer(angles)
+            self.set_wheels(LMC, *left)
+            self.set_wheels(RMC, *right)
+
+    def run(self):
+        """Run the control tick at a fixed rate until running is False,
+        start() sets it"""
+        period = 1 / self.tick_rate
+        next_tick = monotonic()
+        while self.running:
+            self.tick()
+            next_tick += period
+            delay = next_tick - monotonic()
+            if delay > 0:
+                sleep(delay)
+            else:
+                # fell behind, start counting again instead of catching up
+                next_tick = monotonic()
+
+    def start(self):
+        """Run the control tick and the telemetry poller in daemon threads"""
+        if self.closed_loop and SEND_GAINS:
+            self.set_gains()
+        self.running = True  # before the thread, so a quick shutdown() holds
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.telemetry.start()
 
     ### Control Functions ###
 
     def on_R3_down(self, value):  # max value is 32767
         """Adjust the range to 42 - 255 the bus can use and give the controller a dead zone to stop the wheels"""
         self.v0 = int((value + 6503) / 154) if value > 300 else 0
-        self.driving()
 
     def on_R3_up(self, value):  # the value is negative
         """Adjust the range to (-42) - (-255) the bus can use and give the controller a dead zone to stop the wheels"""
         self.v0 = int((value - 6503) / 154) if value < -300 else 0
-        self.driving()
 
     def on_L3_left(self, value):  # the value is negative
         if not self.onestick:
             self.alpha = 1 + value // COEF
-            self.turning()
 
     def on_L3_right(self, value):
         if not self.onestick:
             self.alpha = value // COEF
-            self.turning()
 
     def on_R3_left(self, value):  # the value is negative
         if self.onestick:
             self.alpha = 1 + value // COEF
-            self.turning()
 
     def on_R3_right(self, value):
         if self.onestick:
             self.alpha = value // COEF
-            self.turning()
 
     ### Switch Functions ###
 
     def on_x_press(self):  # switch between car/parallel modes
-        self.stop
-        self.rover_mode = False
-        if self.straight():
-            self.car_mode = not self.car_mode
+        self.stop_wheels()
+        # a second press while switching goes on from the new mode
+        car_mode, rover_mode = self.next_mode or (self.car_mode, self.rover_mode)
+        self.switch_mode(not car_mode, False)
 
     def on_circle_press(self):  # switch rover mode
-        self.stop
-        if self.rover_mode:
-            self.rover_mode = not self.straight()
-        else:
-            self.rover_mode = self.rover_turn()
+        self.stop_wheels()
+        car_mode, rover_mode = self.next_mode or (self.car_mode, self.rover_mode)
+        self.switch_mode(car_mode, not rover_mode)
 
     def on_triangle_press(self):  # switch 1 or 2 sticks control
         self.onestick = not self.onestick
 
     def on_options_press(self):  # For turing the pi off safely
-        self.stop
+        self.stop_wheels()
         shutdown_raspi.shutdown_rpi()  # use the imported module
 
-    def stop(self):
-        self.v0 = self.v1 = self.v2 = self.v3 = 0
-        self.car_move()  # to make sure it stopped
-
-
-controller = MyController(interface="/dev/input/js0", connecting_using_ds4drv=False)
-# you can start listening before controller is paired, as long as you pair it within the timeout window
-controller.listen(timeout=600, on_disconnect=controller.stop)
+    # not stop(): Controller.__init__ sets self.stop = False for listen()
+    def stop_wheels(self):
+        with self.lock:
+            self.v0 = 0
+            self.speeds.clear()  # send even if nothing changed
+            self.set_wheels(LMC, 0, 0, 0)  # to make sure it stopped
+            self.set_wheels(RMC, 0, 0, 0)
+
+    def shutdown(self):
+        """Stop the control tick, the telemetry poller and the wheels"""
+        self.running = False
+        if self.thread:
+            self.thread.join()  # no tick after the wheels are stopped
+        self.telemetry.stop()
+        self.stop_wheels()
+
+
+if __name__ == "__main__":
+    controller = MyController(interface="/dev/input/js0", connecting_using_ds4drv=False)
+    controller.start()  # the control tick sends the outputs
+    # you can start listening before controller is paired, as long as you pair it within the timeout window
+    controller.listen(timeout=600, on_disconnect=controller.shutdown)
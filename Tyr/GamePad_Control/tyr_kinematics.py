@@ -0,0 +1,133 @@
+"""
+    Name: tyr_kinematics.py
+    Author:
+    Created:
+    Purpose: Wheel angles and speeds of Tyr for car, parallel and rover
+    mode, without any hardware, so it can be checked and timed on any PC:
+        python tyr_kinematics.py
+
+    The car mode (Ackermann) geometry is calculated once for every whole
+    steering angle: the angle of the inner rear wheel (beta) and the speed
+    of every wheel as a part of the outer front wheel speed. Every update
+    is then a table lookup and one multiply per wheel.
+
+    Every function returns (angles, left, right):
+    - angles: the six servo angles, 90 is straight
+    - left, right: the three signed wheel speeds (A, B, C) of the left
+      and right Motor2040, ready for MyController.drive()
+"""
+from math import tan, atan, degrees, radians
+
+R_ANGLE = 52  # calc from the rover dimentions
+R_COEF = 0.624  # calc from the rover dimentions
+FULL_RANGE = 180
+HALF_RANGE = FULL_RANGE // 2  # straight wheels position
+DR = 255 / 160  # proportional distance between the opposite wheels
+MIN_TURN = 3  # smaller angles drive straight, avoids zero division
+
+
+def car_geometry(alpha):
+    """
+    Inner rear wheel angle and wheel speed ratios for a steering angle
+    alpha (degrees, 0-90): (beta, outer middle, inner front and rear,
+    inner middle), the speeds as a part of the outer front wheel speed.
+    """
+    # these are the most complicated calculations here, 1 is proportional adjacent distance
+    if alpha < MIN_TURN:
+        return alpha, 1.0, 1.0, 1.0
+    r = 1 / tan(radians(alpha))
+    r_ = (r**2 + 1) ** 0.5
+    R = r + DR
+    R_ = (R**2 + 1) ** 0.5
+    return round(degrees(atan(1 / R))), R / R_, r_ / R_, r / R_
+
+
+# Car mode geometry for every whole steering angle 0-90
+CAR_TABLE = [car_geometry(alpha) for alpha in range(HALF_RANGE + 1)]
+
+ROVER_ANGLES = [
+    HALF_RANGE - R_ANGLE,
+    HALF_RANGE,
+    HALF_RANGE + R_ANGLE,
+    HALF_RANGE + R_ANGLE,
+    HALF_RANGE,
+    HALF_RANGE - R_ANGLE,
+]
+
+
+def car_lookup(alpha, v0):
+    """Car mode (beta, v1, v2, v3) for a steering angle and speed."""
+    beta, k1, k2, k3 = CAR_TABLE[min(abs(alpha), HALF_RANGE)]
+    v0 = abs(v0)
+    return beta, round(v0 * k1), round(v0 * k2), round(v0 * k3)
+
+
+def car(alpha, v0):
+    """Car mode: the inner wheels turn and drive slower."""
+    beta, v1, v2, v3 = car_lookup(alpha, v0)
+    speed = abs(v0)
+    if alpha > 0:  # turn right
+        angles = [HALF_RANGE + alpha, HALF_RANGE, HALF_RANGE - alpha,
+                  HALF_RANGE + beta, HALF_RANGE, HALF_RANGE - beta]
+    else:  # turn left
+        angles = [HALF_RANGE - beta, HALF_RANGE, HALF_RANGE + beta,
+                  HALF_RANGE + alpha, HALF_RANGE, HALF_RANGE - alpha]
+    d = -1 if v0 > 0 else 1  # the motors are mounted reversed
+    outer = (d * speed, d * v1, d * speed)
+    inner = (d * v2, d * v3, d * v2)
+    if alpha > 0:
+        return angles, outer, inner
+    return angles, inner, outer
+
+
+def parallel(alpha, v0):
+    """Parallel mode: all wheels at the same angle and speed."""
+    v = -v0  # the motors are mounted reversed
+    return [HALF_RANGE + alpha] * 6, (v, v, v), (v, v, v)
+
+
+def rover(v0):
+    """Rover mode: turn in place, the sides spin opposite ways."""
+    speed = abs(v0)
+    v1 = round(speed * R_COEF)
+    dl = -1 if v0 < 0 else 1
+    dr = -1 if v0 > 0 else 1
+    return (list(ROVER_ANGLES), (dl * speed, dl * v1, dl * speed),
+            (dr * speed, dr * v1, dr * speed))
+
+
+# -------------------------- CHECK AND TIME -------------------------------- #
+def car_calc(alpha, v0):
+    """The old car mode calculation, done on every update."""
+    alpha = abs(alpha)
+    v0 = abs(v0)
+    if alpha < MIN_TURN:
+        return alpha, v0, v0, v0
+    r = 1 / tan(radians(alpha))
+    r_ = (r**2 + 1) ** 0.5
+    R = r + DR
+    R_ = (R**2 + 1) ** 0.5
+    coef = v0 / R_
+    return round(degrees(atan(1 / R))), round(R * coef), round(r_ * coef), \
+        round(r * coef)
+
+
+def main():
+    from time import perf_counter
+
+    cases = [(alpha, v0) for alpha in range(-HALF_RANGE, HALF_RANGE + 1)
+             for v0 in range(-255, 256, 5)]
+    different = [c for c in cases if car_lookup(*c) != car_calc(*c)]
+    print(f"{len(cases)} car mode cases, {len(different)} different "
+          f"from the direct calculation")
+
+    for name, function in (("calculated", car_calc), ("table", car_lookup)):
+        start = perf_counter()
+        for alpha, v0 in cases:
+            function(alpha, v0)
+        time = (perf_counter() - start) / len(cases)
+        print(f"car mode update {name:10}: {time * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+    Name: tyr_protocol.py
+    Author:
+    Created:
+    Purpose: I2C frames between the Pi (tyr_controller.py) and the
+    Motor2040 controllers (code.py). Copy this file to the CIRCUITPY
+    drive next to code.py, both sides use the same code.
+
+    DRIVE frame, one I2C write sets all three wheels of a controller:
+        byte 0     command (CMD_DRIVE)
+        byte 1     sequence number, 0-255 and around again
+        bytes 2-7  speed of wheel A, B, C: signed 16 bit, little endian,
+                   -255 full backward to 255 full forward
+        byte 8     checksum: all 9 bytes add up to 0 (mod 256)
+
+    VELOCITY frame, the same layout with command CMD_VELOCITY, but the
+    speeds are wheel speed setpoints in milli revolutions per second.
+    The board then holds the speeds with its own PID loop until the next
+    DRIVE frame switches it back to open loop throttle.
+
+    GAINS frame, sets the velocity PID of all three wheels:
+        byte 0      command (CMD_GAINS)
+        bytes 1-12  kp, ki, kd: 32 bit floats
+        bytes 13-14 PID loop rate in Hz: unsigned 16 bit
+        byte 15     checksum
+
+    The old two byte writes (register 0-5, speed 0-255) still work.
+
+    TELEMETRY read, register REG_TELEMETRY, a snapshot of the wheels:
+        bytes 0-1   board time in milliseconds (wraps every 65 s)
+        bytes 2-13  encoder counts of wheel A, B, C: signed 32 bit
+        bytes 14-19 wheel velocities: signed 16 bit, counts per second
+        bytes 20-25 motor currents: signed 16 bit, milliamps
+        byte 26     checksum: all 27 bytes add up to 0 (mod 256)
+    GAINS read, register REG_GAINS: bytes 1-15 of the GAINS frame.
+
+    LOOP read, register REG_LOOP, timing of the PID loop:
+        bytes 0-1   loop rate in Hz
+        bytes 2-3   mean loop period in microseconds (since the last read)
+        bytes 4-5   longest loop period in microseconds (since the last read)
+        bytes 6-7   late loops, more than one and a half periods (total)
+        byte 8      checksum
+    All values little endian.
+"""
+import struct
+
+CMD_DRIVE = 0x10
+CMD_VELOCITY = 0x11
+CMD_GAINS = 0x12
+REG_TELEMETRY = 0x20
+REG_GAINS = 0x21
+REG_LOOP = 0x22
+
+WHEELS = 3  # motors A, B, C on every controller
+MAX_SPEED = 255
+VELOCITY_SCALE = 1000  # setpoint units per revolution per second
+
+DRIVE_FORMAT = "<BB3h"
+DRIVE_LENGTH = struct.calcsize(DRIVE_FORMAT) + 1  # + checksum
+
+TELEMETRY_FORMAT = "<H3i3h3h"
+TELEMETRY_LENGTH = struct.calcsize(TELEMETRY_FORMAT) + 1  # + checksum
+
+GAINS_FORMAT = "<B3fH"
+GAINS_LENGTH = struct.calcsize(GAINS_FORMAT) + 1  # + checksum
+
+LOOP_FORMAT = "<4H"
+LOOP_LENGTH = struct.calcsize(LOOP_FORMAT) + 1  # + checksum
+
+
+def checksum(data):
+    """Byte that makes the sum of data and itself 0 (mod 256)."""
+    return -sum(data) & 0xFF
+
+
+def pack_drive(seq, speeds):
+    """Build a DRIVE frame, speeds are clamped to -255..255."""
+    speeds = [max(-MAX_SPEED, min(MAX_SPEED, int(s))) for s in speeds]
+    frame = struct.pack(DRIVE_FORMAT, CMD_DRIVE, seq & 0xFF, *speeds)
+    return frame + bytes([checksum(frame)])
+
+
+def unpack_drive(frame, command=CMD_DRIVE):
+    """
+    Read a DRIVE (or VELOCITY) frame, return (seq, speeds).
+    Raises ValueError if the length or the checksum is wrong.
+    """
+    if len(frame) != DRIVE_LENGTH or frame[0] != command:
+        raise ValueError("not a drive frame")
+    if sum(frame) & 0xFF:
+        raise ValueError("bad checksum")
+    _, seq, a, b, c = struct.unpack(DRIVE_FORMAT, frame[:-1])
+    return seq, (a, b, c)
+
+
+def clamp16(value):
+    return max(-32768, min(32767, int(value)))
+
+
+def pack_velocity(seq, revs):
+    """Build a VELOCITY frame, revs are wheel speeds in rev/s."""
+    speeds = [clamp16(round(r * VELOCITY_SCALE)) for r in revs]
+    frame = struct.pack(DRIVE_FORMAT, CMD_VELOCITY, seq & 0xFF, *speeds)
+    return frame + bytes([checksum(frame)])
+
+
+def unpack_velocity(frame):
+    """Read a VELOCITY frame, return (seq, revs)."""
+    seq, speeds = unpack_drive(frame, CMD_VELOCITY)
+    return seq, tuple(s / VELOCITY_SCALE for s in speeds)
+
+
+def pack_gains(kp, ki, kd, rate):
+    """Build a GAINS frame, rate is the PID loop rate in Hz."""
+    frame = struct.pack(GAINS_FORMAT, CMD_GAINS, kp, ki, kd, int(rate))
+    return frame + bytes([checksum(frame)])
+
+
+def unpack_gains(frame):
+    """
+    Read a GAINS frame, or the GAINS read without the command byte,
+    return (kp, ki, kd, rate).
+    """
+    frame = bytes(frame)
+    if len(frame) == GAINS_LENGTH - 1:
+        frame = bytes([CMD_GAINS]) + frame
+    if len(frame) != GAINS_LENGTH or frame[0] != CMD_GAINS:
+        raise ValueError("not a gains frame")
+    if sum(frame) & 0xFF:
+        raise ValueError("bad checksum")
+    return struct.unpack(GAINS_FORMAT, frame[:-1])[1:]
+
+
+def pack_loop(rate, mean_us, max_us, late):
+    """Build a LOOP read, the times in microseconds."""
+    values = [max(0, min(0xFFFF, int(v))) for v in (rate, mean_us, max_us)]
+    frame = struct.pack(LOOP_FORMAT, *values, late & 0xFFFF)
+    return frame + bytes([checksum(frame)])
+
+
+def unpack_loop(frame):
+    """Read a LOOP read, return (rate, mean_us, max_us, late)."""
+    frame = bytes(frame)
+    if len(frame) != LOOP_LENGTH:
+        raise ValueError("not a loop read")
+    if sum(frame) & 0xFF:
+        raise ValueError("bad checksum")
+    return struct.unpack(LOOP_FORMAT, frame[:-1])
+
+
+def pack_telemetry(stamp, counts, velocities, currents):
+    """Build a TELEMETRY snapshot, stamp in milliseconds."""
+    frame = struct.pack(TELEMETRY_FORMAT, stamp & 0xFFFF, *counts,
+                        *[clamp16(v) for v in velocities],
+                        *[clamp16(c) for c in currents])
+    return frame + bytes([checksum(frame)])
+
+
+def unpack_telemetry(frame):
+    """
+    Read a TELEMETRY snapshot, return (stamp, counts, velocities, currents).
+    Raises ValueError if the length or the checksum is wrong.
+    """
+    frame = bytes(frame)
+    if len(frame) != TELEMETRY_LENGTH:
+        raise ValueError("not a telemetry snapshot")
+    if sum(frame) & 0xFF:
+        raise ValueError("bad checksum")
+    values = struct.unpack(TELEMETRY_FORMAT, frame[:-1])
+    return values[0], values[1:4], values[4:7], values[7:10]
@@ -0,0 +1,67 @@
+"""
+    Name: tyr_steering.py
+    Author:
+    Created:
+    Purpose: Write the six steering servo angles to the PCA9685 in one
+    I2C transaction. ServoKit writes every servo on its own, even when
+    the angle did not change. Here the last pulse of every channel is
+    kept, unchanged channels are skipped and the changed ones go out as
+    one auto-increment block write starting at the first changed channel.
+"""
+PCA_ADDRESS = 0x40  # PCA9685 servo controller addr
+MODE1 = 0x00
+AUTO_INCREMENT = 0x20  # MODE1 bit: registers advance on block writes
+LED0_ON_L = 0x06  # 4 registers per channel: ON_L, ON_H, OFF_L, OFF_H
+REFERENCE_CLOCK = 25000000
+FREQUENCY = 50  # servo PWM frequency, the same as ServoKit
+MIN_PULSE = 470  # microseconds
+MAX_PULSE = 2520
+ACTUATION_RANGE = 180  # degrees
+
+
+def real_frequency(frequency=FREQUENCY):
+    """The frequency the PCA9685 really runs at, from its prescaler."""
+    prescale = int(REFERENCE_CLOCK / 4096 / frequency + 0.5)
+    return REFERENCE_CLOCK / 4096 / prescale
+
+
+def angle_counts(angle, frequency=FREQUENCY):
+    """12 bit off time of a servo angle, like ServoKit calculates it."""
+    angle = max(0, min(ACTUATION_RANGE, angle))
+    pulse = MIN_PULSE + (MAX_PULSE - MIN_PULSE) * angle / ACTUATION_RANGE
+    return round(pulse * real_frequency(frequency) * 4096 / 1000000)
+
+
+class Steering:
+    def __init__(self, bus, address=PCA_ADDRESS, channels=6,
+                 frequency=FREQUENCY):
+        self.bus = bus
+        self.address = address
+        self.frequency = frequency
+        self.counts = [None] * channels  # last value written, per channel
+        self.writes = 0  # I2C transactions, for checking
+        # auto-increment makes one block write fill several channels
+        mode = bus.read_byte_data(address, MODE1)
+        if not mode & AUTO_INCREMENT:
+            bus.write_byte_data(address, MODE1, mode | AUTO_INCREMENT)
+
+    def set_angles(self, angles):
+        """Move the servos to the angles, return False if the write failed"""
+        counts = [angle_counts(a, self.frequency) for a in angles]
+        changed = [i for i, c in enumerate(counts) if c != self.counts[i]]
+        if not changed:
+            return True
+        first, last = changed[0], changed[-1]
+        data = []
+        for c in counts[first:last + 1]:
+            # on at 0, off after c counts
+            data += [0, 0, c & 0xFF, c >> 8]
+        try:
+            self.bus.write_i2c_block_data(
+                self.address, LED0_ON_L + 4 * first, data)
+        except OSError:
+            print("Servo controller is not connected")
+            return False
+        self.writes += 1
+        self.counts[first:last + 1] = counts[first:last + 1]
+        return True
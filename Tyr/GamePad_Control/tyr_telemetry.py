@@ -0,0 +1,115 @@
+"""
+    Name: tyr_telemetry.py
+    Author:
+    Created:
+    Purpose: Read the wheel telemetry (encoder counts, velocities and
+    motor currents) of both Motor2040 boards at a fixed rate, in its
+    own thread, and keep the latest snapshot of every board for the
+    control code. See the TELEMETRY read in tyr_protocol.py.
+"""
+from collections import namedtuple
+from threading import Thread, Lock
+from time import monotonic, sleep
+from tyr_protocol import (
+    REG_TELEMETRY, TELEMETRY_LENGTH, REG_GAINS, GAINS_LENGTH, REG_LOOP,
+    LOOP_LENGTH, unpack_telemetry, unpack_gains, unpack_loop)
+
+POLL_RATE = 25  # snapshots per second from every board
+
+# One snapshot of a board:
+# time is the Pi's monotonic time of the read, stamp the board's time (ms),
+# counts, velocities (counts per second) and currents (mA) per wheel A, B, C
+Telemetry = namedtuple(
+    "Telemetry", "time stamp counts velocities currents")
+
+
+class TelemetryPoller:
+    def __init__(self, bus, boards, rate=POLL_RATE):
+        """boards: name -> I2C address, like {"left": LMC, "right": RMC}"""
+        self.bus = bus
+        self.boards = dict(boards)
+        self.rate = rate
+        self.running = False
+        self.thread = None
+        self.lock = Lock()
+        self.latest = {}  # name -> Telemetry
+        self.errors = 0  # failed or corrupt reads
+        self.listeners = []
+
+    def read(self, address):
+        """One snapshot of a board, None if the read failed"""
+        try:
+            data = self.bus.read_i2c_block_data(
+                address, REG_TELEMETRY, TELEMETRY_LENGTH)
+            stamp, counts, velocities, currents = unpack_telemetry(data)
+        except (OSError, ValueError):
+            self.errors += 1
+            return None
+        return Telemetry(monotonic(), stamp, counts, velocities, currents)
+
+    def read_gains(self, name):
+        """(kp, ki, kd, loop rate) of a board's velocity PID, None if the
+        read failed"""
+        try:
+            data = self.bus.read_i2c_block_data(
+                self.boards[name], REG_GAINS, GAINS_LENGTH - 1)
+            return unpack_gains(data)
+        except (OSError, ValueError):
+            return None
+
+    def read_loop(self, name):
+        """(loop rate, mean period us, longest period us, late loops) of a
+        board's PID loop since the last read, None if the read failed"""
+        try:
+            data = self.bus.read_i2c_block_data(
+                self.boards[name], REG_LOOP, LOOP_LENGTH)
+            return unpack_loop(data)
+        except (OSError, ValueError):
+            return None
+
+    def poll(self):
+        """Read every board once and tell the listeners"""
+        for name, address in self.boards.items():
+            telemetry = self.read(address)
+            if telemetry is None:
+                continue
+            with self.lock:
+                self.latest[name] = telemetry
+            for listener in self.listeners:
+                listener(name, telemetry)
+
+    def get(self, name):
+        """Latest snapshot of a board, None before the first read"""
+        with self.lock:
+            return self.latest.get(name)
+
+    def subscribe(self, listener):
+        """Call listener(name, telemetry) on every new snapshot,
+        from the poller thread, so keep it short"""
+        self.listeners.append(listener)
+
+    def run(self):
+        """Poll at a fixed rate until running is False, start() sets it"""
+        period = 1 / self.rate
+        next_poll = monotonic()
+        while self.running:
+            self.poll()
+            next_poll += period
+            delay = next_poll - monotonic()
+            if delay > 0:
+                sleep(delay)
+            else:
+                # fell behind, start counting again instead of catching up
+                next_poll = monotonic()
+
+    def start(self):
+        """Poll in a daemon thread"""
+        self.running = True
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop polling, returns after the last poll"""
+        self.running = False
+        if self.thread:
+            self.thread.join()
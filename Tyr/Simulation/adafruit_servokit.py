@@ -0,0 +1,59 @@
+"""
+    Name: adafruit_servokit.py
+    Author:
+    Created:
+    Purpose: Simulated ServoKit, sets up the virtual PCA9685 of
+    virtual_bus.py the way the real library sets up the chip.
+"""
+import virtual_bus
+from virtual_bus import PCA9685
+
+REFERENCE_CLOCK = 25000000
+
+
+class Servo:
+    def __init__(self, kit, channel):
+        self.kit = kit
+        self.channel = channel
+        self.actuation_range = 180
+        self.min_pulse = 750
+        self.max_pulse = 2250
+        self._angle = None
+
+    def set_pulse_width_range(self, min_pulse=750, max_pulse=2250):
+        self.min_pulse = min_pulse
+        self.max_pulse = max_pulse
+
+    @property
+    def angle(self):
+        return self._angle
+
+    @angle.setter
+    def angle(self, value):
+        self._angle = value
+        pulse = self.min_pulse + (self.max_pulse - self.min_pulse) * (
+            value / self.actuation_range)
+        counts = round(pulse * self.kit.frequency * 4096 / 1000000)
+        self.kit.bus.transaction(
+            self.kit.address, "write_i2c_block_data",
+            PCA9685.LED0_ON_L + 4 * self.channel,
+            bytes([0, 0, counts & 0xFF, counts >> 8]))
+
+
+class ServoKit:
+    def __init__(self, *, channels, i2c=None, address=0x40,
+                 reference_clock_speed=REFERENCE_CLOCK, frequency=50):
+        self.bus = virtual_bus.bus
+        self.address = address
+        prescale = int(reference_clock_speed / 4096 / frequency + 0.5)
+        self.frequency = reference_clock_speed / 4096 / prescale
+        # sleep, set the prescaler, wake up with auto-increment on
+        self.write(PCA9685.MODE1, 0x10)
+        self.write(PCA9685.PRESCALE, prescale - 1)
+        self.write(PCA9685.MODE1, 0xA0)
+        self.servo = [Servo(self, i) for i in range(channels)]
+
+    def write(self, register, value):
+        # raises OSError like the real library when the chip is missing
+        self.bus.transaction(self.address, "write_byte_data", register,
+                             bytes([value]))
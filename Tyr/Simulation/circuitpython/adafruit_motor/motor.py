@@ -0,0 +1,58 @@
+"""
+    Name: motor.py
+    Author:
+    Created:
+    Purpose: adafruit_motor.motor for the simulation, it sets the duty
+    cycles of the two pins the same way the real library does
+"""
+
+FAST_DECAY = 0  # Recirculation current fast decay mode (coasting)
+SLOW_DECAY = 1  # Recirculation current slow decay mode (braking)
+
+
+class DCMotor:
+    def __init__(self, positive_pwm, negative_pwm):
+        self._positive = positive_pwm
+        self._negative = negative_pwm
+        self._throttle = None
+        self.decay_mode = FAST_DECAY
+
+    @property
+    def throttle(self):
+        return self._throttle
+
+    @throttle.setter
+    def throttle(self, value):
+        if value is not None and (value > 1.0 or value < -1.0):
+            raise ValueError("Throttle must be None or between -1.0 and +1.0")
+        self._throttle = value
+        if value is None:  # coast
+            self._positive.duty_cycle = 0
+            self._negative.duty_cycle = 0
+        elif value == 0:  # brake
+            self._positive.duty_cycle = 0xFFFF
+            self._negative.duty_cycle = 0xFFFF
+        else:
+            duty_cycle = int(0xFFFF * abs(value))
+            if self.decay_mode == SLOW_DECAY:
+                if value < 0:
+                    self._positive.duty_cycle = 0xFFFF - duty_cycle
+                    self._negative.duty_cycle = 0xFFFF
+                else:
+                    self._positive.duty_cycle = 0xFFFF
+                    self._negative.duty_cycle = 0xFFFF - duty_cycle
+            elif value < 0:
+                self._positive.duty_cycle = 0
+                self._negative.duty_cycle = duty_cycle
+            else:
+                self._positive.duty_cycle = duty_cycle
+                self._negative.duty_cycle = 0
+
+    def deinit(self):
+        self.throttle = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
@@ -0,0 +1,29 @@
+"""
+    Name: analogio.py
+    Author:
+    Created:
+    Purpose: The shared ADC of the Motor2040 for the simulation, it reads
+    what the mux selects in plant.py
+"""
+from plant import plant, REFERENCE_VOLTAGE
+
+
+class AnalogIn:
+    def __init__(self, pin):
+        self.pin = pin
+        self.reference_voltage = REFERENCE_VOLTAGE
+
+    @property
+    def value(self):
+        plant.read()
+        ratio = plant.adc_voltage() / self.reference_voltage
+        return int(max(0.0, min(1.0, ratio)) * 65535)
+
+    def deinit(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
@@ -0,0 +1,55 @@
+"""
+    Name: board.py
+    Author:
+    Created:
+    Purpose: Pins of the Motor2040 for the simulation, see plant.py
+"""
+
+
+class Pin:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "board." + self.name
+
+
+NUM_MOTORS = 4
+NUM_ENCODERS = 4
+NUM_LEDS = 1
+NUM_SENSORS = 2
+
+for _motor in "ABCD":
+    for _end in "PN":
+        globals()["MOTOR_{}_{}".format(_motor, _end)] = Pin(
+            "MOTOR_{}_{}".format(_motor, _end))
+    for _channel in "AB":
+        globals()["ENCODER_{}_{}".format(_motor, _channel)] = Pin(
+            "ENCODER_{}_{}".format(_motor, _channel))
+
+USER_SW = Pin("USER_SW")
+LED_DATA = Pin("LED_DATA")
+SCL = Pin("SCL")
+SDA = Pin("SDA")
+SHARED_ADC = Pin("SHARED_ADC")
+ADC_ADDR_0 = Pin("ADC_ADDR_0")
+ADC_ADDR_1 = Pin("ADC_ADDR_1")
+ADC_ADDR_2 = Pin("ADC_ADDR_2")
+
+# mux addresses of the shared ADC
+CURRENT_SENSE_A_ADDR = 0b000
+CURRENT_SENSE_B_ADDR = 0b001
+CURRENT_SENSE_C_ADDR = 0b010
+CURRENT_SENSE_D_ADDR = 0b011
+VOLTAGE_SENSE_ADDR = 0b100
+FAULT_SENSE_ADDR = 0b101
+SENSOR_1_ADDR = 0b110
+SENSOR_2_ADDR = 0b111
+
+
+def motor_index(pin):
+    """Motor 0-3 of a MOTOR_ or ENCODER_ pin, None for other pins"""
+    parts = pin.name.split("_")
+    if parts[0] in ("MOTOR", "ENCODER"):
+        return "ABCD".index(parts[1])
+    return None
@@ -0,0 +1,61 @@
+"""
+    Name: digitalio.py
+    Author:
+    Created:
+    Purpose: Digital pins for the simulation: the USER switch and the
+    address pins of the ADC mux are connected to plant.py
+"""
+from plant import plant
+
+
+class Direction:
+    INPUT = "input"
+    OUTPUT = "output"
+
+
+class Pull:
+    UP = "up"
+    DOWN = "down"
+
+
+class DriveMode:
+    PUSH_PULL = "push_pull"
+    OPEN_DRAIN = "open_drain"
+
+
+class DigitalInOut:
+    def __init__(self, pin):
+        self.pin = pin
+        self.direction = Direction.INPUT
+        self.pull = None
+        self._value = False
+
+    @property
+    def value(self):
+        plant.read()
+        if self.pin.name == "USER_SW":
+            return not plant.user_switch  # pulled up, low when pressed
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = bool(value)
+        if self.pin.name.startswith("ADC_ADDR_"):
+            plant.mux[int(self.pin.name[-1])] = self._value
+
+    def switch_to_output(self, value=False, drive_mode=DriveMode.PUSH_PULL):
+        self.direction = Direction.OUTPUT
+        self.value = value
+
+    def switch_to_input(self, pull=None):
+        self.direction = Direction.INPUT
+        self.pull = pull
+
+    def deinit(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
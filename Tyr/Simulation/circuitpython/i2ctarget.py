@@ -0,0 +1,56 @@
+"""
+    Name: i2ctarget.py
+    Author:
+    Created:
+    Purpose: I2C target for the simulation. Writes queued in plant.i2c,
+    as (address, bytes), come out of request(), reads get nothing back.
+"""
+from plant import plant
+
+
+class I2CTargetRequest:
+    def __init__(self, target, address, is_read, data):
+        self.target = target
+        self.address = address
+        self.is_read = is_read
+        self.is_restart = False
+        self._data = data
+
+    def read(self, n=-1, ack=True):
+        data, self._data = self._data, b""
+        return data if n < 0 else data[:n]
+
+    def write(self, buffer):
+        self.target.written.append(bytes(buffer))
+        return len(buffer)
+
+    def ack(self, ack=True):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class I2CTarget:
+    def __init__(self, scl, sda, addresses, smbus=False):
+        self.addresses = tuple(addresses)
+        self.written = []  # what the program answered to reads
+
+    def request(self, *, timeout=-1):
+        for i, (address, data) in enumerate(plant.i2c):
+            if address in self.addresses:
+                del plant.i2c[i]
+                return I2CTargetRequest(self, address, False, bytes(data))
+        return None
+
+    def deinit(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
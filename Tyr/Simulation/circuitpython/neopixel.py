@@ -0,0 +1,25 @@
+"""
+    Name: neopixel.py
+    Author:
+    Created:
+    Purpose: The on-board LED for the simulation, it keeps the colours
+"""
+
+
+class NeoPixel(list):
+    def __init__(self, pin, n, *, brightness=1.0, auto_write=True,
+                 pixel_order=None):
+        super().__init__([(0, 0, 0)] * n)
+        self.pin = pin
+        self.brightness = brightness
+        self.auto_write = auto_write
+
+    def fill(self, color):
+        for i in range(len(self)):
+            self[i] = color
+
+    def show(self):
+        pass
+
+    def deinit(self):
+        pass
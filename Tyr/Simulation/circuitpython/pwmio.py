@@ -0,0 +1,33 @@
+"""
+    Name: pwmio.py
+    Author:
+    Created:
+    Purpose: PWM outputs for the simulation, the motor pins drive the
+    motors of plant.py
+"""
+from board import motor_index
+from plant import plant
+
+
+class PWMOut:
+    def __init__(self, pin, *, duty_cycle=0, frequency=500,
+                 variable_frequency=False):
+        self.pin = pin
+        self.duty_cycle = duty_cycle
+        self.frequency = frequency
+        index = motor_index(pin)
+        if index is not None:
+            motor = plant.motors[index]
+            if pin.name.endswith("_P"):
+                motor.pwm_p = self
+            else:
+                motor.pwm_n = self
+
+    def deinit(self):
+        self.duty_cycle = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
@@ -0,0 +1,36 @@
+"""
+    Name: rotaryio.py
+    Author:
+    Created:
+    Purpose: Encoders for the simulation, they count the turns of the
+    motors of plant.py
+"""
+from board import motor_index
+from plant import plant
+
+
+class IncrementalEncoder:
+    def __init__(self, pin_a, pin_b, divisor=4):
+        self.motor = plant.motors[motor_index(pin_a)]
+        # (ENCODER_x_B, ENCODER_x_A) counts up when the motor goes forward
+        self.sign = 1 if pin_a.name.endswith("_B") else -1
+        self.divisor = divisor
+        self.offset = 0
+
+    @property
+    def position(self):
+        plant.read()
+        return int(self.sign * self.motor.counts / self.divisor) - self.offset
+
+    @position.setter
+    def position(self, value):
+        self.offset += self.position - value
+
+    def deinit(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.deinit()
@@ -0,0 +1,27 @@
+"""
+    Name: usb_cdc.py
+    Author:
+    Created:
+    Purpose: USB serial ports for the simulation. The data port is off,
+    like without a boot.py, until run_board.py --telemetry sets it.
+"""
+
+
+class FileSerial:
+    """A data port that writes to a file"""
+
+    def __init__(self, file):
+        self.file = file
+        self.connected = True
+        self.write_timeout = None
+
+    def write(self, data):
+        return self.file.write(data)
+
+
+console = None
+data = None
+
+
+def enable(console=True, data=False):
+    pass
@@ -0,0 +1,181 @@
+"""
+    Name: plant.py
+    Author:
+    Created:
+    Purpose: A simulated Motor2040 for the stub CircuitPython modules in
+    circuitpython/: four DC motors with gearboxes and encoders, the shared
+    ADC and a simulated clock. run_board.py runs the board programs on it.
+
+    Time only moves when the program sleeps, reads the clock or reads an
+    input (every read costs READ_COST), so a program runs as fast as the PC allows
+    and gives the same result every time. With cpu_factor the PC time
+    the program takes, times the factor, is added too, to see how a
+    slower board would keep its loop rate.
+"""
+import time
+from math import exp
+
+# The motors of Code/Original_Examples
+GEAR_RATIO = 50  # The gear ratio of the motor
+COUNTS_PER_MOTOR_REV = 12  # encoder counts per motor shaft turn (divisor=1)
+COUNTS_PER_REV = COUNTS_PER_MOTOR_REV * GEAR_RATIO  # per output shaft turn
+SPEED_SCALE = 5.4  # output shaft revolutions per second at full throttle
+TIME_CONSTANT = 0.15  # seconds for the speed to reach 63% of a new target
+FRICTION = 0.05  # throttle that only overcomes the friction
+NO_LOAD_CURRENT = 0.1  # amps
+STALL_CURRENT = 1.5  # amps at full throttle with the shaft stopped
+BATTERY = 7.4  # volts
+
+# Shared ADC of the Motor2040
+REFERENCE_VOLTAGE = 3.3
+SHUNT_RESISTOR = 0.47
+CURRENT_OFFSET = 0.005  # volts the current sense reads at 0 A
+VOLTAGE_GAIN = 0.28058  # battery volts to ADC volts
+CURRENT_SENSE_ADDR = (0b000, 0b001, 0b010, 0b011)  # motors A to D
+VOLTAGE_SENSE_ADDR = 0b100
+
+READ_COST = 10e-6  # simulated seconds every clock or input read takes
+MAX_STEP = 0.001  # seconds, longest step of the motor model
+
+
+class SimulationEnd(BaseException):
+    """Stops a program that never ends by itself (not an Exception, so
+    the programs' own 'except Exception' does not catch it)"""
+
+
+class Motor:
+    """DC motor with gearbox and encoder, the speed follows the throttle
+    with a first order lag, less the friction and the load"""
+
+    def __init__(self):
+        self.pwm_p = None  # PWMOut objects of the motor pins
+        self.pwm_n = None
+        self.speed = 0.0  # output shaft revolutions per second
+        self.position = 0.0  # output shaft revolutions
+        self.load = 0.0  # throttle the load takes, like driving uphill
+
+    @property
+    def throttle(self):
+        """-1.0 to 1.0 from the duty cycles of the two motor pins"""
+        p = self.pwm_p.duty_cycle if self.pwm_p else 0
+        n = self.pwm_n.duty_cycle if self.pwm_n else 0
+        return (p - n) / 0xFFFF
+
+    def target(self):
+        """Speed the motor goes to with the throttle now"""
+        drive = self.throttle - self.load
+        if abs(drive) <= FRICTION:
+            return 0.0
+        sign = 1 if drive > 0 else -1
+        return sign * SPEED_SCALE * (abs(drive) - FRICTION) / (1 - FRICTION)
+
+    def step(self, dt):
+        target = self.target()
+        # exact step of a first order lag, stable for any dt
+        old = self.speed
+        factor = exp(-dt / TIME_CONSTANT)
+        self.speed = target + (old - target) * factor
+        self.position += target * dt + (old - target) * TIME_CONSTANT * (
+            1 - factor)
+
+    @property
+    def counts(self):
+        """Quadrature counts of the encoder with divisor=1"""
+        return int(self.position * COUNTS_PER_REV)
+
+    @property
+    def current(self):
+        """Amps, grows with the difference of throttle and speed"""
+        throttle = self.throttle
+        if not throttle:
+            return 0.0
+        slip = abs(throttle - self.speed / SPEED_SCALE)
+        return NO_LOAD_CURRENT + (STALL_CURRENT - NO_LOAD_CURRENT) * min(1, slip)
+
+
+class Plant:
+    def __init__(self, motors=4, cpu_factor=0.0):
+        self.motors = [Motor() for _ in range(motors)]
+        self.time = 0.0  # simulated seconds
+        self.cpu_factor = cpu_factor
+        self.wall = time.perf_counter()
+        self.mux = [False, False, False]  # ADC_ADDR_0..2 outputs
+        self.user_switch = False  # True while the USER switch is pressed
+        self.stop_time = None  # SimulationEnd is raised after this
+        self.i2c = []  # requests for the I2C target, see circuitpython/i2ctarget.py
+        self.listeners = []  # called with the plant after every step
+
+    # ----------------------------- CLOCK ---------------------------------- #
+    def advance(self, dt):
+        """Move the simulated time on by dt, and the PC time it took"""
+        dt += (time.perf_counter() - self.wall) * self.cpu_factor
+        while dt > 0:
+            step = min(dt, MAX_STEP)
+            for motor in self.motors:
+                motor.step(step)
+            self.time += step
+            dt -= step
+            for listener in self.listeners:
+                listener(self)
+        # the motor model's own PC time is not the program's
+        self.wall = time.perf_counter()
+        if self.stop_time is not None and self.time > self.stop_time:
+            self.stop_time = None  # only once, the clean up may read the clock
+            raise SimulationEnd()
+
+    def read(self):
+        """Called by the stubs on every input read, so busy loops go on"""
+        self.advance(READ_COST)
+
+    def monotonic(self):
+        self.advance(READ_COST)
+        return self.time
+
+    def monotonic_ns(self):
+        self.advance(READ_COST)
+        return int(self.time * 1e9)
+
+    def sleep(self, seconds):
+        self.advance(max(0.0, seconds))
+
+    def patch_time(self):
+        """Make the time module use the simulated clock"""
+        time.monotonic = self.monotonic
+        time.monotonic_ns = self.monotonic_ns
+        time.sleep = self.sleep
+        time.time = self.monotonic
+        self.patch_asyncio()
+
+    def patch_asyncio(self):
+        """Make asyncio.sleep wait on the simulated clock too"""
+        import asyncio
+        import selectors
+
+        plant = self
+
+        class SimulatedSelector(selectors.DefaultSelector):
+            def select(self, timeout=None):
+                if timeout:
+                    plant.sleep(timeout)
+                return super().select(0)
+
+        class SimulatedPolicy(asyncio.DefaultEventLoopPolicy):
+            def new_event_loop(self):
+                return asyncio.SelectorEventLoop(SimulatedSelector())
+
+        asyncio.set_event_loop_policy(SimulatedPolicy())
+
+    # ----------------------------- ADC ------------------------------------ #
+    def adc_voltage(self):
+        """Voltage of the shared ADC for the mux address now"""
+        address = sum(1 << i for i, on in enumerate(self.mux) if on)
+        if address in CURRENT_SENSE_ADDR[:len(self.motors)]:
+            motor = self.motors[CURRENT_SENSE_ADDR.index(address)]
+            return motor.current * SHUNT_RESISTOR + CURRENT_OFFSET
+        if address == VOLTAGE_SENSE_ADDR:
+            return BATTERY * VOLTAGE_GAIN
+        return 0.0
+
+
+# the plant the stub modules use, run_board.py sets it up
+plant = Plant()
@@ -0,0 +1,109 @@
+"""
+    Name: run_board.py
+    Author:
+    Created:
+    Purpose: Run a Motor2040 program (an example or the firmware code.py)
+    on Linux, unchanged, with the stub CircuitPython modules of
+    circuitpython/ and the motor model of plant.py. The simulated clock
+    runs as fast as the PC allows, faster than real time.
+
+    python run_board.py ../Code/Original_Examples/velocity_control.py --seconds 10 --quiet
+    python run_board.py ../Code/Original_Examples/quad_position_wave.py --cpu-factor 20
+    python run_board.py ../GamePad_Control/code.py --velocity 2.0 --telemetry run.bin
+
+    After --seconds of simulated time the USER switch is pressed, the
+    examples stop on it. Programs that keep running are stopped one
+    second later. Then the speed of every motor, the simulated and PC
+    time are printed.
+"""
+import os
+import sys
+import runpy
+import argparse
+from time import perf_counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TYR = os.path.dirname(HERE)
+# The stub modules must be found before anything else
+sys.path.insert(0, os.path.join(HERE, "circuitpython"))
+sys.path.insert(1, HERE)
+sys.path.append(os.path.join(TYR, "Code", "Original_Examples"))
+sys.path.append(os.path.join(TYR, "GamePad_Control"))
+
+from plant import plant, SimulationEnd  # noqa: E402
+import usb_cdc  # noqa: E402
+
+MOTOR2040_ADDRESS = 0x44  # the firmware answers on both 0x44 and 0x48
+
+
+def velocity_frame(revs):
+    """The I2C frame that sets the three wheels of the firmware to revs rev/s"""
+    from tyr_protocol import pack_velocity
+
+    return pack_velocity(0, [revs] * 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a Motor2040 program")
+    parser.add_argument("program", help="the .py file to run")
+    parser.add_argument("--seconds", type=float, default=5,
+                        help="simulated seconds before the USER switch is pressed")
+    parser.add_argument("--cpu-factor", type=float, default=0.0,
+                        help="add the PC time of the program times this "
+                             "to the clock, about 20 for a Motor2040")
+    parser.add_argument("--load", type=float, default=0.0,
+                        help="throttle every motor loses to its load")
+    parser.add_argument("--velocity", type=float,
+                        help="send the firmware a VELOCITY frame, rev/s")
+    parser.add_argument("--telemetry", help="write usb_cdc.data to this file")
+    parser.add_argument("--drive", default=".",
+                        help="folder the program sees as the CIRCUITPY drive, "
+                             "where gains.json is read and written")
+    parser.add_argument("--quiet", action="store_true",
+                        help="hide what the program prints")
+    args = parser.parse_args()
+
+    program = os.path.abspath(args.program)
+    sys.path.insert(2, os.path.dirname(program))
+    os.chdir(args.drive)
+    plant.cpu_factor = args.cpu_factor
+    for motor in plant.motors:
+        motor.load = args.load
+    if args.velocity is not None:
+        plant.i2c.append((MOTOR2040_ADDRESS, velocity_frame(args.velocity)))
+
+    def press_switch(plant):
+        if plant.time >= args.seconds:
+            plant.user_switch = True
+    plant.listeners.append(press_switch)
+    plant.stop_time = args.seconds + 1.0
+
+    telemetry = open(args.telemetry, "wb") if args.telemetry else None
+    if telemetry:
+        usb_cdc.data = usb_cdc.FileSerial(telemetry)
+    output = open(os.devnull, "w") if args.quiet else sys.stdout
+    stdout = sys.stdout
+    plant.patch_time()
+    start = perf_counter()
+    ending = "ended"
+    try:
+        sys.stdout = output
+        runpy.run_path(program, run_name="__main__")
+    except SimulationEnd:
+        ending = "stopped"
+    finally:
+        sys.stdout = stdout
+        wall = perf_counter() - start
+        if telemetry:
+            telemetry.close()
+
+    print(f"{os.path.basename(program)} {ending} after {plant.time:.2f} s "
+          f"simulated, {wall:.2f} s on the PC ({plant.time / wall:.1f}x)")
+    for i, motor in enumerate(plant.motors):
+        print(f"  motor {'ABCD'[i]}  throttle {motor.throttle:+.2f}  "
+              f"speed {motor.speed:+.2f} rev/s  "
+              f"position {motor.position:+.2f} rev ({motor.counts} counts)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+    Name: run_sim.py
+    Author:
+    Created:
+    Purpose: Run Tyr's Pi programs on the simulated I2C bus and report,
+    per scenario, the bus transactions per second and the latency from
+    an input (stick event or web request) to the bus write it causes.
+
+    python run_sim.py                 all scenarios
+    python run_sim.py turn web        some of them
+    python run_sim.py --seconds 5     longer runs
+
+    Needs the libraries of the programs themselves (pyPS4Controller for
+    tyr_controller.py, flask for Web_Control), but no hardware.
+"""
+import os
+import sys
+import runpy
+import argparse
+import random
+from time import perf_counter, sleep
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TYR = os.path.dirname(HERE)
+# The simulated smbus and ServoKit must be found before the real ones
+sys.path.insert(0, HERE)
+sys.path.append(os.path.join(TYR, "GamePad_Control"))
+sys.path.append(os.path.join(TYR, "Web_Control"))
+
+import virtual_bus  # noqa: E402
+from virtual_bus import RIGHT_MOTORS, LEFT_MOTORS, SERVOS, ARDUINO  # noqa: E402
+
+EVENT_RATE = 100  # stick events per second, a PS4 stick sends about this
+SCENARIOS = {}
+
+
+def scenario(function):
+    SCENARIOS[function.__name__] = function
+    return function
+
+
+# ------------------------------ REPORT ------------------------------------ #
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def latencies(events, log, addresses):
+    """
+    Time from every input to the first write to one of the addresses
+    after it, inputs that caused no write before the next input are
+    left out.
+    """
+    writes = [t.time for t in log if t.address in addresses and t.ok]
+    result = []
+    i = 0
+    for n, event in enumerate(events):
+        end = events[n + 1] if n + 1 < len(events) else float("inf")
+        while i < len(writes) and writes[i] < event:
+            i += 1
+        if i < len(writes) and writes[i] < end:
+            result.append(writes[i] - event)
+    return result
+
+
+def report(name, seconds, log, delays):
+    devices = {}
+    for t in log:
+        if t.ok:
+            devices[t.address] = devices.get(t.address, 0) + 1
+    counts = "  ".join(f"0x{a:02X}:{n}" for a, n in sorted(devices.items()))
+    missing = sum(1 for t in log if not t.ok)
+    print(f"{name:12} {len(log):6} transactions  "
+          f"{len(log) / seconds:8.1f}/s  ({counts}  no answer:{missing})")
+    if delays:
+        ms = [d * 1000 for d in delays]
+        print(f"{'':12} latency n={len(ms)}  p50={percentile(ms, 50):.2f}  "
+              f"p99={percentile(ms, 99):.2f}  max={max(ms):.2f} ms")
+
+
+# ------------------------------ TYR CONTROLLER ---------------------------- #
+def run_controller(seconds, events):
+    """
+    Run MyController with its control tick and call events(controller, t)
+    EVENT_RATE times per second. Returns the input times.
+    """
+    import tyr_controller
+
+    controller = tyr_controller.MyController(
+        interface="/dev/input/js0", connecting_using_ds4drv=False)
+    controller.start()
+    times = []
+    start = perf_counter()
+    next_event = start
+    while perf_counter() - start < seconds:
+        times.append(perf_counter())
+        events(controller, times[-1] - start)
+        next_event += 1 / EVENT_RATE
+        sleep(max(0, next_event - perf_counter()))
+    controller.shutdown()  # the tick and the telemetry poller too
+    return times
+
+
+def stick(value):
+    """Stick position -1.0 to 1.0 as the PS4 controller reports it."""
+    return int(max(-1.0, min(1.0, value)) * 32767)
+
+
+@scenario
+def drive(seconds):
+    """Speed up and slow down, straight ahead."""
+    def events(controller, t):
+        v = stick((t % 2) - 1)
+        if v > 0:
+            controller.on_R3_down(v)
+        else:
+            controller.on_R3_up(v)
+    return run_controller(seconds, events), (LEFT_MOTORS, RIGHT_MOTORS)
+
+
+@scenario
+def turn(seconds):
+    """Constant speed, steering from left to right and back."""
+    def events(controller, t):
+        controller.on_R3_down(stick(0.6))
+        a = stick(abs((t % 2) - 1) * 2 - 1)
+        if a > 0:
+            controller.on_R3_right(a)
+        else:
+            controller.on_R3_left(a)
+    return run_controller(seconds, events), (LEFT_MOTORS, RIGHT_MOTORS, SERVOS)
+
+
+@scenario
+def storm(seconds):
+    """Random stick jitter, the control tick must keep the bus load flat."""
+    rnd = random.Random(1)
+
+    def events(controller, t):
+        controller.on_R3_down(stick(0.5 + rnd.uniform(-0.05, 0.05)))
+        controller.on_R3_right(stick(rnd.uniform(0.2, 0.3)))
+    return run_controller(seconds, events), (LEFT_MOTORS, RIGHT_MOTORS, SERVOS)
+
+
+@scenario
+def modes(seconds):
+    """Driving while switching car, parallel and rover modes."""
+    switched = set()
+
+    def events(controller, t):
+        controller.on_R3_down(stick(0.5))
+        step = int(t / (seconds / 4))
+        if step not in switched:
+            switched.add(step)
+            if step % 2:
+                controller.on_circle_press()
+            else:
+                controller.on_x_press()
+    return run_controller(seconds, events), (LEFT_MOTORS, RIGHT_MOTORS, SERVOS)
+
+
+# ------------------------------ WEB CONTROL ------------------------------- #
+@scenario
+def web(seconds):
+    """Web_Control commands through the Flask test client."""
+    import controlmotorserial
+
+    client = controlmotorserial.app.test_client()
+    times = []
+    start = perf_counter()
+    while perf_counter() - start < seconds:
+        times.append(perf_counter())
+        client.get("/send_command/F")
+        sleep(1 / EVENT_RATE)
+    return times, (ARDUINO,)
+
+
+# ------------------------------ I2C SCANNER ------------------------------- #
+@scenario
+def scan(seconds):
+    """Code/i2cdetect/i2c_scanner.py, every address once."""
+    runpy.run_path(os.path.join(TYR, "Code", "i2cdetect", "i2c_scanner.py"))
+    return [], ()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run Tyr's programs on the simulated I2C bus")
+    parser.add_argument("scenarios", nargs="*",
+                        help=f"scenarios to run: {', '.join(SCENARIOS)} "
+                             f"(all by default)")
+    parser.add_argument("--seconds", type=float, default=2,
+                        help="length of every scenario")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(sorted(unknown))}")
+
+    bus = virtual_bus.bus
+    for name in args.scenarios or SCENARIOS:
+        bus.clear()
+        start = perf_counter()
+        try:
+            events, addresses = SCENARIOS[name](args.seconds)
+        except ImportError as e:
+            print(f"{name:12} skipped: {e}")
+            continue
+        seconds = perf_counter() - start
+        log = list(bus.log)
+        report(name, seconds, log, latencies(events, log, addresses))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+    Name: smbus.py
+    Author:
+    Created:
+    Purpose: Drop-in simulated smbus, the Pi programs run unchanged on a
+    laptop when this folder comes first on the Python path:
+        PYTHONPATH=../Simulation python tyr_controller.py
+    Every SMBus talks to virtual_bus.bus, see virtual_bus.py.
+"""
+import virtual_bus
+
+
+class SMBus:
+    def __init__(self, bus=None):
+        self.bus = virtual_bus.bus
+
+    def open(self, bus):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # ----------------------------- READ ----------------------------------- #
+    def read_byte(self, i2c_addr):
+        return self.bus.transaction(i2c_addr, "read_byte", None, None, 1)[0]
+
+    def read_byte_data(self, i2c_addr, register):
+        return self.bus.transaction(
+            i2c_addr, "read_byte_data", register, None, 1)[0]
+
+    def read_word_data(self, i2c_addr, register):
+        data = self.bus.transaction(
+            i2c_addr, "read_word_data", register, None, 2)
+        return data[0] | data[1] << 8
+
+    def read_i2c_block_data(self, i2c_addr, register, length=32):
+        return list(self.bus.transaction(
+            i2c_addr, "read_i2c_block_data", register, None, length))
+
+    # ----------------------------- WRITE ---------------------------------- #
+    def write_quick(self, i2c_addr):
+        self.bus.transaction(i2c_addr, "write_quick", None, b"")
+
+    def write_byte(self, i2c_addr, value):
+        self.bus.transaction(i2c_addr, "write_byte", value, b"")
+
+    def write_byte_data(self, i2c_addr, register, value):
+        self.bus.transaction(
+            i2c_addr, "write_byte_data", register, bytes([value]))
+
+    def write_word_data(self, i2c_addr, register, value):
+        self.bus.transaction(i2c_addr, "write_word_data", register,
+                             bytes([value & 0xFF, value >> 8 & 0xFF]))
+
+    def write_i2c_block_data(self, i2c_addr, register, data):
+        if len(data) > 32:
+            raise ValueError("I2C block data is limited to 32 bytes")
+        self.bus.transaction(
+            i2c_addr, "write_i2c_block_data", register, bytes(data))
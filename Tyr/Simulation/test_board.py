@@ -0,0 +1,45 @@
+"""
+    Name: test_board.py
+    Author:
+    Created:
+    Purpose: Regression checks of the Motor2040 firmware on the simulated
+    motors of plant.py, run with pytest from this folder:
+
+    python -m pytest -q test_board.py
+
+    Every run goes through run_board.py in its own Python, because the
+    plant and the patched clock are shared by the whole process.
+"""
+import os
+import re
+import sys
+import subprocess
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIRMWARE = os.path.join(os.path.dirname(HERE), "GamePad_Control", "code.py")
+
+SPEED_TOLERANCE = 0.1  # rev/s off the setpoint a wheel may settle
+MOTOR_LINE = re.compile(r"motor ([ABCD])\s+throttle (\S+)\s+speed (\S+) rev/s")
+
+
+def run_board(program, *options, drive):
+    """Run a program with run_board.py, the speed of every motor at the end"""
+    result = subprocess.run(
+        [sys.executable, os.path.join(HERE, "run_board.py"), program,
+         "--quiet", "--drive", str(drive), *options],
+        capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+    return {name: float(speed)
+            for name, _, speed in MOTOR_LINE.findall(result.stdout)}
+
+
+@pytest.mark.parametrize("velocity", [2.0, -1.0])
+def test_firmware_settles_on_velocity(velocity, tmp_path):
+    # an empty drive, so no gains.json changes the PID
+    speeds = run_board(FIRMWARE, "--velocity", str(velocity), "--seconds", "3",
+                       drive=tmp_path)
+    for name in "ABC":
+        assert abs(speeds[name] - velocity) < SPEED_TOLERANCE, speeds
+    assert abs(speeds["D"]) < SPEED_TOLERANCE, speeds  # no wheel on D
@@ -0,0 +1,69 @@
+"""
+    Name: test_controller.py
+    Author:
+    Created:
+    Purpose: Checks of GamePad_Control/tyr_controller.py on the simulated
+    I2C bus of virtual_bus.py, run with pytest from this folder (needs
+    pyPS4Controller):
+
+    python -m pytest -q test_controller.py
+"""
+import os
+import sys
+from time import sleep
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# The simulated smbus and ServoKit must be found before the real ones
+sys.path.insert(0, HERE)
+sys.path.append(os.path.join(os.path.dirname(HERE), "GamePad_Control"))
+
+pytest.importorskip("pyPS4Controller")
+import virtual_bus  # noqa: E402
+import tyr_controller  # noqa: E402
+from virtual_bus import RIGHT_MOTORS, LEFT_MOTORS  # noqa: E402
+from tyr_protocol import CMD_VELOCITY, unpack_velocity  # noqa: E402
+
+
+@pytest.fixture
+def controller():
+    virtual_bus.bus.clear()
+    controller = tyr_controller.MyController(
+        interface="/dev/input/js0", connecting_using_ds4drv=False)
+    yield controller
+    controller.shutdown()
+
+
+def wheel_speeds(address):
+    """The rev/s of the last VELOCITY frame written to a board"""
+    for t in reversed(virtual_bus.bus.log):
+        if t.address == address and t.ok and t.register == CMD_VELOCITY:
+            return unpack_velocity(bytes([t.register]) + t.data)[1]
+    return None
+
+
+def test_x_press_stops_and_switches_mode(controller):
+    controller.start()
+    controller.on_R3_down(20000)
+    sleep(0.1)
+    assert all(wheel_speeds(LEFT_MOTORS))  # driving
+    controller.on_x_press()  # car -> parallel
+    assert controller.v0 == 0
+    assert controller.next_mode == (False, False)
+    for address in (LEFT_MOTORS, RIGHT_MOTORS):
+        assert not any(wheel_speeds(address))
+    sleep(tyr_controller.SERVO_TIME + 0.1)
+    assert not controller.car_mode
+    assert controller.next_mode is None
+
+
+def test_shutdown_stops_the_threads(controller):
+    controller.start()
+    sleep(0.1)
+    controller.shutdown()
+    assert not controller.thread.is_alive()
+    assert not controller.telemetry.thread.is_alive()
+    count = len(virtual_bus.bus.log)
+    sleep(0.1)
+    assert len(virtual_bus.bus.log) == count  # no tick or poll any more
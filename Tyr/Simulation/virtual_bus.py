@@ -0,0 +1,307 @@
+"""
+    Name: virtual_bus.py
+    Author:
+    Created:
+    Purpose: A simulated I2C bus with Tyr's devices, so the Pi programs
+    run on a laptop. The smbus.py next to this file uses it.
+
+    Devices on the default bus:
+    - 0x08 Arduino Mega of Web_Control, keeps the received commands
+    - 0x40 PCA9685 steering servo driver
+    - 0x44 right Motor2040, three wheels with encoders
+    - 0x48 left Motor2040
+
+    Every transaction is kept in bus.log with its time, so a run can be
+    checked and timed afterwards (see run_sim.py).
+"""
+import os
+import sys
+from math import exp
+from collections import namedtuple
+from threading import Lock
+from time import perf_counter
+
+# tyr_protocol.py and multi_pid.py are shared with the Motor2040 firmware
+TYR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(TYR, "GamePad_Control"))
+sys.path.append(os.path.join(TYR, "Code", "Original_Examples"))
+from multi_pid import MultiPID  # noqa: E402
+from motion_profile import Move, SCURVE, unit_table  # noqa: E402
+from tyr_protocol import (  # noqa: E402
+    CMD_DRIVE, CMD_VELOCITY, CMD_GAINS, REG_TELEMETRY, REG_GAINS, REG_LOOP,
+    MAX_SPEED, unpack_drive, unpack_velocity, unpack_gains, pack_telemetry,
+    pack_gains, pack_loop)
+
+# Wheel model, the same motors as Code/Original_Examples
+GEAR_RATIO = 50  # The gear ratio of the motor
+COUNTS_PER_REV = 12 * GEAR_RATIO  # counts per revolution of the output shaft
+SPEED_SCALE = 5.4  # output shaft revolutions per second at full throttle
+TIME_CONSTANT = 0.15  # seconds for the wheel to reach 63% of a new speed
+NO_LOAD_CURRENT = 0.1  # amps
+STALL_CURRENT = 1.5  # amps at full throttle with the wheel stopped
+# velocity PID of the firmware, until the Pi sends other gains
+VEL_KP = 30.0
+VEL_KI = 0.0
+VEL_KD = 0.4
+LOOP_RATE = 100
+RAMP_TIME = 0.1  # seconds to reach new wheel speeds
+
+# One bus transaction:
+# kind is the smbus method name, ok is False when no device answered
+Transaction = namedtuple(
+    "Transaction", "time address kind register data ok")
+
+
+# ------------------------------ DEVICES ----------------------------------- #
+class Device:
+    """A device on the bus, override the methods it answers."""
+
+    def write(self, register, data):
+        pass
+
+    def read(self, register, length):
+        return bytes(length)
+
+
+class Wheel:
+    """DC motor with encoder: the speed follows the throttle with a lag."""
+
+    def __init__(self):
+        self.throttle = 0.0  # -1.0 to 1.0
+        self.speed = 0.0  # revolutions per second
+        self.position = 0.0  # revolutions
+        self.time = perf_counter()
+
+    def advance(self, now):
+        dt = now - self.time
+        self.time = now
+        if dt <= 0:
+            return
+        target = self.throttle * SPEED_SCALE
+        # exact step of a first order lag, stable for any dt
+        old = self.speed
+        factor = exp(-dt / TIME_CONSTANT)
+        self.speed = target + (old - target) * factor
+        # the position is the integral of the speed over the step
+        self.position += target * dt + (old - target) * TIME_CONSTANT * (
+            1 - factor)
+
+    @property
+    def counts(self):
+        return int(self.position * COUNTS_PER_REV)
+
+    @property
+    def current(self):
+        """Amps, grows with the difference of throttle and speed."""
+        if not self.throttle:
+            return 0.0
+        slip = abs(self.throttle - self.speed / SPEED_SCALE)
+        return NO_LOAD_CURRENT + (STALL_CURRENT - NO_LOAD_CURRENT) * min(1, slip)
+
+
+class Motor2040(Device):
+    """The GamePad_Control/code.py firmware with three wheels."""
+
+    def __init__(self):
+        self.wheels = [Wheel(), Wheel(), Wheel()]
+        self.last_seq = None
+        self.lost = 0  # frames missed or rejected
+        self.frames = 0
+        # velocity PID, stepped at the loop rate when in closed loop
+        self.closed_loop = False
+        self.loop_rate = LOOP_RATE
+        self.pids = MultiPID(3, VEL_KP, VEL_KI, VEL_KD, LOOP_RATE,
+                             scale=1 / COUNTS_PER_REV, velocity=True,
+                             output_rate=1 / SPEED_SCALE)
+        self.pids.reset(self.counts, self.throttles)
+        self.ramp = Move(unit_table(SCURVE, RAMP_TIME * LOOP_RATE), 3)
+        self.next_loop = perf_counter()
+
+    def control(self):
+        """One PID update of the three wheels, as code.py does it"""
+        if self.closed_loop:
+            setpoints = self.ramp.next()
+            for i in range(3):
+                self.pids.setpoints[i] = setpoints[i]
+            throttles = self.pids.update(self.counts)
+            for wheel, throttle in zip(self.wheels, throttles):
+                wheel.throttle = throttle
+        else:
+            self.pids.track(self.counts, self.throttles)
+
+    def advance(self, now=None):
+        now = perf_counter() if now is None else now
+        while self.next_loop <= now:
+            for wheel in self.wheels:
+                wheel.advance(self.next_loop)
+            self.control()
+            self.next_loop += 1 / self.loop_rate
+        for wheel in self.wheels:
+            wheel.advance(now)
+
+    def received(self, unpack, frame):
+        """Speeds of a DRIVE or VELOCITY frame, None if it is bad"""
+        try:
+            seq, speeds = unpack(frame)
+        except ValueError:
+            self.lost += 1
+            return None
+        if self.last_seq is not None and seq != (self.last_seq + 1) & 0xFF:
+            self.lost += (seq - self.last_seq - 1) & 0xFF
+        self.last_seq = seq
+        self.frames += 1
+        return speeds
+
+    def write(self, register, data):
+        self.advance()
+        frame = bytes([register]) + bytes(data)
+        if register == CMD_DRIVE:
+            speeds = self.received(unpack_drive, frame)
+            if speeds is not None:
+                self.closed_loop = False
+                for wheel, speed in zip(self.wheels, speeds):
+                    wheel.throttle = speed / MAX_SPEED
+        elif register == CMD_VELOCITY:
+            revs = self.received(unpack_velocity, frame)
+            if revs is not None:
+                if not self.closed_loop:
+                    self.ramp.values[:] = list(self.pids.measured)
+                self.closed_loop = True
+                self.ramp.to(revs)
+        elif register == CMD_GAINS:
+            try:
+                kp, ki, kd, rate = unpack_gains(frame)
+            except ValueError:
+                return
+            self.loop_rate = max(20, min(500, rate))
+            self.pids.set_gains(kp, ki, kd)
+            self.pids.set_rate(self.loop_rate)
+            self.ramp.unit = unit_table(SCURVE, RAMP_TIME * self.loop_rate)
+        elif len(data) == 1 and register < 6:
+            # old protocol: even registers forward, odd backward
+            self.closed_loop = False
+            val = data[0] / 255
+            self.wheels[register // 2].throttle = -val if register % 2 else val
+
+    def read(self, register, length):
+        now = perf_counter()
+        self.advance(now)
+        if register == REG_GAINS:
+            pids = self.pids
+            return pack_gains(pids.kp[0], pids.ki[0], pids.kd[0],
+                              self.loop_rate)[1:length + 1]
+        if register == REG_LOOP:
+            period = 1_000_000 // self.loop_rate  # the simulation is never late
+            return pack_loop(self.loop_rate, period, period, 0)[:length]
+        if register != REG_TELEMETRY:
+            return bytes(length)
+        return pack_telemetry(
+            int(now * 1000),
+            [w.counts for w in self.wheels],
+            [w.speed * COUNTS_PER_REV for w in self.wheels],
+            [w.current * 1000 for w in self.wheels])[:length]
+
+    @property
+    def throttles(self):
+        return [wheel.throttle for wheel in self.wheels]
+
+    @property
+    def counts(self):
+        return [wheel.counts for wheel in self.wheels]
+
+
+class PCA9685(Device):
+    """Register map of the PCA9685 servo driver."""
+
+    MODE1 = 0x00
+    AUTO_INCREMENT = 0x20
+    LED0_ON_L = 0x06
+    PRESCALE = 0xFE
+
+    def __init__(self):
+        self.registers = bytearray(256)
+        self.registers[self.MODE1] = 0x11  # power on: sleep, all call
+
+    def write(self, register, data):
+        auto = self.registers[self.MODE1] & self.AUTO_INCREMENT
+        for i, value in enumerate(data):
+            # without auto-increment every byte goes to the same register
+            self.registers[(register + i if auto else register) & 0xFF] = value
+
+    def read(self, register, length):
+        auto = self.registers[self.MODE1] & self.AUTO_INCREMENT
+        return bytes(self.registers[(register + i if auto else register) & 0xFF]
+                     for i in range(length))
+
+    def off_counts(self, channel):
+        """12 bit off time of a channel."""
+        base = self.LED0_ON_L + 4 * channel
+        return self.registers[base + 2] | (self.registers[base + 3] & 0x0F) << 8
+
+
+class Arduino(Device):
+    """Web_Control's Arduino Mega, keeps the text commands it gets."""
+
+    def __init__(self):
+        self.commands = []
+
+    def write(self, register, data):
+        self.commands.append(bytes(data).decode("ascii", errors="replace"))
+
+
+# ------------------------------ BUS --------------------------------------- #
+class VirtualBus:
+    def __init__(self, devices=None):
+        self.devices = dict(devices or {})
+        self.log = []
+        self.lock = Lock()
+
+    def transaction(self, address, kind, register, data, read_length=0):
+        """Run one transaction, raises OSError if no device answers."""
+        with self.lock:
+            device = self.devices.get(address)
+            now = perf_counter()
+            if device is None:
+                self.log.append(
+                    Transaction(now, address, kind, register, data, False))
+                # what the Linux I2C driver says for a missing device
+                raise OSError(121, "Remote I/O error")
+            if read_length:
+                # reads without a register start at register 0
+                data = device.read(register or 0, read_length)
+            else:
+                device.write(register, data)
+            self.log.append(
+                Transaction(now, address, kind, register, data, True))
+            return data
+
+    def clear(self):
+        with self.lock:
+            self.log = []
+
+    def rate(self):
+        """Transactions per second over the logged time."""
+        with self.lock:
+            log = list(self.log)
+        if len(log) < 2:
+            return 0.0
+        return len(log) / (log[-1].time - log[0].time)
+
+
+RIGHT_MOTORS = 0x44
+LEFT_MOTORS = 0x48
+SERVOS = 0x40
+ARDUINO = 0x08
+
+
+def make_tyr_bus():
+    return VirtualBus({
+        ARDUINO: Arduino(),
+        SERVOS: PCA9685(),
+        RIGHT_MOTORS: Motor2040(),
+        LEFT_MOTORS: Motor2040(),
+    })
+
+
+# The bus every smbus.SMBus() of this process talks to
+bus = make_tyr_bus()